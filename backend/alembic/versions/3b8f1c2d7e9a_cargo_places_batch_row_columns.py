@@ -0,0 +1,48 @@
+"""cargo_places batch row columns
+
+Revision ID: 3b8f1c2d7e9a
+Revises: 050a012de4cc
+Create Date: 2026-10-19 11:02:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b8f1c2d7e9a'
+down_revision: Union[str, None] = '050a012de4cc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('cargo_places', sa.Column('row_seq', sa.Integer(), nullable=True))
+    op.add_column('cargo_places', sa.Column('client_code', sa.String(length=50), nullable=True))
+    op.add_column('cargo_places', sa.Column('places_count', sa.Integer(), nullable=True))
+    op.add_column('cargo_places', sa.Column('boxes_count', sa.Integer(), nullable=True))
+    op.add_column('cargo_places', sa.Column('units_count', sa.Integer(), nullable=True))
+    op.add_column('cargo_places', sa.Column('cubic_tariff', sa.Float(), nullable=True))
+    op.add_column('cargo_places', sa.Column('freight_tariff', sa.Float(), nullable=True))
+    op.add_column('cargo_places', sa.Column('insurance_percent', sa.Float(), nullable=True))
+    op.add_column('cargo_places', sa.Column('insurance_cost', sa.Float(), nullable=True))
+    op.add_column('cargo_places', sa.Column('packaging_cost', sa.Float(), nullable=True))
+    op.create_index('idx_cargo_places_batch_id_row_seq', 'cargo_places', ['batch_id', 'row_seq'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_cargo_places_batch_id_row_seq', table_name='cargo_places')
+    op.drop_column('cargo_places', 'packaging_cost')
+    op.drop_column('cargo_places', 'insurance_cost')
+    op.drop_column('cargo_places', 'insurance_percent')
+    op.drop_column('cargo_places', 'freight_tariff')
+    op.drop_column('cargo_places', 'cubic_tariff')
+    op.drop_column('cargo_places', 'units_count')
+    op.drop_column('cargo_places', 'boxes_count')
+    op.drop_column('cargo_places', 'places_count')
+    op.drop_column('cargo_places', 'client_code')
+    op.drop_column('cargo_places', 'row_seq')
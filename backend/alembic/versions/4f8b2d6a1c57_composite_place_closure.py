@@ -0,0 +1,67 @@
+"""composite place closure
+
+Revision ID: 4f8b2d6a1c57
+Revises: e5a7c3f19b20
+Create Date: 2026-10-19 19:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f8b2d6a1c57'
+down_revision: Union[str, None] = 'e5a7c3f19b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'composite_place_closure',
+        sa.Column('period_id', sa.Integer(), nullable=False),
+        sa.Column('ancestor_id', sa.Integer(), nullable=False),
+        sa.Column('descendant_id', sa.Integer(), nullable=False),
+        sa.Column('depth', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('period_id', 'ancestor_id', 'descendant_id'),
+        sa.ForeignKeyConstraint(
+            ['ancestor_id', 'period_id'], ['cargo_places.id', 'cargo_places.period_id'],
+            name='fk_composite_place_closure_ancestor', ondelete='CASCADE'
+        ),
+        sa.ForeignKeyConstraint(
+            ['descendant_id', 'period_id'], ['cargo_places.id', 'cargo_places.period_id'],
+            name='fk_composite_place_closure_descendant', ondelete='CASCADE'
+        ),
+        sa.CheckConstraint('depth > 0', name='check_closure_depth'),
+    )
+
+    # Начальное заполнение по существующим связям (глубина ограничена, как в ClosureService)
+    op.execute(
+        """
+        WITH RECURSIVE paths(period_id, ancestor_id, descendant_id, depth) AS (
+            SELECT period_id, parent_id, cargo_place_id, 1 FROM composite_places
+            UNION ALL
+            SELECT p.period_id, e.parent_id, p.descendant_id, p.depth + 1
+            FROM paths p
+            JOIN composite_places e ON e.period_id = p.period_id AND e.cargo_place_id = p.ancestor_id
+            WHERE p.depth < 32
+        )
+        INSERT INTO composite_place_closure (period_id, ancestor_id, descendant_id, depth)
+        SELECT period_id, ancestor_id, descendant_id, MIN(depth)
+        FROM paths
+        WHERE ancestor_id <> descendant_id
+        GROUP BY period_id, ancestor_id, descendant_id
+        """
+    )
+    op.create_index(
+        'idx_composite_place_closure_descendant', 'composite_place_closure', ['period_id', 'descendant_id', 'depth']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_composite_place_closure_descendant', table_name='composite_place_closure')
+    op.drop_table('composite_place_closure')
@@ -0,0 +1,50 @@
+"""cargo_places row key and hash
+
+Revision ID: 7c2e5a9d4b61
+Revises: 3b8f1c2d7e9a
+Create Date: 2026-10-19 13:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2e5a9d4b61'
+down_revision: Union[str, None] = '3b8f1c2d7e9a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('cargo_places', sa.Column('row_key', sa.String(length=32), nullable=True))
+    op.add_column('cargo_places', sa.Column('row_hash', sa.String(length=32), nullable=True))
+
+    # Ключи уже записанных строк считаются так же, как в ingest_service.make_row_key.
+    # Хэш остается пустым: при следующей загрузке партии такие места обновятся один раз
+    op.execute(
+        """
+        UPDATE cargo_places cp
+        SET row_key = md5(
+            coalesce(k.client_code, '') || '|' || coalesce(to_char(k.departure_date, 'YYYY-MM-DD'), '') || '|' || k.occurrence
+        )
+        FROM (
+            SELECT id, client_code, departure_date,
+                   row_number() OVER (PARTITION BY batch_id, client_code, departure_date ORDER BY row_seq) AS occurrence
+            FROM cargo_places
+            WHERE row_seq IS NOT NULL
+        ) k
+        WHERE cp.id = k.id
+        """
+    )
+    op.create_index('uq_cargo_places_batch_row_key', 'cargo_places', ['batch_id', 'row_key'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_cargo_places_batch_row_key', table_name='cargo_places')
+    op.drop_column('cargo_places', 'row_hash')
+    op.drop_column('cargo_places', 'row_key')
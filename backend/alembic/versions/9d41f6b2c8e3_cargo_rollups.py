@@ -0,0 +1,68 @@
+"""cargo rollups
+
+Revision ID: 9d41f6b2c8e3
+Revises: 7c2e5a9d4b61
+Create Date: 2026-10-19 15:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d41f6b2c8e3'
+down_revision: Union[str, None] = '7c2e5a9d4b61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'cargo_rollups',
+        sa.Column('batch_id', sa.Integer(), sa.ForeignKey('batches.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('client_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=50), nullable=False),
+        sa.Column('period_id', sa.Integer(), sa.ForeignKey('periods.period_id', ondelete='CASCADE'), nullable=False),
+        sa.Column('places', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('composite_places', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('boxes', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('weight', sa.Float(), server_default=sa.text('0'), nullable=False),
+        sa.Column('volume', sa.Float(), server_default=sa.text('0'), nullable=False),
+        sa.Column('amount', sa.Float(), server_default=sa.text('0'), nullable=False),
+        sa.Column('updated_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+        sa.PrimaryKeyConstraint('batch_id', 'client_id', 'status'),
+    )
+    op.create_index('idx_cargo_rollups_period_client', 'cargo_rollups', ['period_id', 'client_id'])
+    op.create_index('idx_cargo_rollups_period_status', 'cargo_rollups', ['period_id', 'status'])
+
+    # Начальное заполнение по уже записанным местам (правила подсчета - RollupService)
+    op.execute(
+        """
+        INSERT INTO cargo_rollups (period_id, batch_id, client_id, status, places, composite_places, boxes, weight, volume, amount)
+        SELECT b.period_id, c.batch_id, COALESCE(c.client_id, 0), c.status,
+               SUM(CASE
+                       WHEN EXISTS (SELECT 1 FROM composite_places x WHERE x.parent_id = c.id) THEN 1
+                       WHEN EXISTS (SELECT 1 FROM composite_places x WHERE x.cargo_place_id = c.id) THEN 0
+                       ELSE COALESCE(c.places_count, 0)
+                   END),
+               SUM(CASE WHEN EXISTS (SELECT 1 FROM composite_places x WHERE x.parent_id = c.id) THEN 1 ELSE 0 END),
+               SUM(COALESCE(c.boxes_count, 0)),
+               SUM(c.weight),
+               SUM(c.volume),
+               SUM(c.shipping_cost)
+        FROM cargo_places c
+        JOIN batches b ON b.id = c.batch_id
+        WHERE c.is_active
+        GROUP BY b.period_id, c.batch_id, COALESCE(c.client_id, 0), c.status
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_cargo_rollups_period_status', table_name='cargo_rollups')
+    op.drop_index('idx_cargo_rollups_period_client', table_name='cargo_rollups')
+    op.drop_table('cargo_rollups')
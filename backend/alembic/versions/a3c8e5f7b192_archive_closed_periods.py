@@ -0,0 +1,43 @@
+"""archive closed periods
+
+Revision ID: a3c8e5f7b192
+Revises: f1c5b9e3d2a7
+Create Date: 2026-10-19 23:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c8e5f7b192'
+down_revision: Union[str, None] = 'f1c5b9e3d2a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Места архивного периода хранятся в файле архива (ArchiveService),
+    # в базе остается только индекс номеров
+    op.add_column('periods', sa.Column('archived_at', sa.TIMESTAMP(timezone=True), nullable=True))
+    op.create_table(
+        'archived_cargo_places',
+        sa.Column('tracking_number', sa.String(length=20), nullable=False),
+        sa.Column('period_id', sa.Integer(), nullable=False),
+        sa.Column('place_id', sa.Integer(), nullable=False),
+        sa.Column('batch_id', sa.Integer(), nullable=True),
+        sa.Column('client_code', sa.String(length=50), nullable=True),
+        sa.Column('status', sa.String(length=50), nullable=False),
+        sa.Column('is_active', sa.Boolean(), nullable=False),
+        sa.ForeignKeyConstraint(['period_id'], ['periods.period_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('tracking_number', 'period_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('archived_cargo_places')
+    op.drop_column('periods', 'archived_at')
@@ -0,0 +1,64 @@
+"""cargo search indexes
+
+Revision ID: b7d3e8f2a915
+Revises: 4f8b2d6a1c57
+Create Date: 2026-10-19 20:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d3e8f2a915'
+down_revision: Union[str, None] = '4f8b2d6a1c57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('simple', coalesce(tracking_number, '') || ' ' || coalesce(client_code, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(description, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(description_original, '')), 'C') || "
+    "setweight(to_tsvector('russian', coalesce(notes, '')), 'D')"
+)
+
+# Триграммные индексы (pg_trgm): нечеткий поиск, ILIKE по подстроке и префиксу
+TRIGRAM_INDEXES = (
+    ('idx_cargo_places_tracking_number_trgm', 'cargo_places', 'tracking_number'),
+    ('idx_cargo_places_client_code_trgm', 'cargo_places', 'client_code'),
+    ('idx_cargo_places_description_trgm', 'cargo_places', 'description'),
+    ('idx_cargo_places_description_original_trgm', 'cargo_places', 'description_original'),
+    ('idx_clients_code_trgm', 'clients', 'code'),
+    ('idx_clients_name_trgm', 'clients', 'name'),
+    ('idx_recipients_name_trgm', 'recipients', 'name'),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    op.add_column('cargo_places', sa.Column('description_original', sa.Text(), nullable=True))
+    # Вычисляемый столбец заполняется для всех секций при добавлении
+    op.add_column(
+        'cargo_places',
+        sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(SEARCH_VECTOR_SQL, persisted=True))
+    )
+    op.create_index('idx_cargo_places_search_vector', 'cargo_places', ['search_vector'], postgresql_using='gin')
+    for name, table, column in TRIGRAM_INDEXES:
+        op.create_index(name, table, [column], postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+
+    op.execute("ANALYZE cargo_places")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, _ in TRIGRAM_INDEXES:
+        op.drop_index(name, table_name=table)
+    op.drop_index('idx_cargo_places_search_vector', table_name='cargo_places')
+    op.drop_column('cargo_places', 'search_vector')
+    op.drop_column('cargo_places', 'description_original')
+    # Расширение pg_trgm не удаляется: им могут пользоваться другие объекты базы
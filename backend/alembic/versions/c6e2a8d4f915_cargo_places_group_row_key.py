@@ -0,0 +1,53 @@
+"""cargo_places group row key
+
+Revision ID: c6e2a8d4f915
+Revises: a3c8e5f7b192
+Create Date: 2026-10-20 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6e2a8d4f915'
+down_revision: Union[str, None] = 'a3c8e5f7b192'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Ключ строки - клиент и дата отправки без порядкового номера (ingest_service.make_row_key):
+    # строки одной группы различаются по содержимому, поэтому ключ больше не уникален
+    op.execute("DROP INDEX IF EXISTS uq_cargo_places_batch_row_key")
+    op.execute(
+        """
+        UPDATE cargo_places
+        SET row_key = md5(coalesce(client_code, '') || '|' || coalesce(to_char(departure_date, 'YYYY-MM-DD'), ''))
+        WHERE row_key IS NOT NULL
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(
+        """
+        UPDATE cargo_places cp
+        SET row_key = md5(
+            coalesce(k.client_code, '') || '|' || coalesce(to_char(k.departure_date, 'YYYY-MM-DD'), '') || '|' || k.occurrence
+        )
+        FROM (
+            SELECT id, period_id, client_code, departure_date,
+                   row_number() OVER (PARTITION BY period_id, batch_id, client_code, departure_date ORDER BY row_seq) AS occurrence
+            FROM cargo_places
+            WHERE row_key IS NOT NULL
+        ) k
+        WHERE cp.id = k.id AND cp.period_id = k.period_id
+        """
+    )
+    op.create_index(
+        'uq_cargo_places_batch_row_key', 'cargo_places', ['period_id', 'batch_id', 'row_key'], unique=True
+    )
@@ -0,0 +1,29 @@
+"""drop redundant tracking number index
+
+Revision ID: d2f6a4c8e713
+Revises: b7d3e8f2a915
+Create Date: 2026-10-19 21:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2f6a4c8e713'
+down_revision: Union[str, None] = 'b7d3e8f2a915'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Поиск по номеру идет по уникальному индексу (tracking_number, period_id),
+    # отдельный индекс по номеру только замедлял запись мест
+    op.drop_index('idx_cargo_places_tracking_number', table_name='cargo_places')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('idx_cargo_places_tracking_number', 'cargo_places', ['tracking_number'])
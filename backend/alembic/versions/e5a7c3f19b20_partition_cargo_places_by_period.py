@@ -0,0 +1,189 @@
+"""partition cargo_places by period
+
+Revision ID: e5a7c3f19b20
+Revises: 9d41f6b2c8e3
+Create Date: 2026-10-19 17:25:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a7c3f19b20'
+down_revision: Union[str, None] = '9d41f6b2c8e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Индексы cargo_places: создаются на секционированной таблице и наследуются секциями
+INDEXES = (
+    ('idx_cargo_places_tracking_number', ['tracking_number'], False),
+    ('idx_cargo_places_batch_id', ['batch_id'], False),
+    ('idx_cargo_places_batch_id_row_seq', ['batch_id', 'row_seq'], False),
+    ('idx_cargo_places_client_id', ['client_id'], False),
+    ('idx_cargo_places_recipient_id', ['recipient_id'], False),
+    ('idx_cargo_places_status', ['status'], False),
+    ('idx_cargo_places_departure_date', ['departure_date'], False),
+    ('idx_cargo_places_estimated_arrival_date', ['estimated_arrival_date'], False),
+)
+
+FOREIGN_KEYS = (
+    ('batch_id', 'batches', 'id', 'SET NULL'),
+    ('client_id', 'clients', 'id', 'SET NULL'),
+    ('recipient_id', 'recipients', 'id', 'SET NULL'),
+    ('driver_id', 'drivers', 'id', 'SET NULL'),
+    ('payment_method_id', 'payment_methods', 'id', 'SET NULL'),
+)
+
+
+def _drop_indexes() -> None:
+    for name, _, _ in INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    op.execute("DROP INDEX IF EXISTS uq_cargo_places_batch_row_key")
+
+
+def _create_foreign_keys(table: str) -> None:
+    for column, target, target_column, on_delete in FOREIGN_KEYS:
+        op.create_foreign_key(
+            f"{table}_{column}_fkey", table, target, [column], [target_column], ondelete=on_delete
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    conn = op.get_bind()
+
+    # Период места берется из его партии, для мест без партии - из года создания
+    orphaned = conn.execute(sa.text(
+        "SELECT count(*) FROM cargo_places c "
+        "LEFT JOIN batches b ON b.id = c.batch_id "
+        "LEFT JOIN periods p ON p.period_name = to_char(c.created_at, 'YYYY') "
+        "WHERE b.period_id IS NULL AND p.period_id IS NULL"
+    )).scalar()
+    if orphaned:
+        raise RuntimeError(
+            f"У {orphaned} мест нет ни партии, ни периода с годом их создания: "
+            "назначьте им партию или создайте периоды перед миграцией"
+        )
+
+    # Ссылки на старую таблицу, освобождение имен ограничений и индексов
+    op.execute("ALTER TABLE composite_places DROP CONSTRAINT IF EXISTS composite_places_cargo_place_id_fkey")
+    op.execute("ALTER TABLE composite_places DROP CONSTRAINT IF EXISTS composite_places_parent_id_fkey")
+    op.execute("ALTER TABLE cargo_places RENAME TO cargo_places_legacy")
+    op.execute("ALTER TABLE cargo_places_legacy RENAME CONSTRAINT cargo_places_pkey TO cargo_places_legacy_pkey")
+    for column, _, _, _ in FOREIGN_KEYS:
+        op.execute(f"ALTER TABLE cargo_places_legacy DROP CONSTRAINT IF EXISTS cargo_places_{column}_fkey")
+    _drop_indexes()
+
+    # Секционированная таблица с теми же столбцами, умолчаниями и проверками
+    op.execute(
+        "CREATE TABLE cargo_places ("
+        "LIKE cargo_places_legacy INCLUDING DEFAULTS INCLUDING CONSTRAINTS, "
+        "period_id INTEGER NOT NULL"
+        ") PARTITION BY LIST (period_id)"
+    )
+    op.execute("ALTER TABLE cargo_places ADD CONSTRAINT cargo_places_pkey PRIMARY KEY (id, period_id)")
+    op.execute(
+        "ALTER TABLE cargo_places ADD CONSTRAINT uq_cargo_places_tracking_period UNIQUE (tracking_number, period_id)"
+    )
+    _create_foreign_keys('cargo_places')
+    op.create_foreign_key(
+        'cargo_places_period_id_fkey', 'cargo_places', 'periods', ['period_id'], ['period_id'], ondelete='RESTRICT'
+    )
+
+    sequence = conn.execute(sa.text("SELECT pg_get_serial_sequence('cargo_places_legacy', 'id')")).scalar()
+    if sequence:
+        op.execute(f"ALTER SEQUENCE {sequence} OWNED BY cargo_places.id")
+
+    for period_id in conn.execute(sa.text("SELECT period_id FROM periods ORDER BY period_id")).scalars().all():
+        op.execute(f"CREATE TABLE cargo_places_p{period_id} PARTITION OF cargo_places FOR VALUES IN ({period_id})")
+    op.execute("CREATE TABLE cargo_places_default PARTITION OF cargo_places DEFAULT")
+
+    # Перенос данных до создания индексов: построить индекс один раз быстрее,
+    # чем поддерживать его при вставке каждой строки
+    op.execute(
+        "INSERT INTO cargo_places "
+        "SELECT l.*, COALESCE(b.period_id, p.period_id) "
+        "FROM cargo_places_legacy l "
+        "LEFT JOIN batches b ON b.id = l.batch_id "
+        "LEFT JOIN periods p ON p.period_name = to_char(l.created_at, 'YYYY')"
+    )
+    for name, columns, unique in INDEXES:
+        op.create_index(name, 'cargo_places', columns, unique=unique)
+    op.create_index(
+        'uq_cargo_places_batch_row_key', 'cargo_places', ['period_id', 'batch_id', 'row_key'], unique=True
+    )
+
+    # Связи сборных мест хранят период мест: внешний ключ на секционированную
+    # таблицу должен включать ключ секционирования. Связи мест разных периодов
+    # так не выразить, они удаляются
+    op.add_column('composite_places', sa.Column('period_id', sa.Integer(), nullable=True))
+    op.execute(
+        "UPDATE composite_places cp SET period_id = c.period_id "
+        "FROM cargo_places c, cargo_places p "
+        "WHERE c.id = cp.cargo_place_id AND p.id = cp.parent_id AND p.period_id = c.period_id"
+    )
+    op.execute("DELETE FROM composite_places WHERE period_id IS NULL")
+    op.alter_column('composite_places', 'period_id', nullable=False)
+    op.create_foreign_key(
+        'fk_composite_places_cargo_place', 'composite_places', 'cargo_places',
+        ['cargo_place_id', 'period_id'], ['id', 'period_id'], ondelete='CASCADE'
+    )
+    op.create_foreign_key(
+        'fk_composite_places_parent', 'composite_places', 'cargo_places',
+        ['parent_id', 'period_id'], ['id', 'period_id'], ondelete='CASCADE'
+    )
+
+    op.execute("DROP TABLE cargo_places_legacy")
+    op.execute("ANALYZE cargo_places")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    conn = op.get_bind()
+
+    op.drop_constraint('fk_composite_places_parent', 'composite_places', type_='foreignkey')
+    op.drop_constraint('fk_composite_places_cargo_place', 'composite_places', type_='foreignkey')
+    op.drop_column('composite_places', 'period_id')
+
+    op.execute("ALTER TABLE cargo_places RENAME TO cargo_places_partitioned")
+    op.execute("ALTER TABLE cargo_places_partitioned RENAME CONSTRAINT cargo_places_pkey TO cargo_places_partitioned_pkey")
+    op.execute("ALTER TABLE cargo_places_partitioned DROP CONSTRAINT uq_cargo_places_tracking_period")
+    op.execute("ALTER TABLE cargo_places_partitioned DROP CONSTRAINT cargo_places_period_id_fkey")
+    for column, _, _, _ in FOREIGN_KEYS:
+        op.execute(f"ALTER TABLE cargo_places_partitioned DROP CONSTRAINT IF EXISTS cargo_places_{column}_fkey")
+    _drop_indexes()
+
+    op.execute(
+        "CREATE TABLE cargo_places (LIKE cargo_places_partitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    )
+    op.execute("ALTER TABLE cargo_places DROP COLUMN period_id")
+    columns = [column['name'] for column in sa.inspect(conn).get_columns('cargo_places')]
+    op.execute(
+        f"INSERT INTO cargo_places ({', '.join(columns)}) "
+        f"SELECT {', '.join(columns)} FROM cargo_places_partitioned"
+    )
+    op.execute("ALTER TABLE cargo_places ADD CONSTRAINT cargo_places_pkey PRIMARY KEY (id)")
+    op.execute("ALTER TABLE cargo_places ADD CONSTRAINT cargo_places_tracking_number_key UNIQUE (tracking_number)")
+    _create_foreign_keys('cargo_places')
+    for name, index_columns, unique in INDEXES:
+        op.create_index(name, 'cargo_places', index_columns, unique=unique)
+    op.create_index('uq_cargo_places_batch_row_key', 'cargo_places', ['batch_id', 'row_key'], unique=True)
+
+    sequence = conn.execute(sa.text("SELECT pg_get_serial_sequence('cargo_places_partitioned', 'id')")).scalar()
+    if sequence:
+        op.execute(f"ALTER SEQUENCE {sequence} OWNED BY cargo_places.id")
+
+    # Секции удаляются вместе с секционированной таблицей
+    op.execute("DROP TABLE cargo_places_partitioned")
+
+    op.create_foreign_key(
+        'composite_places_cargo_place_id_fkey', 'composite_places', 'cargo_places',
+        ['cargo_place_id'], ['id'], ondelete='CASCADE'
+    )
+    op.create_foreign_key(
+        'composite_places_parent_id_fkey', 'composite_places', 'cargo_places',
+        ['parent_id'], ['id'], ondelete='CASCADE'
+    )
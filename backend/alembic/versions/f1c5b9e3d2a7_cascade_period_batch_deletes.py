@@ -0,0 +1,37 @@
+"""cascade period and batch deletes
+
+Revision ID: f1c5b9e3d2a7
+Revises: d2f6a4c8e713
+Create Date: 2026-10-19 22:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c5b9e3d2a7'
+down_revision: Union[str, None] = 'd2f6a4c8e713'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _replace_foreign_key(name: str, table: str, column: str, target: str, target_column: str, on_delete: str) -> None:
+    op.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {name}")
+    op.create_foreign_key(name, table, target, [column], [target_column], ondelete=on_delete)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Места удаляются вместе с партией, партии - вместе с периодом: удаление
+    # выполняет база одним набором, как раньше каскад ORM (Batch.cargo_places,
+    # Period.batches) с построчной загрузкой
+    _replace_foreign_key('cargo_places_batch_id_fkey', 'cargo_places', 'batch_id', 'batches', 'id', 'CASCADE')
+    _replace_foreign_key('batches_period_id_fkey', 'batches', 'period_id', 'periods', 'period_id', 'CASCADE')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _replace_foreign_key('batches_period_id_fkey', 'batches', 'period_id', 'periods', 'period_id', 'RESTRICT')
+    _replace_foreign_key('cargo_places_batch_id_fkey', 'cargo_places', 'batch_id', 'batches', 'id', 'SET NULL')
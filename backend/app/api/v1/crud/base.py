@@ -0,0 +1,318 @@
+from typing import Any, Dict, Generic, List, Optional, Sequence, Tuple, Type, TypeVar
+from pydantic import BaseModel
+from sqlalchemy import cast, column, delete, inspect, select, update, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.core.database import Base
+
+ModelType = TypeVar("ModelType", bound=Base)
+CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
+UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
+
+
+class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+    """
+    Базовые операции записи справочника, каждая - один запрос к базе.
+
+    Создание - INSERT ... RETURNING (с ON CONFLICT DO NOTHING по уникальному
+    ключу conflict_columns), изменение - UPDATE ... RETURNING, удаление -
+    DELETE ... RETURNING id: объект не читается перед записью и не
+    перечитывается после нее. Варианты *_many пишут набор строк так же:
+    вставка - одним executemany (пачками INSERT ... VALUES), изменение -
+    UPDATE ... FROM (VALUES ...), удаление - по списку ID.
+
+    Возвращаемые объекты отсоединяются от сессии до фиксации транзакции, поэтому
+    их поля не перечитываются после commit; отношения у них не загружаются.
+    Методы с commit=False оставляют транзакцию открытой для дополнительных
+    запросов модуля, фиксирует ее CRUDBase.commit.
+    """
+
+    def __init__(self, model: Type[ModelType], conflict_columns: Sequence[str] = ()):
+        """
+        Args:
+            model: Модель SQLAlchemy
+            conflict_columns: Столбцы уникального ключа для ON CONFLICT
+                (если пусто - вставка без ON CONFLICT)
+        """
+        self.model = model
+        self.pk = inspect(model).primary_key[0]
+        self.conflict_columns = list(conflict_columns)
+
+    def get(self, db: Session, id: Any) -> Optional[ModelType]:
+        return db.get(self.model, id)
+
+    def create(self, db: Session, obj_in: CreateSchemaType, commit: bool = True) -> Optional[ModelType]:
+        """
+        Создает запись одним INSERT ... RETURNING.
+
+        Returns:
+            Optional[ModelType]: Новая запись; None, если запись с тем же
+                уникальным ключом уже есть
+        """
+        stmt = insert(self.model).values(**obj_in.model_dump())
+        if self.conflict_columns:
+            stmt = stmt.on_conflict_do_nothing(index_elements=self.conflict_columns)
+        db_obj = db.scalars(stmt.returning(self.model)).one_or_none()
+        if commit:
+            self.commit(db, db_obj)
+        return db_obj
+
+    def create_many(self, db: Session, objs_in: Sequence[CreateSchemaType], commit: bool = True) -> List[ModelType]:
+        """
+        Создает записи одним executemany.
+
+        Returns:
+            List[ModelType]: Новые записи (в порядке objs_in, если нет
+                conflict_columns); записи, уже существующие по уникальному
+                ключу, пропускаются
+        """
+        if not objs_in:
+            return []
+        stmt = insert(self.model)
+        if self.conflict_columns:
+            stmt = stmt.on_conflict_do_nothing(index_elements=self.conflict_columns)
+        # Без ON CONFLICT возвращаются все строки, и их можно вернуть в порядке objs_in
+        db_objs = db.scalars(
+            stmt.returning(self.model, sort_by_parameter_order=not self.conflict_columns),
+            [obj_in.model_dump() for obj_in in objs_in]
+        ).all()
+        if commit:
+            self.commit(db, *db_objs)
+        return list(db_objs)
+
+    def upsert(
+            self,
+            db: Session,
+            obj_in: CreateSchemaType,
+            update_columns: Optional[Sequence[str]] = None,
+            commit: bool = True
+    ) -> ModelType:
+        """
+        Создает запись или обновляет существующую по уникальному ключу
+        одним INSERT ... ON CONFLICT DO UPDATE ... RETURNING.
+
+        Args:
+            update_columns: Обновляемые столбцы (по умолчанию - все переданные,
+                кроме ключа)
+        """
+        return self.upsert_many(db, [obj_in], update_columns, commit)[0]
+
+    def upsert_many(
+            self,
+            db: Session,
+            objs_in: Sequence[CreateSchemaType],
+            update_columns: Optional[Sequence[str]] = None,
+            commit: bool = True
+    ) -> List[ModelType]:
+        """
+        Вариант upsert для набора записей, записи возвращаются в порядке objs_in.
+
+        Новые записи вставляются со всеми полями схемы, у существующих (как в
+        update) меняются только переданные поля: записи группируются по набору
+        переданных полей, на каждую группу - один executemany.
+        """
+        if not objs_in:
+            return []
+        if not self.conflict_columns:
+            raise ValueError(f"Для {self.model.__name__} не задан уникальный ключ для ON CONFLICT")
+        groups: Dict[Tuple[str, ...], List[int]] = {}
+        for position, obj_in in enumerate(objs_in):
+            columns = update_columns
+            if columns is None:
+                columns = [column for column in obj_in.model_dump(exclude_unset=True) if column not in self.conflict_columns]
+            groups.setdefault(tuple(columns), []).append(position)
+
+        result: List[Optional[ModelType]] = [None] * len(objs_in)
+        for columns, positions in groups.items():
+            stmt = insert(self.model)
+            # Без обновляемых столбцов DO UPDATE с неизменным ключом нужен, чтобы
+            # RETURNING вернул и уже существующие записи
+            stmt = stmt.on_conflict_do_update(
+                index_elements=self.conflict_columns,
+                set_={column: stmt.excluded[column] for column in (columns or self.conflict_columns)}
+            )
+            db_objs = db.scalars(
+                stmt.returning(self.model, sort_by_parameter_order=True).execution_options(populate_existing=True),
+                [objs_in[position].model_dump() for position in positions]
+            ).all()
+            for position, db_obj in zip(positions, db_objs):
+                result[position] = db_obj
+        if commit:
+            self.commit(db, *result)
+        return result
+
+    def update(
+            self,
+            db: Session,
+            id: Any,
+            obj_in: UpdateSchemaType,
+            commit: bool = True
+    ) -> Optional[ModelType]:
+        """
+        Изменяет запись одним UPDATE ... RETURNING (меняются только переданные
+        поля, первичный ключ не меняется).
+
+        Returns:
+            Optional[ModelType]: Измененная запись; None, если записи нет
+        """
+        values = obj_in.model_dump(exclude_unset=True, exclude={self.pk.key})
+        if not values:
+            return self.get(db, id)
+        db_obj = db.scalars(
+            update(self.model)
+            .where(self.pk == id)
+            .values(**values)
+            .returning(self.model)
+            .execution_options(populate_existing=True)
+        ).one_or_none()
+        if commit:
+            self.commit(db, db_obj)
+        return db_obj
+
+    def update_with_previous(
+            self,
+            db: Session,
+            id: Any,
+            obj_in: UpdateSchemaType,
+            columns: Sequence[str],
+            commit: bool = True
+    ) -> Optional[Tuple[ModelType, Dict[str, Any]]]:
+        """
+        Изменяет запись и возвращает прежние значения столбцов columns тем же
+        запросом: UPDATE ... FROM (SELECT ... FOR UPDATE) ... RETURNING.
+
+        Returns:
+            Optional[Tuple[ModelType, Dict[str, Any]]]: Измененная запись и ее
+                прежние значения; None, если записи нет
+        """
+        values = obj_in.model_dump(exclude_unset=True, exclude={self.pk.key})
+        if not values:
+            db_obj = self.get(db, id)
+            return None if db_obj is None else (db_obj, {column: getattr(db_obj, column) for column in columns})
+
+        old = (
+            select(self.pk, *(getattr(self.model, column) for column in columns))
+            .where(self.pk == id)
+            .with_for_update()
+            .cte("old")
+        )
+
+        row = db.execute(
+            update(self.model)
+            .where(self.pk == old.c[self.pk.name])
+            .values(**values)
+            .returning(self.model, *(old.c[column].label(f"old_{column}") for column in columns))
+            .execution_options(populate_existing=True, synchronize_session=False)
+        ).one_or_none()
+        if row is None:
+            return None
+        db_obj, previous = row[0], {column: row[position + 1] for position, column in enumerate(columns)}
+        if commit:
+            self.commit(db, db_obj)
+        return db_obj, previous
+
+    def update_many(self, db: Session, items: Sequence[Tuple[Any, UpdateSchemaType]], commit: bool = True) -> List[Any]:
+        """
+        Изменяет записи по первичному ключу: один UPDATE ... FROM (VALUES ...)
+        RETURNING id на каждый набор изменяемых полей.
+
+        Args:
+            items: Пары (ID, изменения)
+
+        Returns:
+            List[Any]: ID измененных записей (ID, которых нет в таблице, в список не попадают)
+        """
+        groups: Dict[Tuple[str, ...], List[Tuple[Any, ...]]] = {}
+        for id, obj_in in items:
+            changes = obj_in.model_dump(exclude_unset=True, exclude={self.pk.key})
+            if changes:
+                groups.setdefault(tuple(changes), []).append((id, *changes.values()))
+
+        table = self.model.__table__
+        updated: List[Any] = []
+        for keys, rows in groups.items():
+            data = values(
+                column(self.pk.name, self.pk.type), *(column(key, table.c[key].type) for key in keys), name="v"
+            ).data(rows)
+            updated.extend(db.execute(
+                update(table)
+                .where(self.pk == cast(data.c[self.pk.name], self.pk.type))
+                .values({key: cast(data.c[key], table.c[key].type) for key in keys})
+                .returning(self.pk)
+            ).scalars().all())
+        if commit:
+            self.commit(db)
+        return updated
+
+    def deactivate_many(self, db: Session, ids: Sequence[Any], commit: bool = True) -> List[Any]:
+        """
+        Снимает признак is_active у записей одним UPDATE ... RETURNING id
+        (для моделей с is_active).
+
+        Returns:
+            List[Any]: ID найденных записей
+        """
+        if not ids:
+            return []
+        deactivated = db.execute(
+            update(self.model)
+            .where(self.pk.in_(list(ids)))
+            .values(is_active=False)
+            .returning(self.pk)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        if commit:
+            self.commit(db)
+        return list(deactivated)
+
+    def delete(self, db: Session, id: Any, commit: bool = True) -> bool:
+        """
+        Удаляет запись одним DELETE ... RETURNING id.
+
+        Returns:
+            bool: True, если запись была удалена
+        """
+        deleted = db.execute(
+            delete(self.model)
+            .where(self.pk == id)
+            .returning(self.pk)
+            .execution_options(synchronize_session=False)
+        ).scalar_one_or_none()
+        if commit:
+            self.commit(db)
+        return deleted is not None
+
+    def delete_many(self, db: Session, ids: Sequence[Any], commit: bool = True) -> List[Any]:
+        """
+        Удаляет записи одним DELETE ... WHERE id = ANY(...) RETURNING id.
+
+        Returns:
+            List[Any]: ID удаленных записей
+        """
+        if not ids:
+            return []
+        deleted = db.execute(
+            delete(self.model)
+            .where(self.pk.in_(list(ids)))
+            .returning(self.pk)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        if commit:
+            self.commit(db)
+        return list(deleted)
+
+    @staticmethod
+    def commit(db: Session, *db_objs: Optional[ModelType]) -> None:
+        """
+        Фиксирует транзакцию; при ошибке откатывает ее.
+        Объекты db_objs отсоединяются до фиксации, чтобы commit не сбросил
+        их поля и обращение к ним не вызвало повторного чтения из базы.
+        """
+        try:
+            for db_obj in db_objs:
+                if db_obj is not None and db_obj in db:
+                    db.expunge(db_obj)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
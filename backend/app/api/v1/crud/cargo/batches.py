@@ -1,11 +1,16 @@
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Dict, List, Any, Optional
+from app.core.pagination import keyset_page
+from app.api.v1.crud.base import CRUDBase
 from app.api.v1.models.cargo import Batch
 from app.api.v1.schemas.cargo import BatchCreate, BatchUpdate
 
 
+batch_crud = CRUDBase[Batch, BatchCreate, BatchUpdate](Batch, conflict_columns=['batch_number', 'period_id'])
+
+
 def get_batch(db: Session, batch_id: int) -> Optional[Batch]:
-    return db.query(Batch).filter(Batch.id == batch_id).first()
+    return batch_crud.get(db, batch_id)
 
 
 def get_batch_by_number(db: Session, batch_number: str, period_id: int) -> Optional[Batch]:
@@ -30,33 +35,30 @@ def get_batches(
     return query.offset(skip).limit(limit).all()
 
 
-def create_batch(db: Session, batch: BatchCreate) -> Batch:
-    db_batch = Batch(**batch.model_dump())
-    db.add(db_batch)
-    db.commit()
-    db.refresh(db_batch)
-    return db_batch
+def get_batches_page(
+        db: Session,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        period_id: Optional[int] = None,
+        is_active: Optional[bool] = None
+) -> Dict[str, Any]:
+    # Курсорная пагинация по (id): глубокие страницы не дороже первой
+    query = db.query(Batch)
+    if period_id is not None:
+        query = query.filter(Batch.period_id == period_id)
+    if is_active is not None:
+        query = query.filter(Batch.is_active == is_active)
+    return keyset_page(query, [Batch.id], limit, cursor)
 
 
-def update_batch(db: Session, batch_id: int, batch: BatchUpdate) -> Optional[Batch]:
-    db_batch = get_batch(db, batch_id)
-    if db_batch is None:
-        return None
+def create_batch(db: Session, batch: BatchCreate) -> Optional[Batch]:
+    # None - партия с таким номером в периоде уже есть
+    return batch_crud.create(db, batch)
 
-    update_data = batch.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_batch, key, value)
 
-    db.commit()
-    db.refresh(db_batch)
-    return db_batch
+def update_batch(db: Session, batch_id: int, batch: BatchUpdate) -> Optional[Batch]:
+    return batch_crud.update(db, batch_id, batch)
 
 
 def delete_batch(db: Session, batch_id: int) -> bool:
-    db_batch = get_batch(db, batch_id)
-    if db_batch is None:
-        return False
-
-    db.delete(db_batch)
-    db.commit()
-    return True
+    return batch_crud.delete(db, batch_id)
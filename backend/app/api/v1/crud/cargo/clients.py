@@ -1,11 +1,16 @@
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Dict, List, Any, Optional
+from app.core.pagination import keyset_page
+from app.api.v1.crud.base import CRUDBase
 from app.api.v1.models.cargo import Client
 from app.api.v1.schemas.cargo import ClientCreate, ClientUpdate
 
 
+client_crud = CRUDBase[Client, ClientCreate, ClientUpdate](Client, conflict_columns=['code'])
+
+
 def get_client(db: Session, client_id: int) -> Optional[Client]:
-    return db.query(Client).filter(Client.id == client_id).first()
+    return client_crud.get(db, client_id)
 
 
 def get_client_by_code(db: Session, code: str) -> Optional[Client]:
@@ -24,33 +29,27 @@ def get_clients(
     return query.offset(skip).limit(limit).all()
 
 
-def create_client(db: Session, client: ClientCreate) -> Client:
-    db_client = Client(**client.model_dump())
-    db.add(db_client)
-    db.commit()
-    db.refresh(db_client)
-    return db_client
+def get_clients_page(
+        db: Session,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        is_active: Optional[bool] = None
+) -> Dict[str, Any]:
+    # Курсорная пагинация по (code, id): глубокие страницы не дороже первой
+    query = db.query(Client)
+    if is_active is not None:
+        query = query.filter(Client.is_active == is_active)
+    return keyset_page(query, [Client.code, Client.id], limit, cursor)
 
 
-def update_client(db: Session, client_id: int, client: ClientUpdate) -> Optional[Client]:
-    db_client = get_client(db, client_id)
-    if db_client is None:
-        return None
+def create_client(db: Session, client: ClientCreate) -> Optional[Client]:
+    # None - клиент с таким кодом уже есть
+    return client_crud.create(db, client)
 
-    update_data = client.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_client, key, value)
 
-    db.commit()
-    db.refresh(db_client)
-    return db_client
+def update_client(db: Session, client_id: int, client: ClientUpdate) -> Optional[Client]:
+    return client_crud.update(db, client_id, client)
 
 
 def delete_client(db: Session, client_id: int) -> bool:
-    db_client = get_client(db, client_id)
-    if db_client is None:
-        return False
-
-    db.delete(db_client)
-    db.commit()
-    return True
+    return client_crud.delete(db, client_id)
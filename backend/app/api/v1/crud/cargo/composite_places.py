@@ -0,0 +1,7 @@
+from sqlalchemy.orm import Session
+from typing import Optional
+from app.api.v1.models.cargo import CompositePlace
+
+
+def get_composite_place(db: Session, composite_id: int) -> Optional[CompositePlace]:
+    return db.query(CompositePlace).filter(CompositePlace.id == composite_id).first()
@@ -1,11 +1,16 @@
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Dict, List, Any, Optional
+from app.core.pagination import keyset_page
+from app.api.v1.crud.base import CRUDBase
 from app.api.v1.models.cargo import Period
 from app.api.v1.schemas.cargo import PeriodCreate, PeriodUpdate
 
 
+period_crud = CRUDBase[Period, PeriodCreate, PeriodUpdate](Period, conflict_columns=['period_name'])
+
+
 def get_period(db: Session, period_id: int) -> Optional[Period]:
-    return db.query(Period).filter(Period.period_id == period_id).first()
+    return period_crud.get(db, period_id)
 
 
 def get_period_by_name(db: Session, name: str) -> Optional[Period]:
@@ -21,33 +26,24 @@ def get_periods(
     return query.offset(skip).limit(limit).all()
 
 
-def create_period(db: Session, period: PeriodCreate) -> Period:
-    db_period = Period(period_name=period.period_name)
-    db.add(db_period)
-    db.commit()
-    db.refresh(db_period)
-    return db_period
+def get_periods_page(
+        db: Session,
+        limit: int = 100,
+        cursor: Optional[str] = None
+) -> Dict[str, Any]:
+    # Курсорная пагинация по (period_name, period_id): глубокие страницы не дороже первой
+    query = db.query(Period)
+    return keyset_page(query, [Period.period_name, Period.period_id], limit, cursor)
 
 
-def update_period(db: Session, period_id: int, period: PeriodUpdate) -> Optional[Period]:
-    db_period = get_period(db, period_id)
-    if db_period is None:
-        return None
+def create_period(db: Session, period: PeriodCreate) -> Optional[Period]:
+    # None - период с таким названием уже есть
+    return period_crud.create(db, period)
 
-    update_data = period.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_period, key, value)
 
-    db.commit()
-    db.refresh(db_period)
-    return db_period
+def update_period(db: Session, period_id: int, period: PeriodUpdate) -> Optional[Period]:
+    return period_crud.update(db, period_id, period)
 
 
 def delete_period(db: Session, period_id: int) -> bool:
-    db_period = get_period(db, period_id)
-    if db_period is None:
-        return False
-
-    db.delete(db_period)
-    db.commit()
-    return True
+    return period_crud.delete(db, period_id)
@@ -1,11 +1,16 @@
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Dict, List, Any, Optional
+from app.core.pagination import keyset_page
+from app.api.v1.crud.base import CRUDBase
 from app.api.v1.models.cargo import Recipient
 from app.api.v1.schemas.cargo import RecipientCreate, RecipientUpdate
 
 
+recipient_crud = CRUDBase[Recipient, RecipientCreate, RecipientUpdate](Recipient)
+
+
 def get_recipient(db: Session, recipient_id: int) -> Optional[Recipient]:
-    return db.query(Recipient).filter(Recipient.id == recipient_id).first()
+    return recipient_crud.get(db, recipient_id)
 
 
 def get_recipients(
@@ -23,33 +28,29 @@ def get_recipients(
     return query.offset(skip).limit(limit).all()
 
 
-def create_recipient(db: Session, recipient: RecipientCreate) -> Recipient:
-    db_recipient = Recipient(**recipient.model_dump())
-    db.add(db_recipient)
-    db.commit()
-    db.refresh(db_recipient)
-    return db_recipient
+def get_recipients_page(
+        db: Session,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        client_id: Optional[int] = None,
+        is_active: Optional[bool] = None
+) -> Dict[str, Any]:
+    # Курсорная пагинация по (name, id): глубокие страницы не дороже первой
+    query = db.query(Recipient)
+    if client_id is not None:
+        query = query.filter(Recipient.client_id == client_id)
+    if is_active is not None:
+        query = query.filter(Recipient.is_active == is_active)
+    return keyset_page(query, [Recipient.name, Recipient.id], limit, cursor)
 
 
-def update_recipient(db: Session, recipient_id: int, recipient: RecipientUpdate) -> Optional[Recipient]:
-    db_recipient = get_recipient(db, recipient_id)
-    if db_recipient is None:
-        return None
+def create_recipient(db: Session, recipient: RecipientCreate) -> Recipient:
+    return recipient_crud.create(db, recipient)
 
-    update_data = recipient.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_recipient, key, value)
 
-    db.commit()
-    db.refresh(db_recipient)
-    return db_recipient
+def update_recipient(db: Session, recipient_id: int, recipient: RecipientUpdate) -> Optional[Recipient]:
+    return recipient_crud.update(db, recipient_id, recipient)
 
 
 def delete_recipient(db: Session, recipient_id: int) -> bool:
-    db_recipient = get_recipient(db, recipient_id)
-    if db_recipient is None:
-        return False
-
-    db.delete(db_recipient)
-    db.commit()
-    return True
+    return recipient_crud.delete(db, recipient_id)
@@ -0,0 +1,103 @@
+from starlette.concurrency import run_in_threadpool
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy.orm import Session
+from app.core.database import SessionLocal
+from app.api.v1.schemas.cargo import BatchCreate, BatchBulkUpdate, BulkDeactivate, BulkResult, PurgeStarted
+from app.services.batch_service import batch_service
+from app.services.bulk_service import BulkService, BulkPayloadError, NDJSON_MEDIA_TYPE
+from app.services.purge_service import purge_service, PurgeError
+from app.api.v1.auth.auth import get_current_user
+from app.api.v1.models.Users import User
+
+router = APIRouter()
+
+BULK_BODY = {
+    "requestBody": {
+        "content": {
+            "application/json": {"schema": {"type": "array", "items": {"type": "object"}}},
+            NDJSON_MEDIA_TYPE: {"schema": {"type": "string"}}
+        }
+    }
+}
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@router.post("/bulk", response_model=BulkResult, openapi_extra=BULK_BODY)
+async def bulk_create_batches(
+        request: Request,
+        upsert: bool = Query(False, description="Обновлять партии с существующим номером в периоде"),
+        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Создает партии из JSON массива или NDJSON (Content-Type: application/x-ndjson).
+
+    Элементы записываются пачками; ответ содержит результат по каждому элементу
+    (created, saved, exists, invalid, duplicate, failed).
+
+    - **upsert**: Обновлять партии с уже существующим номером в периоде вместо ошибки exists
+    """
+    try:
+        items = BulkService.parse_payload(await request.body(), request.headers.get("content-type", ""))
+    except BulkPayloadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return await run_in_threadpool(BulkService.create, db, batch_service, BatchCreate, items, upsert)
+
+
+@router.patch("/bulk", response_model=BulkResult, openapi_extra=BULK_BODY)
+async def bulk_update_batches(
+        request: Request,
+        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Изменяет партии: каждый элемент - id партии и изменяемые поля.
+    Места партий со сменой периода переносятся в секцию нового периода.
+    Ответ содержит результат по каждому элементу (updated, not_found, invalid, duplicate, failed).
+    """
+    try:
+        items = BulkService.parse_payload(await request.body(), request.headers.get("content-type", ""))
+    except BulkPayloadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return await run_in_threadpool(BulkService.update, db, batch_service, BatchBulkUpdate, items)
+
+
+@router.post("/bulk/deactivate", response_model=BulkResult)
+def bulk_deactivate_batches(
+        payload: BulkDeactivate,
+        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Деактивирует партии.
+
+    - **ids**: ID партий
+    """
+    return BulkService.deactivate(db, batch_service, payload.ids)
+
+
+@router.delete("/{batch_id}", response_model=PurgeStarted, status_code=status.HTTP_202_ACCEPTED)
+def delete_batch_endpoint(
+        batch_id: int,
+        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Удаляет партию с местами.
+
+    Места удаляются пачками в фоне; ход - в /api/v1/purge-jobs/{job_id}.
+
+    - **batch_id**: ID партии
+    """
+    try:
+        job = purge_service.start_batch_purge(db, batch_id)
+    except PurgeError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return {"success": True, "message": "Удаление партии запущено", "job_id": job.id}
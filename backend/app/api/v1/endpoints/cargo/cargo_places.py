@@ -0,0 +1,246 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from app.core.database import SessionLocal
+from app.core.pagination import InvalidCursorError
+from app.core.responses import FastJSONResponse, model_list_response, model_page_response
+from app.api.v1.schemas.cargo import (
+    CargoPlaceStatusUpdate,
+    CargoPlaceStatusResult,
+    CompositePlaceCreate,
+    CompositePlaceResponse,
+    CompositeTreeNode,
+    CargoSearchHit,
+    GridQuery,
+    GridResult,
+    CargoPlaceLookup
+)
+from app.api.v1.schemas.pagination import Page
+from app.api.v1.crud.cargo.composite_places import get_composite_place
+from app.services.closure_service import ClosureService, CompositeLinkError
+from app.services.archive_service import ArchiveService, ArchiveError
+from app.services.rollup_service import RollupService
+from app.services.search_service import SearchService
+from app.services.grid_service import GridService, GridQueryError
+from app.services.tracking_lookup import tracking_lookup, normalize_tracking_number
+from app.api.v1.auth.auth import get_current_user
+from app.api.v1.models.Users import User
+
+router = APIRouter()
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@router.get("/search", response_model=Page[CargoSearchHit])
+def search_cargo_places(
+        q: str = Query(..., min_length=2, max_length=200, description="Строка поиска"),
+        limit: int = Query(50, ge=1, le=200),
+        cursor: Optional[str] = Query(None, description="Курсор страницы из next_cursor"),
+        period_id: Optional[int] = Query(None, description="Только места периода"),
+        status_filter: Optional[str] = Query(None, alias="status", description="Только статус"),
+        include_inactive: bool = Query(False, description="Искать и среди неактивных мест"),
+        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Ищет места по номеру отслеживания, коду и названию клиента, получателю,
+    наименованию (переведенному и исходному) и примечаниям.
+
+    Результаты упорядочены по релевантности; следующая страница - по next_cursor.
+
+    - **q**: Строка поиска: слова, "фраза", -исключение; номер и код можно вводить частично
+    """
+    try:
+        page = SearchService.search_cargo(
+            db, q, limit=limit, cursor=cursor, period_id=period_id,
+            status=status_filter, include_inactive=include_inactive
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return model_page_response(CargoSearchHit, page)
+
+
+def _load_place(tracking_number: str) -> Optional[dict]:
+    db = SessionLocal()
+    try:
+        return tracking_lookup.load(db, tracking_number)
+    finally:
+        db.close()
+
+
+@router.get("/lookup/{tracking_number}", response_model=CargoPlaceLookup)
+async def lookup_cargo_place(
+        tracking_number: str,
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Место по номеру отслеживания.
+
+    Номер проверяется по формату, кэшу недавно найденных мест и фильтру Блума
+    всех номеров: неверные и несуществующие номера отклоняются без запроса к базе.
+
+    - **tracking_number**: Номер в формате XXX-000000-00
+    """
+    normalized = normalize_tracking_number(tracking_number)
+    if normalized is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Неверный формат номера отслеживания")
+    place = tracking_lookup.get_cached(normalized)
+    if place is None and tracking_lookup.might_exist(normalized):
+        place = await run_in_threadpool(_load_place, normalized)
+    if place is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Место не найдено")
+    return FastJSONResponse(place)
+
+
+@router.post("/grid", response_model=GridResult)
+def query_cargo_grid(
+        payload: GridQuery,
+        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Окно строк таблицы мест (с партией, клиентом и получателем) для виртуальной прокрутки.
+
+    Фильтры, сортировка и выборка окна выполняются в базе; для больших выборок
+    total - оценка планировщика (total_estimated = true).
+
+    - **columns**: Поля ответа; строки - массивы значений в этом порядке
+    - **filters**: Условия {field, op, value}, объединяются через AND
+    - **sort**: Порядок [{field, direction}]
+    - **offset**, **limit**: Окно строк
+    - **count**: auto, exact, estimated или none
+    """
+    try:
+        result = GridService.query(
+            db,
+            payload.columns,
+            [item.model_dump() for item in payload.filters],
+            [item.model_dump() for item in payload.sort],
+            payload.offset,
+            payload.limit,
+            payload.count
+        )
+    except GridQueryError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return FastJSONResponse(result)
+
+
+@router.patch("/status", response_model=CargoPlaceStatusResult)
+def update_status_endpoint(
+        payload: CargoPlaceStatusUpdate,
+        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Меняет статус группы мест. Сводные показатели обновляются в той же транзакции.
+
+    - **ids**: ID мест
+    - **status**: Новый статус
+    - **period_id**: Период мест (необязательно, ускоряет поиск)
+    """
+    try:
+        # Мест архивного периода нет в cargo_places; явно указанный период
+        # проверяется, чтобы запрос получил ошибку, а не 0 измененных мест
+        if payload.period_id is not None:
+            ArchiveService.check_writable(db, [payload.period_id])
+        updated = RollupService.change_status(db, payload.ids, payload.status, period_id=payload.period_id)
+        db.commit()
+    except ArchiveError as e:
+        db.rollback()
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception:
+        db.rollback()
+        raise
+    tracking_lookup.invalidate_places(payload.ids)
+    return {"updated": updated}
+
+
+@router.post("/composite-links", response_model=CompositePlaceResponse, status_code=status.HTTP_201_CREATED)
+def create_composite_link_endpoint(
+        composite: CompositePlaceCreate,
+        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Вкладывает место в сборное место.
+
+    - **cargo_place_id**: ID вкладываемого места
+    - **parent_id**: ID сборного (основного) места
+    - **period_id**: Период обоих мест
+    - **quantity**: Количество
+    """
+    try:
+        # Связь в архивном периоде не создается; период блокируется до фиксации
+        ArchiveService.check_writable(db, [composite.period_id])
+        db_composite = ClosureService.create_link(db, composite)
+    except (CompositeLinkError, ArchiveError) as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return CompositePlaceResponse(
+        id=db_composite.id,
+        cargo_place_id=db_composite.cargo_place_id,
+        parent_id=db_composite.parent_id,
+        period_id=db_composite.period_id,
+        quantity=db_composite.quantity,
+        created_at=db_composite.created_at
+    )
+
+
+@router.delete("/composite-links/{composite_id}", response_model=dict)
+def delete_composite_link_endpoint(
+        composite_id: int,
+        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Убирает место из сборного места.
+
+    - **composite_id**: ID связи
+    """
+    db_composite = get_composite_place(db, composite_id)
+    if db_composite is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Связь не найдена")
+    ClosureService.delete_link(db, db_composite)
+    return {"success": True, "message": "Место убрано из сборного места"}
+
+
+@router.get("/{tracking_number}/contents", response_model=List[CompositeTreeNode])
+def read_contents(
+        tracking_number: str,
+        period_id: Optional[int] = Query(None, description="Период места (ускоряет поиск)"),
+        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Место и все вложенные в него места на любой глубине.
+
+    - **tracking_number**: Номер отслеживания места
+    """
+    nodes = ClosureService.get_subtree(db, tracking_number, period_id=period_id)
+    if not nodes:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Место не найдено")
+    return model_list_response(CompositeTreeNode, nodes)
+
+
+@router.get("/{tracking_number}/path", response_model=List[CompositeTreeNode])
+def read_path(
+        tracking_number: str,
+        period_id: Optional[int] = Query(None, description="Период места (ускоряет поиск)"),
+        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Цепочка сборных мест, в которые вложено место; первым идет место верхнего уровня.
+
+    - **tracking_number**: Номер отслеживания места
+    """
+    nodes = ClosureService.get_path(db, tracking_number, period_id=period_id)
+    if not nodes:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Место не найдено")
+    return model_list_response(CompositeTreeNode, nodes)
@@ -0,0 +1,81 @@
+from starlette.concurrency import run_in_threadpool
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.orm import Session
+from app.core.database import SessionLocal
+from app.api.v1.schemas.cargo import ClientCreate, ClientBulkUpdate, BulkDeactivate, BulkResult
+from app.services.client_service import client_service
+from app.services.bulk_service import BulkService, BulkPayloadError, NDJSON_MEDIA_TYPE
+from app.api.v1.auth.auth import get_current_user
+from app.api.v1.models.Users import User
+
+router = APIRouter()
+
+BULK_BODY = {
+    "requestBody": {
+        "content": {
+            "application/json": {"schema": {"type": "array", "items": {"type": "object"}}},
+            NDJSON_MEDIA_TYPE: {"schema": {"type": "string"}}
+        }
+    }
+}
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@router.post("/bulk", response_model=BulkResult, openapi_extra=BULK_BODY)
+async def bulk_create_clients(
+        request: Request,
+        upsert: bool = Query(False, description="Обновлять клиентов с существующим кодом"),
+        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Создает клиентов из JSON массива или NDJSON (Content-Type: application/x-ndjson).
+
+    Элементы записываются пачками; ответ содержит результат по каждому элементу
+    (created, saved, exists, invalid, duplicate, failed).
+
+    - **upsert**: Обновлять клиентов с уже существующим кодом вместо ошибки exists
+    """
+    try:
+        items = BulkService.parse_payload(await request.body(), request.headers.get("content-type", ""))
+    except BulkPayloadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return await run_in_threadpool(BulkService.create, db, client_service, ClientCreate, items, upsert)
+
+
+@router.patch("/bulk", response_model=BulkResult, openapi_extra=BULK_BODY)
+async def bulk_update_clients(
+        request: Request,
+        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Изменяет клиентов: каждый элемент - id клиента и изменяемые поля.
+    Ответ содержит результат по каждому элементу (updated, not_found, invalid, duplicate, failed).
+    """
+    try:
+        items = BulkService.parse_payload(await request.body(), request.headers.get("content-type", ""))
+    except BulkPayloadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return await run_in_threadpool(BulkService.update, db, client_service, ClientBulkUpdate, items)
+
+
+@router.post("/bulk/deactivate", response_model=BulkResult)
+def bulk_deactivate_clients(
+        payload: BulkDeactivate,
+        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Деактивирует клиентов.
+
+    - **ids**: ID клиентов
+    """
+    return BulkService.deactivate(db, client_service, payload.ids)
@@ -1,23 +1,106 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
-from typing import List, Dict, Any
+from contextlib import AsyncExitStack
+from starlette.concurrency import run_in_threadpool
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Request, status
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Any, Optional
+from app.core.database import SessionLocal
+from app.core.responses import FastJSONResponse, ClosingStreamingResponse
+from app.core.columnar import encode_columnar, COLUMNAR_FORMAT
 from app.api.v1.auth.auth import get_current_user
 from app.api.v1.models.Users import User
-from app.services.excel_service import ExcelService
+from app.api.v1.schemas.cargo import BatchIngestResult
+from app.services.excel_service import ExcelService, ExcelUploadError, to_ndjson_line
+from app.services.progress_service import (
+    UploadProgress, ProgressNotFoundError, progress_registry, stream_progress_events
+)
+from app.services.ingest_service import IngestService, IngestError
 
 router = APIRouter()
 
-@router.post("/upload", response_model=List[Dict[str, Any]])
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def _wants_ndjson(request: Request, response_format: Optional[str]) -> bool:
+    """Определяет, запросил ли клиент потоковый ответ в формате NDJSON."""
+    if response_format is not None:
+        return response_format.lower() == "ndjson"
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+async def _stream_ndjson(
+        file: UploadFile,
+        period_id: str,
+        progress: Optional[UploadProgress] = None,
+        uploader: Optional[str] = None
+) -> StreamingResponse:
+    """
+    Формирует потоковый ответ NDJSON с результатом парсинга.
+    Буфер с файлом и слот парсинга живут до конца отдачи ответа и освобождаются
+    при его закрытии, даже если клиент отключился до начала потока.
+    """
+    stack = AsyncExitStack()
+    try:
+        if progress is not None:
+            progress.phase('receiving')
+        upload = await stack.enter_async_context(ExcelService.spooled_upload(file))
+        records = await ExcelService.open_record_stream(upload, stack, period_id, progress, uploader)
+    except ExcelUploadError as e:
+        await stack.aclose()
+        if progress is not None:
+            progress.finish(False, detail=str(e))
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers)
+    except BaseException:
+        await stack.aclose()
+        raise
+
+    if records is None:
+        await stack.aclose()
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Не удалось обработать Excel файл. Проверьте формат и содержимое файла."
+        )
+
+    async def body():
+        async for record in records:
+            yield to_ndjson_line(record)
+
+    return ClosingStreamingResponse(body(), on_close=stack.aclose, media_type=NDJSON_MEDIA_TYPE)
+
+
+@router.post(
+    "/upload",
+    response_model=List[Dict[str, Any]],
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}}
+)
 async def upload_excel_file(
+        request: Request,
         file: UploadFile = File(...),
         period_id: str = None,
+        response_format: Optional[str] = Query(
+            None,
+            alias="format",
+            description="Формат ответа: json (по умолчанию), ndjson (потоковая отдача строк) "
+                        "или columnar (столбцовый формат)"
+        ),
+        upload_id: Optional[str] = Query(
+            None,
+            min_length=8,
+            max_length=64,
+            description="Идентификатор загрузки для отслеживания хода обработки через /progress/{upload_id}"
+        ),
         current_user: User = Depends(get_current_user)
 ):
     """
     Загружает и парсит Excel файл с данными о грузах.
 
     Args:
+        request: HTTP-запрос (для согласования формата по заголовку Accept)
         file: Загруженный Excel файл
         period_id: ID периода
+        response_format: Формат ответа; при значении ndjson или заголовке
+            Accept: application/x-ndjson строки отдаются потоком по мере разбора,
+            при значении columnar - одним объектом в столбцовом формате
+        upload_id: Идентификатор загрузки (например, UUID), сгенерированный клиентом
         current_user: Текущий пользователь
 
     Returns:
@@ -33,9 +116,139 @@ async def upload_excel_file(
     # Используем period_id или значение по умолчанию
     period_id = period_id or "unknown"
 
+    progress = progress_registry.start(upload_id, current_user.login) if upload_id else None
+
+    if _wants_ndjson(request, response_format):
+        return await _stream_ndjson(file, period_id, progress, current_user.login)
+
     # Парсим Excel файл
     excel_service = ExcelService()
-    parsed_data = await excel_service.parse_cargo_excel(file, period_id)
+    try:
+        parsed_data = await excel_service.parse_cargo_excel(file, period_id, progress, current_user.login)
+    except ExcelUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers)
+
+    if not parsed_data:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Не удалось обработать Excel файл. Проверьте формат и содержимое файла."
+        )
+
+    # Строки уже сформированы парсером: отдаем их без повторной проверки по response_model
+    if (response_format or "").lower() == COLUMNAR_FORMAT:
+        return FastJSONResponse(encode_columnar(parsed_data))
+    return FastJSONResponse(parsed_data)
+
+
+@router.get("/progress/{upload_id}", response_class=StreamingResponse)
+async def upload_progress(
+        upload_id: str,
+        request: Request,
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Поток server-sent events с ходом обработки загрузки.
+
+    События: phase (смена фазы: receiving, received, loading, structure, rows),
+    rows (разобрано строк из общего числа, попадания и промахи кэша переводов),
+    warning (некритичные проблемы), done или failed (окончание обработки).
+    Подписаться можно до начала загрузки файла.
+
+    Args:
+        upload_id: Идентификатор загрузки, переданный в /upload
+        request: HTTP-запрос (для отслеживания отключения клиента)
+        current_user: Текущий пользователь
+
+    Returns:
+        StreamingResponse: Поток text/event-stream
+    """
+    try:
+        progress = progress_registry.get_or_create(upload_id, current_user.login)
+    except ProgressNotFoundError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return StreamingResponse(
+        stream_progress_events(progress, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/upload/bulk", response_model=Dict[str, Any])
+async def upload_excel_files_bulk(
+        files: List[UploadFile] = File(...),
+        period_id: str = None,
+        response_format: Optional[str] = Query(
+            None,
+            alias="format",
+            description="Формат строк каждого файла: json (по умолчанию) или columnar (столбцовый формат)"
+        ),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Загружает и парсит несколько Excel файлов и/или ZIP-архивов с ними.
+
+    Args:
+        files: Загруженные Excel файлы или ZIP-архивы
+        period_id: ID периода
+        response_format: Формат строк каждого файла (json или columnar)
+        current_user: Текущий пользователь
+
+    Returns:
+        Dict[str, Any]: Результаты и ошибки по каждому файлу и общая сводная информация по всем партиям
+    """
+    period_id = period_id or "unknown"
+
+    try:
+        result = await ExcelService.parse_bulk(files, period_id, current_user.login)
+    except ExcelUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers)
+
+    if (response_format or "").lower() == COLUMNAR_FORMAT:
+        for item in result['files']:
+            item['rows'] = encode_columnar(item['rows'])
+    return FastJSONResponse(result)
+
+
+def _ingest_rows(period_id: int, rows: List[Dict[str, Any]], dry_run: bool) -> Dict[str, Any]:
+    db = SessionLocal()
+    try:
+        return IngestService.ingest_batch(db, period_id, rows, dry_run=dry_run)
+    finally:
+        db.close()
+
+
+@router.post("/ingest", response_model=BatchIngestResult)
+async def ingest_excel_file(
+        file: UploadFile = File(...),
+        period_id: int = Query(..., description="ID периода, в который записывается партия"),
+        dry_run: bool = Query(False, description="Только показать изменения, ничего не записывая"),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Загружает Excel файл, парсит его и записывает партию и ее грузовые места в базу.
+    Повторная загрузка баланса применяет только изменения: новые строки добавляются,
+    измененные обновляются, пропавшие из файла места помечаются неактивными.
+
+    Args:
+        file: Загруженный Excel файл
+        period_id: ID периода
+        dry_run: Вернуть список изменений без записи в базу
+        current_user: Текущий пользователь
+
+    Returns:
+        BatchIngestResult: Партия и число добавленных, обновленных, удаленных
+            и неизмененных мест; при dry_run - также список изменений
+    """
+    if not file.filename.endswith(('.xlsx', '.xls', '.xlsm')):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Загруженный файл должен быть в формате Excel (.xlsx, .xls, .xlsm)"
+        )
+
+    try:
+        parsed_data = await ExcelService.parse_cargo_excel(file, str(period_id), uploader=current_user.login)
+    except ExcelUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers)
 
     if not parsed_data:
         raise HTTPException(
@@ -43,4 +256,8 @@ async def upload_excel_file(
             detail="Не удалось обработать Excel файл. Проверьте формат и содержимое файла."
         )
 
-    return parsed_data
+    try:
+        # Запись в базу блокирующая, выполняем ее в пуле потоков
+        return await run_in_threadpool(_ingest_rows, period_id, parsed_data, dry_run)
+    except IngestError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
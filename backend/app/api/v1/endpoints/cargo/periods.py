@@ -1,16 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Union
 from app.core.database import SessionLocal
-from app.api.v1.schemas.cargo import PeriodCreate, PeriodUpdate, PeriodResponse
+from app.core.pagination import InvalidCursorError
+from app.core.responses import model_list_response, model_page_response
+from app.api.v1.schemas.cargo import PeriodCreate, PeriodUpdate, PeriodResponse, PurgeStarted
+from app.api.v1.schemas.pagination import Page
 from app.api.v1.crud.cargo.periods import (
     get_period,
-    get_period_by_name,
     get_periods,
-    create_period,
-    update_period,
-    delete_period
+    get_periods_page,
+    update_period
 )
+from app.services.period_service import period_service
+from app.services.purge_service import purge_service, PurgeError
 from app.api.v1.auth.auth import get_current_user
 from app.api.v1.models.Users import User
 
@@ -37,22 +40,24 @@ def create_period_endpoint(
 
     - **period_name**: Название периода (год, например "2024")
     """
-    # Проверяем, существует ли период с таким названием
-    db_period = get_period_by_name(db, name=period.period_name)
-    if db_period:
+    # Период создается одним INSERT ... ON CONFLICT DO NOTHING: без предварительной
+    # проверки названия, которую параллельный запрос мог бы опередить; секция
+    # мест периода создается в той же транзакции
+    db_period = period_service.create(db, period)
+    if db_period is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Период с таким названием уже существует"
         )
-
-    # Создаем новый период
-    return create_period(db=db, period=period)
+    return db_period
 
 
-@router.get("/", response_model=List[PeriodResponse])
+@router.get("/", response_model=Union[List[PeriodResponse], Page[PeriodResponse]])
 def read_periods(
         skip: int = 0,
-        limit: int = 100,
+        limit: int = Query(100, ge=1, le=1000),
+        cursor: Optional[str] = Query(None, description="Курсор страницы из next_cursor/prev_cursor"),
+        pagination: str = Query("offset", pattern="^(offset|cursor)$", description="offset или cursor"),
         db: Session = Depends(get_db),
         current_user: User = Depends(get_current_user),
         local_kw: Optional[str] = Query(None, description="Локальный ключевой параметр (необязательный)")
@@ -60,11 +65,20 @@ def read_periods(
     """
     Получает список периодов.
 
-    - **skip**: Количество записей для пропуска (пагинация)
+    - **skip**: Количество записей для пропуска (пагинация offset)
     - **limit**: Максимальное количество записей для возврата
+    - **cursor**: Курсор страницы; с ним или с pagination=cursor ответ - страница
+      {items, next_cursor, prev_cursor, limit} в порядке названий периодов
     """
+    if cursor is not None or pagination == "cursor":
+        try:
+            page = get_periods_page(db, limit=limit, cursor=cursor)
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=e.status_code, detail=str(e))
+        return model_page_response(PeriodResponse, page)
+
     periods = get_periods(db, skip=skip, limit=limit)
-    return periods
+    return model_list_response(PeriodResponse, periods)
 
 
 @router.get("/{period_id}", response_model=PeriodResponse)
@@ -105,7 +119,7 @@ def update_period_endpoint(
     return db_period
 
 
-@router.delete("/{period_id}", response_model=dict)
+@router.delete("/{period_id}", response_model=PurgeStarted, status_code=status.HTTP_202_ACCEPTED)
 def delete_period_endpoint(
         period_id: int,
         db: Session = Depends(get_db),
@@ -113,11 +127,14 @@ def delete_period_endpoint(
         local_kw: Optional[str] = Query(None, description="Локальный ключевой параметр (необязательный)")
 ):
     """
-    Удаляет период.
+    Удаляет период с партиями и местами.
+
+    Удаление выполняется в фоне; ход - в /api/v1/purge-jobs/{job_id}.
 
     - **period_id**: ID периода для удаления
     """
-    success = delete_period(db, period_id=period_id)
-    if not success:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Период не найден")
-    return {"success": True, "message": "Период успешно удален"}
+    try:
+        job = purge_service.start_period_purge(db, period_id)
+    except PurgeError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return {"success": True, "message": "Удаление периода запущено", "job_id": job.id}
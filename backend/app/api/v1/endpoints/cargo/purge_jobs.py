@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from app.api.v1.schemas.cargo import PurgeJobResponse
+from app.services.purge_service import purge_service
+from app.api.v1.auth.auth import get_current_user
+from app.api.v1.models.Users import User
+
+router = APIRouter()
+
+
+@router.get("/{job_id}", response_model=PurgeJobResponse)
+def read_purge_job(
+        job_id: str,
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Ход удаления периода или партии.
+
+    - **job_id**: ID задания из ответа на удаление
+    """
+    job = purge_service.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Задание не найдено")
+    return job.to_dict()
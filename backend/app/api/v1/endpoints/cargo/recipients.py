@@ -0,0 +1,78 @@
+from starlette.concurrency import run_in_threadpool
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.orm import Session
+from app.core.database import SessionLocal
+from app.api.v1.schemas.cargo import RecipientCreate, RecipientBulkUpdate, BulkDeactivate, BulkResult
+from app.api.v1.crud.cargo.recipients import recipient_crud
+from app.services.bulk_service import BulkService, BulkPayloadError, NDJSON_MEDIA_TYPE
+from app.api.v1.auth.auth import get_current_user
+from app.api.v1.models.Users import User
+
+router = APIRouter()
+
+BULK_BODY = {
+    "requestBody": {
+        "content": {
+            "application/json": {"schema": {"type": "array", "items": {"type": "object"}}},
+            NDJSON_MEDIA_TYPE: {"schema": {"type": "string"}}
+        }
+    }
+}
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@router.post("/bulk", response_model=BulkResult, openapi_extra=BULK_BODY)
+async def bulk_create_recipients(
+        request: Request,
+        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Создает получателей из JSON массива или NDJSON (Content-Type: application/x-ndjson).
+
+    Элементы записываются пачками; ответ содержит результат по каждому элементу
+    (created, invalid, failed - например, для несуществующего client_id).
+    """
+    try:
+        items = BulkService.parse_payload(await request.body(), request.headers.get("content-type", ""))
+    except BulkPayloadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return await run_in_threadpool(BulkService.create, db, recipient_crud, RecipientCreate, items)
+
+
+@router.patch("/bulk", response_model=BulkResult, openapi_extra=BULK_BODY)
+async def bulk_update_recipients(
+        request: Request,
+        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Изменяет получателей: каждый элемент - id получателя и изменяемые поля.
+    Ответ содержит результат по каждому элементу (updated, not_found, invalid, duplicate, failed).
+    """
+    try:
+        items = BulkService.parse_payload(await request.body(), request.headers.get("content-type", ""))
+    except BulkPayloadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return await run_in_threadpool(BulkService.update, db, recipient_crud, RecipientBulkUpdate, items)
+
+
+@router.post("/bulk/deactivate", response_model=BulkResult)
+def bulk_deactivate_recipients(
+        payload: BulkDeactivate,
+        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Деактивирует получателей.
+
+    - **ids**: ID получателей
+    """
+    return BulkService.deactivate(db, recipient_crud, payload.ids)
@@ -0,0 +1,77 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from app.core.database import SessionLocal
+from app.core.responses import model_list_response
+from app.api.v1.schemas.cargo import RollupSummaryRow
+from app.api.v1.crud.cargo.periods import get_period
+from app.api.v1.auth.auth import get_current_user
+from app.api.v1.models.Users import User
+from app.services.rollup_service import RollupService, ROLLUP_DIMENSIONS
+
+router = APIRouter()
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _period_summary(
+        db: Session,
+        period_id: int,
+        group_by: Optional[str],
+        batch_id: Optional[int],
+        client_id: Optional[int],
+        status_filter: Optional[str]
+):
+    if get_period(db, period_id=period_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Период не найден")
+    rows = RollupService.get_summary(
+        db, period_id, group_by=group_by, batch_id=batch_id, client_id=client_id, status=status_filter
+    )
+    return model_list_response(RollupSummaryRow, rows)
+
+
+@router.get("/periods/{period_id}", response_model=List[RollupSummaryRow])
+def read_period_totals(
+        period_id: int,
+        batch_id: Optional[int] = Query(None, description="Только партия"),
+        client_id: Optional[int] = Query(None, description="Только клиент (0 - места без клиента)"),
+        status_filter: Optional[str] = Query(None, alias="status", description="Только статус"),
+        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Итоговые показатели периода: места, сборные места, коробки, вес, объем и сумма.
+
+    - **period_id**: ID периода
+    """
+    return _period_summary(db, period_id, None, batch_id, client_id, status_filter)
+
+
+@router.get("/periods/{period_id}/{dimension}", response_model=List[RollupSummaryRow])
+def read_period_summary(
+        period_id: int,
+        dimension: str,
+        batch_id: Optional[int] = Query(None, description="Только партия"),
+        client_id: Optional[int] = Query(None, description="Только клиент (0 - места без клиента)"),
+        status_filter: Optional[str] = Query(None, alias="status", description="Только статус"),
+        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Показатели периода в разрезе партий, клиентов или статусов.
+
+    - **period_id**: ID периода
+    - **dimension**: batch, client или status
+    """
+    if dimension not in ROLLUP_DIMENSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Разрез должен быть одним из: {', '.join(ROLLUP_DIMENSIONS)}"
+        )
+    return _period_summary(db, period_id, dimension, batch_id, client_id, status_filter)
@@ -0,0 +1,143 @@
+from starlette.concurrency import run_in_threadpool
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request, status
+from typing import List, Dict, Any, Optional
+from app.core.responses import FastJSONResponse
+from app.core.columnar import encode_columnar, COLUMNAR_FORMAT
+from app.api.v1.auth.auth import get_current_user
+from app.api.v1.models.Users import User
+from app.api.v1.schemas.uploads import ChunkedUploadCreate, ChunkedUploadStatus
+from app.services.excel_service import ExcelService, ExcelUploadError
+from app.services.chunked_upload_service import chunked_upload_service
+from app.services.progress_service import progress_registry
+
+router = APIRouter()
+
+
+@router.post("/", response_model=ChunkedUploadStatus, status_code=status.HTTP_201_CREATED)
+def create_upload_session(
+        upload: ChunkedUploadCreate,
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Создает сессию загрузки Excel файла по частям.
+
+    - **filename**: Имя файла
+    - **total_size**: Полный размер файла в байтах
+    - **sha256**: SHA-256 всего файла для проверки при завершении (необязательно)
+    """
+    if not upload.filename.endswith(('.xlsx', '.xls', '.xlsm')):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Загруженный файл должен быть в формате Excel (.xlsx, .xls, .xlsm)"
+        )
+    try:
+        return chunked_upload_service.init_session(
+            upload.filename, upload.total_size, current_user.login, upload.sha256
+        )
+    except ExcelUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers)
+
+
+@router.put("/{upload_id}/chunks", response_model=ChunkedUploadStatus)
+async def put_upload_chunk(
+        upload_id: str,
+        request: Request,
+        offset: int = Query(..., ge=0, description="Смещение части в файле"),
+        chunk_sha256: Optional[str] = Header(None, alias="X-Chunk-SHA256"),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Принимает часть файла. Тело запроса — байты части.
+
+    - **offset**: Смещение части в файле
+    - **X-Chunk-SHA256**: SHA-256 части для проверки целостности (рекомендуется)
+    """
+    try:
+        return await chunked_upload_service.put_chunk(
+            upload_id, current_user.login, offset, request.stream(), chunk_sha256
+        )
+    except ExcelUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers)
+
+
+@router.get("/{upload_id}", response_model=ChunkedUploadStatus)
+def read_upload_status(
+        upload_id: str,
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Возвращает статус сессии: принятые части и недостающие диапазоны байтов.
+    После обрыва связи клиент досылает только недостающие диапазоны.
+    """
+    try:
+        return chunked_upload_service.get_status(upload_id, current_user.login)
+    except ExcelUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers)
+
+
+@router.post("/{upload_id}/complete", response_model=List[Dict[str, Any]])
+async def complete_upload(
+        upload_id: str,
+        period_id: str = None,
+        response_format: Optional[str] = Query(
+            None,
+            alias="format",
+            description="Формат ответа: json (по умолчанию) или columnar (столбцовый формат)"
+        ),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Завершает загрузку: собирает файл из частей и парсит его.
+    Ход обработки доступен через /api/v1/excel/progress/{upload_id}.
+
+    - **upload_id**: ID сессии
+    - **period_id**: ID периода
+    - **format**: json (по умолчанию) или columnar
+    """
+    period_id = period_id or "unknown"
+
+    try:
+        reader = await run_in_threadpool(chunked_upload_service.open_completed, upload_id, current_user.login)
+    except ExcelUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers)
+
+    progress = progress_registry.start(upload_id, current_user.login)
+    try:
+        async with ExcelService.spooled_upload(reader) as upload:
+            await run_in_threadpool(
+                chunked_upload_service.verify_checksum, upload_id, current_user.login, upload.sha256
+            )
+            parsed_data = await ExcelService.parse_spooled(upload, period_id, progress, current_user.login)
+    except ExcelUploadError as e:
+        progress.finish(False, detail=str(e))
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers)
+    finally:
+        reader.close()
+
+    # Файл собран и обработан, части больше не нужны
+    await run_in_threadpool(chunked_upload_service.delete_session, upload_id, current_user.login)
+
+    if not parsed_data:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Не удалось обработать Excel файл. Проверьте формат и содержимое файла."
+        )
+
+    if (response_format or "").lower() == COLUMNAR_FORMAT:
+        return FastJSONResponse(encode_columnar(parsed_data))
+    return FastJSONResponse(parsed_data)
+
+
+@router.delete("/{upload_id}", response_model=dict)
+def delete_upload_session(
+        upload_id: str,
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Отменяет загрузку и удаляет принятые части.
+    """
+    try:
+        chunked_upload_service.delete_session(upload_id, current_user.login)
+    except ExcelUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers)
+    return {"success": True, "message": "Загрузка отменена"}
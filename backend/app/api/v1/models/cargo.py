@@ -1,6 +1,7 @@
 from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, Date, Text, CheckConstraint, \
-    UniqueConstraint, Index, TIMESTAMP, text
-from sqlalchemy.orm import relationship
+    UniqueConstraint, ForeignKeyConstraint, Index, Computed, TIMESTAMP, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 from app.core.database import Base
 
 
@@ -9,9 +10,12 @@ class Period(Base):
 
     period_id = Column(Integer, primary_key=True)
     period_name = Column(String(4), nullable=False, unique=True)
+    # Места периода перенесены в архив (см. ArchiveService)
+    archived_at = Column(TIMESTAMP(timezone=True))
 
     # Отношения
-    batches = relationship("Batch", back_populates="period", cascade="all, delete-orphan")
+    # Партии и их места удаляются базой (ON DELETE CASCADE), без загрузки в сессию
+    batches = relationship("Batch", back_populates="period", cascade="all, delete-orphan", passive_deletes=True)
 
     # Ограничения
     __table_args__ = (
@@ -24,13 +28,13 @@ class Batch(Base):
 
     id = Column(Integer, primary_key=True)
     batch_number = Column(String(20), nullable=False)
-    period_id = Column(Integer, ForeignKey("periods.period_id", ondelete="RESTRICT"), nullable=False)
+    period_id = Column(Integer, ForeignKey("periods.period_id", ondelete="CASCADE"), nullable=False)
     is_active = Column(Boolean, nullable=False, server_default=text("TRUE"))
     created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("CURRENT_TIMESTAMP"))
 
     # Отношения
     period = relationship("Period", back_populates="batches")
-    cargo_places = relationship("CargoPlace", back_populates="batch", cascade="all, delete-orphan")
+    cargo_places = relationship("CargoPlace", back_populates="batch", cascade="all, delete-orphan", passive_deletes=True)
 
     # Ограничения
     __table_args__ = (
@@ -63,6 +67,8 @@ class Client(Base):
         CheckConstraint("code ~ '^[A-Z0-9]{3,10}$'", name="check_client_code_format"),
         Index("idx_clients_code", code),
         Index("idx_clients_name", name),
+        Index("idx_clients_code_trgm", code, postgresql_using="gin", postgresql_ops={"code": "gin_trgm_ops"}),
+        Index("idx_clients_name_trgm", name, postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
     )
 
 
@@ -87,6 +93,7 @@ class Recipient(Base):
     __table_args__ = (
         Index("idx_recipients_client_id", client_id),
         Index("idx_recipients_name", name),
+        Index("idx_recipients_name_trgm", name, postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
     )
 
 
@@ -129,12 +136,25 @@ class PaymentMethod(Base):
     )
 
 
+# Поисковый вектор места: номер и код клиента, наименование (переведенное
+# и исходное) и примечания с убывающими весами
+CARGO_SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('simple', coalesce(tracking_number, '') || ' ' || coalesce(client_code, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(description, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(description_original, '')), 'C') || "
+    "setweight(to_tsvector('russian', coalesce(notes, '')), 'D')"
+)
+
+
 class CargoPlace(Base):
     __tablename__ = "cargo_places"
 
-    id = Column(Integer, primary_key=True)
-    tracking_number = Column(String(20), nullable=False, unique=True)
-    batch_id = Column(Integer, ForeignKey("batches.id", ondelete="SET NULL"))
+    # Таблица секционирована по периоду (LIST), поэтому period_id входит
+    # в первичный ключ и уникальные ограничения
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    period_id = Column(Integer, ForeignKey("periods.period_id", ondelete="RESTRICT"), primary_key=True)
+    tracking_number = Column(String(20), nullable=False)
+    batch_id = Column(Integer, ForeignKey("batches.id", ondelete="CASCADE"))
     client_id = Column(Integer, ForeignKey("clients.id", ondelete="SET NULL"))
     recipient_id = Column(Integer, ForeignKey("recipients.id", ondelete="SET NULL"))
     driver_id = Column(Integer, ForeignKey("drivers.id", ondelete="SET NULL"))
@@ -147,6 +167,20 @@ class CargoPlace(Base):
     declared_value = Column(Float, nullable=False, server_default=text("0"))
     shipping_cost = Column(Float, nullable=False, server_default=text("0"))
 
+    # Данные строки баланса
+    row_seq = Column(Integer)
+    row_key = Column(String(32))
+    row_hash = Column(String(32))
+    client_code = Column(String(50))
+    places_count = Column(Integer)
+    boxes_count = Column(Integer)
+    units_count = Column(Integer)
+    cubic_tariff = Column(Float)
+    freight_tariff = Column(Float)
+    insurance_percent = Column(Float)
+    insurance_cost = Column(Float)
+    packaging_cost = Column(Float)
+
     # Даты
     created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("CURRENT_TIMESTAMP"))
     departure_date = Column(Date)
@@ -155,6 +189,8 @@ class CargoPlace(Base):
 
     # Дополнительная информация
     description = Column(Text)
+    # Наименование до перевода (как в балансе)
+    description_original = Column(Text)
     notes = Column(Text)
     is_fragile = Column(Boolean, nullable=False, server_default=text("FALSE"))
     is_oversized = Column(Boolean, nullable=False, server_default=text("FALSE"))
@@ -165,6 +201,9 @@ class CargoPlace(Base):
     is_delivered = Column(Boolean, nullable=False, server_default=text("FALSE"))
     is_active = Column(Boolean, nullable=False, server_default=text("TRUE"))
 
+    # Поиск (см. SearchService); вектор вычисляется базой и не загружается с местом
+    search_vector = deferred(Column(TSVECTOR, Computed(CARGO_SEARCH_VECTOR_SQL, persisted=True)))
+
     # Отношения
     batch = relationship("Batch", back_populates="cargo_places")
     client = relationship("Client", back_populates="cargo_places")
@@ -177,13 +216,15 @@ class CargoPlace(Base):
         "CompositePlace",
         back_populates="cargo_place",
         cascade="all, delete-orphan",
-        foreign_keys="CompositePlace.cargo_place_id"
+        foreign_keys="[CompositePlace.cargo_place_id, CompositePlace.period_id]",
+        overlaps="parent_composite_places,parent"
     )
 
     parent_composite_places = relationship(
         "CompositePlace",
         cascade="all, delete-orphan",
-        foreign_keys="CompositePlace.parent_id"
+        foreign_keys="[CompositePlace.parent_id, CompositePlace.period_id]",
+        overlaps="composite_places,cargo_place"
     )
 
     # Ограничения и индексы
@@ -192,13 +233,49 @@ class CargoPlace(Base):
         CheckConstraint("status IN ('Создан', 'Ожидает отправки', 'В пути', 'Доставлен', 'Отменен')",
                         name="check_status_values"),
         CheckConstraint("priority IN ('Обычный', 'Важный', 'Срочный')", name="check_priority_values"),
-        Index("idx_cargo_places_tracking_number", tracking_number),
+        UniqueConstraint("tracking_number", "period_id", name="uq_cargo_places_tracking_period"),
         Index("idx_cargo_places_batch_id", batch_id),
+        Index("idx_cargo_places_batch_id_row_seq", batch_id, row_seq),
         Index("idx_cargo_places_client_id", client_id),
         Index("idx_cargo_places_recipient_id", recipient_id),
         Index("idx_cargo_places_status", status),
         Index("idx_cargo_places_departure_date", departure_date),
         Index("idx_cargo_places_estimated_arrival_date", estimated_arrival_date),
+        Index("idx_cargo_places_search_vector", search_vector, postgresql_using="gin"),
+        Index("idx_cargo_places_tracking_number_trgm", tracking_number, postgresql_using="gin",
+              postgresql_ops={"tracking_number": "gin_trgm_ops"}),
+        Index("idx_cargo_places_client_code_trgm", client_code, postgresql_using="gin",
+              postgresql_ops={"client_code": "gin_trgm_ops"}),
+        Index("idx_cargo_places_description_trgm", description, postgresql_using="gin",
+              postgresql_ops={"description": "gin_trgm_ops"}),
+        Index("idx_cargo_places_description_original_trgm", description_original, postgresql_using="gin",
+              postgresql_ops={"description_original": "gin_trgm_ops"}),
+        {'postgresql_partition_by': 'LIST (period_id)'},
+    )
+
+
+class CargoRollup(Base):
+    """Сводные показатели активных мест по партии, клиенту и статусу (см. RollupService)."""
+    __tablename__ = "cargo_rollups"
+
+    batch_id = Column(Integer, ForeignKey("batches.id", ondelete="CASCADE"), primary_key=True)
+    # 0 - места без клиента
+    client_id = Column(Integer, primary_key=True)
+    status = Column(String(50), primary_key=True)
+    period_id = Column(Integer, ForeignKey("periods.period_id", ondelete="CASCADE"), nullable=False)
+
+    places = Column(Integer, nullable=False, server_default=text("0"))
+    composite_places = Column(Integer, nullable=False, server_default=text("0"))
+    boxes = Column(Integer, nullable=False, server_default=text("0"))
+    weight = Column(Float, nullable=False, server_default=text("0"))
+    volume = Column(Float, nullable=False, server_default=text("0"))
+    amount = Column(Float, nullable=False, server_default=text("0"))
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("CURRENT_TIMESTAMP"))
+
+    # Индексы
+    __table_args__ = (
+        Index("idx_cargo_rollups_period_client", period_id, client_id),
+        Index("idx_cargo_rollups_period_status", period_id, status),
     )
 
 
@@ -206,29 +283,78 @@ class CompositePlace(Base):
     __tablename__ = "composite_places"
 
     id = Column(Integer, primary_key=True)
-    cargo_place_id = Column(Integer, ForeignKey("cargo_places.id", ondelete="CASCADE"), nullable=False)
-    parent_id = Column(Integer, ForeignKey("cargo_places.id", ondelete="CASCADE"), nullable=False)
+    cargo_place_id = Column(Integer, nullable=False)
+    parent_id = Column(Integer, nullable=False)
+    # Период обоих мест: внешние ключи на секционированную таблицу включают ключ секционирования
+    period_id = Column(Integer, nullable=False)
     quantity = Column(Integer, nullable=False, server_default=text("1"))
     created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("CURRENT_TIMESTAMP"))
 
     # Отношения с явным указанием внешних ключей
     cargo_place = relationship(
         "CargoPlace",
-        foreign_keys=[cargo_place_id],
-        back_populates="composite_places"
+        foreign_keys=[cargo_place_id, period_id],
+        back_populates="composite_places",
+        overlaps="parent,parent_composite_places"
     )
 
     parent = relationship(
         "CargoPlace",
-        foreign_keys=[parent_id],
-        back_populates="parent_composite_places"
+        foreign_keys=[parent_id, period_id],
+        back_populates="parent_composite_places",
+        overlaps="cargo_place,composite_places"
     )
 
     # Ограничения и индексы
     __table_args__ = (
+        ForeignKeyConstraint(
+            [cargo_place_id, period_id], ["cargo_places.id", "cargo_places.period_id"],
+            name="fk_composite_places_cargo_place", ondelete="CASCADE"
+        ),
+        ForeignKeyConstraint(
+            [parent_id, period_id], ["cargo_places.id", "cargo_places.period_id"],
+            name="fk_composite_places_parent", ondelete="CASCADE"
+        ),
         CheckConstraint("cargo_place_id != parent_id", name="check_different_cargo_places"),
         CheckConstraint("quantity > 0", name="check_positive_quantity"),
         UniqueConstraint("cargo_place_id", "parent_id", name="uq_composite_place"),
         Index("idx_composite_places_cargo_place_id", cargo_place_id),
         Index("idx_composite_places_parent_id", parent_id),
     )
+
+
+class CompositePlaceClosure(Base):
+    """Таблица замыкания иерархии сборных мест (см. ClosureService)."""
+    __tablename__ = "composite_place_closure"
+
+    period_id = Column(Integer, primary_key=True)
+    ancestor_id = Column(Integer, primary_key=True)
+    descendant_id = Column(Integer, primary_key=True)
+    depth = Column(Integer, nullable=False)
+
+    # Ограничения и индексы
+    __table_args__ = (
+        ForeignKeyConstraint(
+            [ancestor_id, period_id], ["cargo_places.id", "cargo_places.period_id"],
+            name="fk_composite_place_closure_ancestor", ondelete="CASCADE"
+        ),
+        ForeignKeyConstraint(
+            [descendant_id, period_id], ["cargo_places.id", "cargo_places.period_id"],
+            name="fk_composite_place_closure_descendant", ondelete="CASCADE"
+        ),
+        CheckConstraint("depth > 0", name="check_closure_depth"),
+        Index("idx_composite_place_closure_descendant", period_id, descendant_id, depth),
+    )
+
+
+class ArchivedCargoPlace(Base):
+    """Номера отслеживания мест архивных периодов (см. ArchiveService)."""
+    __tablename__ = "archived_cargo_places"
+
+    tracking_number = Column(String(20), primary_key=True)
+    period_id = Column(Integer, ForeignKey("periods.period_id", ondelete="CASCADE"), primary_key=True)
+    place_id = Column(Integer, nullable=False)
+    batch_id = Column(Integer)
+    client_code = Column(String(50))
+    status = Column(String(50), nullable=False)
+    is_active = Column(Boolean, nullable=False)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr, validator
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import date, datetime
 import re
 
@@ -37,12 +37,14 @@ class PeriodUpdate(BaseModel):
 
 class PeriodResponse(PeriodBase):
     period_id: int
+    archived_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
 # Схемы для партий
 class BatchBase(BaseModel):
+    # XX-000-0000: буквы серии и суффикса, номер и год (M123-A в 2024 - MA-123-2024)
     batch_number: str = Field(..., min_length=9, max_length=20)
     period_id: int
 
@@ -170,6 +172,7 @@ class PaymentMethodResponse(PaymentMethodBase, StatusMixin, TimestampMixin):
 # Схемы для грузовых мест
 class CargoPlaceBase(BaseModel):
     tracking_number: str = Field(..., min_length=12, max_length=20)
+    period_id: int
     batch_id: Optional[int] = None
     client_id: Optional[int] = None
     recipient_id: Optional[int] = None
@@ -184,6 +187,7 @@ class CargoPlaceBase(BaseModel):
     estimated_arrival_date: Optional[date] = None
     actual_arrival_date: Optional[date] = None
     description: Optional[str] = None
+    description_original: Optional[str] = None
     notes: Optional[str] = None
     is_fragile: bool = False
     is_oversized: bool = False
@@ -230,6 +234,7 @@ class CargoPlaceUpdate(BaseModel):
     estimated_arrival_date: Optional[date] = None
     actual_arrival_date: Optional[date] = None
     description: Optional[str] = None
+    description_original: Optional[str] = None
     notes: Optional[str] = None
     is_fragile: Optional[bool] = None
     is_oversized: Optional[bool] = None
@@ -262,16 +267,77 @@ class CargoPlaceUpdate(BaseModel):
 
 class CargoPlaceResponse(CargoPlaceBase, StatusMixin, TimestampMixin):
     id: int
+    row_seq: Optional[int] = None
+    client_code: Optional[str] = None
+    places_count: Optional[int] = None
+    boxes_count: Optional[int] = None
+    units_count: Optional[int] = None
+    cubic_tariff: Optional[float] = None
+    freight_tariff: Optional[float] = None
+    insurance_percent: Optional[float] = None
+    insurance_cost: Optional[float] = None
+    packaging_cost: Optional[float] = None
     batch: Optional[Dict[str, Any]] = None
     client: Optional[Dict[str, Any]] = None
     recipient: Optional[Dict[str, Any]] = None
     driver: Optional[Dict[str, Any]] = None
     payment_method: Optional[Dict[str, Any]] = None
 
+# Результат записи разобранной партии в базу
+class BatchIngestChange(BaseModel):
+    action: str
+    tracking_number: Optional[str] = None
+    row_seq: Optional[int] = None
+    client_code: Optional[str] = None
+    fields: List[str] = []
+
+class BatchIngestResult(BaseModel):
+    batch_id: Optional[int] = None
+    batch_number: str
+    period_id: int
+    rows: int
+    inserted: int
+    updated: int
+    deleted: int
+    unchanged: int = 0
+    composite_links: int = 0
+    dry_run: bool = False
+    created_clients: List[str] = []
+    unmatched_clients: List[str] = []
+    changes: Optional[List[BatchIngestChange]] = None
+
+class CargoPlaceStatusUpdate(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=10000)
+    status: str
+    # Период мест: с ним поиск идет только в секции периода
+    period_id: Optional[int] = None
+
+    @validator('status')
+    def validate_status(cls, v):
+        valid_statuses = ['Создан', 'Ожидает отправки', 'В пути', 'Доставлен', 'Отменен']
+        if v not in valid_statuses:
+            raise ValueError(f'Неверный статус. Допустимые значения: {", ".join(valid_statuses)}')
+        return v
+
+class CargoPlaceStatusResult(BaseModel):
+    updated: int
+
+# Схемы для сводных показателей
+class RollupSummaryRow(BaseModel):
+    key: Optional[Any] = None
+    label: Optional[str] = None
+    places: int = 0
+    composite_places: int = 0
+    boxes: int = 0
+    weight: float = 0
+    volume: float = 0
+    amount: float = 0
+
 # Схемы для сборных мест
 class CompositePlaceBase(BaseModel):
     cargo_place_id: int
     parent_id: int
+    period_id: int
     quantity: int = Field(1, gt=0)
 
 class CompositePlaceCreate(CompositePlaceBase):
@@ -286,3 +352,134 @@ class CompositePlaceResponse(CompositePlaceBase, TimestampMixin):
     id: int
     cargo_place: Optional[Dict[str, Any]] = None
     parent: Optional[Dict[str, Any]] = None
+
+class CompositeTreeNode(BaseModel):
+    id: int
+    tracking_number: str
+    period_id: int
+    batch_id: Optional[int] = None
+    status: str
+    weight: float
+    volume: float
+    is_active: bool
+    depth: int
+    parent_id: Optional[int] = None
+
+# Схемы для массовых операций со справочниками
+class ClientBulkUpdate(ClientUpdate):
+    id: int
+
+class RecipientBulkUpdate(RecipientUpdate):
+    id: int
+
+class BatchBulkUpdate(BatchUpdate):
+    id: int
+
+class BulkDeactivate(BaseModel):
+    ids: List[int] = Field(..., min_length=1)
+
+class BulkItemResult(BaseModel):
+    # Позиция элемента в массиве запроса (для NDJSON - среди непустых строк), считая с 0
+    index: int
+    status: str
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkResult(BaseModel):
+    total: int
+    succeeded: int
+    failed: int
+    items: List[BulkItemResult]
+
+class CargoSearchHit(BaseModel):
+    id: int
+    period_id: int
+    tracking_number: str
+    batch_id: Optional[int] = None
+    batch_number: Optional[str] = None
+    client_id: Optional[int] = None
+    client_code: Optional[str] = None
+    client_name: Optional[str] = None
+    recipient_name: Optional[str] = None
+    status: str
+    description: Optional[str] = None
+    description_original: Optional[str] = None
+    notes: Optional[str] = None
+    weight: float
+    volume: float
+    is_active: bool
+    rank: float
+
+class GridFilter(BaseModel):
+    field: str
+    # eq, ne, lt, lte, gt, gte, in, between, contains, starts_with, is_null
+    op: str = 'eq'
+    value: Any = None
+
+class GridSort(BaseModel):
+    field: str
+    direction: str = Field('asc', pattern=r'^(asc|desc)$')
+
+class GridQuery(BaseModel):
+    # Проекция: имена полей в порядке столбцов ответа; пусто - набор по умолчанию
+    columns: List[str] = []
+    filters: List[GridFilter] = []
+    sort: List[GridSort] = []
+    offset: int = Field(0, ge=0)
+    limit: int = Field(100, ge=1, le=1000)
+    count: str = Field('auto', pattern=r'^(auto|exact|estimated|none)$')
+
+class GridResult(BaseModel):
+    columns: List[str]
+    # Строки окна - массивы значений в порядке columns
+    rows: List[List[Any]]
+    total: Optional[int] = None
+    total_estimated: bool = False
+    offset: int
+    limit: int
+
+class CargoPlaceLookup(BaseModel):
+    id: int
+    period_id: int
+    tracking_number: str
+    batch_id: Optional[int] = None
+    batch_number: Optional[str] = None
+    client_id: Optional[int] = None
+    client_code: Optional[str] = None
+    client_name: Optional[str] = None
+    recipient_id: Optional[int] = None
+    recipient_name: Optional[str] = None
+    status: str
+    # Для мест архивных периодов (archived) известны только номер, партия, клиент и статус
+    priority: Optional[str] = None
+    weight: Optional[float] = None
+    volume: Optional[float] = None
+    places_count: Optional[int] = None
+    boxes_count: Optional[int] = None
+    departure_date: Optional[date] = None
+    estimated_arrival_date: Optional[date] = None
+    actual_arrival_date: Optional[date] = None
+    description: Optional[str] = None
+    is_paid: Optional[bool] = None
+    is_delivered: Optional[bool] = None
+    is_active: bool
+    archived: bool = False
+
+class PurgeJobResponse(BaseModel):
+    job_id: str
+    # period или batch
+    kind: str
+    target_id: int
+    # queued, running, done или failed
+    status: str
+    # Мест к удалению и удалено
+    total: int
+    deleted: int
+    error: Optional[str] = None
+    created_at: float
+    finished_at: Optional[float] = None
+
+class PurgeStarted(BaseModel):
+    success: bool
+    message: str
+    job_id: str
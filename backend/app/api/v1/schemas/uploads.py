@@ -0,0 +1,26 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+
+# Схемы для загрузки файлов по частям
+class ChunkedUploadCreate(BaseModel):
+    filename: str = Field(..., min_length=1, max_length=255)
+    total_size: int = Field(..., gt=0)
+    sha256: Optional[str] = Field(None, pattern=r'^[0-9a-fA-F]{64}$')
+
+
+class UploadChunkInfo(BaseModel):
+    offset: int
+    size: int
+    sha256: Optional[str] = None
+
+
+class ChunkedUploadStatus(BaseModel):
+    upload_id: str
+    filename: str
+    total_size: int
+    received_size: int
+    chunk_size: int
+    chunks: List[UploadChunkInfo]
+    missing: List[List[int]]
+    complete: bool
@@ -0,0 +1,95 @@
+from typing import Dict, List, Any
+
+COLUMNAR_FORMAT = "columnar"
+COLUMNAR_VERSION = 1
+
+
+def encode_columnar(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Преобразует список строк в компактный столбцовый формат.
+
+    Имена столбцов передаются один раз, значения - массивами по столбцам.
+    Столбцы с одинаковым значением во всех строках (номер партии и т.п.)
+    выносятся в constants. Строковые столбцы с повторяющимися значениями
+    кодируются словарем: в values хранятся индексы в dictionaries[столбец].
+
+    Формат:
+        {
+            "format": "columnar",
+            "version": 1,
+            "rowCount": 3,
+            "constants": {"batchNumber": "M55-A"},
+            "columns": ["clientCode", "weight"],
+            "dictionaries": {"clientCode": ["A01", "B02"]},
+            "values": [[0, 1, 0], [10.5, 3.0, 7.25]]
+        }
+
+    Args:
+        rows: Строки с одинаковым (или почти одинаковым) набором ключей
+
+    Returns:
+        Dict[str, Any]: Данные в столбцовом формате
+    """
+    columns: Dict[str, None] = {}
+    for row in rows:
+        for key in row:
+            columns.setdefault(key)
+
+    constants: Dict[str, Any] = {}
+    names: List[str] = []
+    dictionaries: Dict[str, List[str]] = {}
+    values: List[List[Any]] = []
+
+    for name in columns:
+        column = [row.get(name) for row in rows]
+        first = column[0]
+        if len(rows) > 1 and all(value == first for value in column):
+            constants[name] = first
+            continue
+
+        names.append(name)
+        strings = [value for value in column if isinstance(value, str)]
+        # Словарь выгоден, только если строки повторяются
+        if strings and len(strings) == len(column) - column.count(None):
+            distinct = list(dict.fromkeys(strings))
+            if len(distinct) * 2 <= len(strings):
+                index = {value: position for position, value in enumerate(distinct)}
+                dictionaries[name] = distinct
+                column = [index[value] if value is not None else None for value in column]
+        values.append(column)
+
+    return {
+        'format': COLUMNAR_FORMAT,
+        'version': COLUMNAR_VERSION,
+        'rowCount': len(rows),
+        'constants': constants,
+        'columns': names,
+        'dictionaries': dictionaries,
+        'values': values
+    }
+
+
+def decode_columnar(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Восстанавливает список строк из столбцового формата (обратное к encode_columnar).
+
+    Args:
+        payload: Данные в столбцовом формате
+
+    Returns:
+        List[Dict[str, Any]]: Список строк
+    """
+    columns = []
+    for name, column in zip(payload['columns'], payload['values']):
+        dictionary = payload['dictionaries'].get(name)
+        if dictionary is not None:
+            column = [dictionary[value] if value is not None else None for value in column]
+        columns.append((name, column))
+
+    rows = []
+    for position in range(payload['rowCount']):
+        row = dict(payload['constants'])
+        for name, column in columns:
+            row[name] = column[position]
+        rows.append(row)
+    return rows
@@ -17,4 +17,10 @@ DATABASE_URL = f'postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_POR
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+
+def error_summary(error: Exception) -> str:
+    """Первая строка сообщения драйвера (без текста запроса и параметров); имя класса, если сообщения нет."""
+    message = str(getattr(error, 'orig', None) or error).strip()
+    return message.splitlines()[0] if message else error.__class__.__name__
@@ -0,0 +1,89 @@
+import base64
+import binascii
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+import orjson
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+
+CURSOR_NEXT = "next"
+CURSOR_PREV = "prev"
+
+
+class InvalidCursorError(ValueError):
+    """Курсор страницы поврежден или выдан для другого списка."""
+    status_code = 400
+
+
+def encode_cursor(key: Sequence[Any], direction: str) -> str:
+    """
+    Кодирует позицию в списке (значения ключа сортировки последней или первой
+    строки страницы) и направление в непрозрачную строку.
+    """
+    payload = orjson.dumps({'k': list(key), 'd': direction})
+    return base64.urlsafe_b64encode(payload).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Tuple[List[Any], str]:
+    """
+    Восстанавливает позицию и направление из курсора.
+
+    Raises:
+        InvalidCursorError: Курсор не удалось разобрать
+    """
+    try:
+        payload = orjson.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        key, direction = payload['k'], payload['d']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidCursorError("Неверный курсор страницы")
+    if not isinstance(key, list) or direction not in (CURSOR_NEXT, CURSOR_PREV):
+        raise InvalidCursorError("Неверный курсор страницы")
+    return key, direction
+
+
+def keyset_page(query: Query, order_columns: Sequence[Any], limit: int, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Страница списка по ключу сортировки (keyset pagination).
+
+    Вместо OFFSET запрос продолжается с позиции из курсора условием
+    (ключ, id) > (значения из курсора), поэтому любая страница читается по индексу
+    так же быстро, как первая, а вставки между запросами не сдвигают страницы.
+    Последний столбец order_columns должен быть уникальным (обычно id).
+
+    Args:
+        query: Запрос с фильтрами, без сортировки и LIMIT
+        order_columns: Столбцы ключа сортировки
+        limit: Размер страницы
+        cursor: Курсор из next_cursor или prev_cursor предыдущего ответа; None - первая страница
+
+    Returns:
+        Dict[str, Any]: items, next_cursor, prev_cursor и limit
+    """
+    direction = CURSOR_NEXT
+    if cursor:
+        key, direction = decode_cursor(cursor)
+        if len(key) != len(order_columns):
+            raise InvalidCursorError("Курсор выдан для другого списка")
+        columns, values = tuple_(*order_columns), tuple_(*key)
+        query = query.filter(columns > values if direction == CURSOR_NEXT else columns < values)
+
+    forward = direction == CURSOR_NEXT
+    ordering = [column.asc() if forward else column.desc() for column in order_columns]
+    rows = query.order_by(*ordering).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not forward:
+        rows.reverse()
+
+    def row_key(row: Any) -> List[Any]:
+        return [getattr(row, column.key) for column in order_columns]
+
+    # Идя назад, всегда есть следующая страница (с которой пришли), идя вперед
+    # с курсора - предыдущая
+    has_next = has_more if forward else bool(cursor)
+    has_prev = bool(cursor) if forward else has_more
+    return {
+        'items': rows,
+        'next_cursor': encode_cursor(row_key(rows[-1]), CURSOR_NEXT) if rows and has_next else None,
+        'prev_cursor': encode_cursor(row_key(rows[0]), CURSOR_PREV) if rows and has_prev else None,
+        'limit': limit
+    }
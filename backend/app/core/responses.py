@@ -0,0 +1,104 @@
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Iterable, Type
+import orjson
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, TypeAdapter
+from app.api.v1.schemas.pagination import Page
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(value: Any) -> Any:
+    """Значения, которые orjson не сериализует сам (Decimal и т.п.)."""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Сериализует значение в JSON через orjson.
+    Даты и время, dataclass и numpy-типы сериализуются напрямую, остальное через str.
+    """
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON-ответ с сериализацией через orjson.
+
+    Используется как класс ответа по умолчанию. Если эндпоинт возвращает
+    экземпляр этого класса напрямую, FastAPI не прогоняет содержимое через
+    response_model и jsonable_encoder, поэтому так отдаются большие,
+    уже проверенные результаты (например, строки разобранного Excel файла).
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    Потоковый ответ, который по окончании отдачи вызывает on_close - и при
+    отключении клиента, в том числе до начала потока, когда генератор тела
+    не запускается и его finally не выполняется.
+    """
+
+    def __init__(self, content: Any, on_close: Callable[[], Awaitable[None]], **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.on_close()
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(list[model])
+
+
+@lru_cache(maxsize=None)
+def _page_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(Page[model])
+
+
+def model_list_response(model: Type[BaseModel], items: Iterable[Any], status_code: int = 200) -> Response:
+    """
+    Формирует ответ со списком объектов по схеме model.
+
+    Объекты (в том числе модели SQLAlchemy) проверяются и сериализуются
+    в JSON одним вызовом pydantic-core, без промежуточных словарей и
+    jsonable_encoder.
+
+    Args:
+        model: Схема ответа с from_attributes
+        items: Объекты для сериализации
+        status_code: HTTP-статус ответа
+
+    Returns:
+        Response: Готовый JSON-ответ
+    """
+    adapter = _list_adapter(model)
+    content = adapter.dump_json(adapter.validate_python(list(items), from_attributes=True))
+    return Response(content=content, status_code=status_code, media_type="application/json")
+
+
+def model_page_response(model: Type[BaseModel], page: Dict[str, Any], status_code: int = 200) -> Response:
+    """
+    Формирует ответ со страницей списка (items, next_cursor, prev_cursor, limit)
+    так же, как model_list_response: одной проверкой и сериализацией pydantic-core.
+
+    Args:
+        model: Схема элемента списка с from_attributes
+        page: Результат keyset_page
+        status_code: HTTP-статус ответа
+
+    Returns:
+        Response: Готовый JSON-ответ
+    """
+    adapter = _page_adapter(model)
+    content = adapter.dump_json(adapter.validate_python(page, from_attributes=True))
+    return Response(content=content, status_code=status_code, media_type="application/json")
@@ -1,11 +1,20 @@
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 
+from app.core.responses import FastJSONResponse
+
 from app.api.v1.endpoints.auth.auth import router as auth_router
 from app.api.v1.endpoints.cargo.periods import router as periods_router
 from app.api.v1.endpoints.cargo.excel import router as excel_router
+from app.api.v1.endpoints.cargo.uploads import router as uploads_router
+from app.api.v1.endpoints.cargo.cargo_places import router as cargo_places_router
+from app.api.v1.endpoints.cargo.summary import router as summary_router
+from app.api.v1.endpoints.cargo.clients import router as clients_router
+from app.api.v1.endpoints.cargo.recipients import router as recipients_router
+from app.api.v1.endpoints.cargo.batches import router as batches_router
+from app.api.v1.endpoints.cargo.purge_jobs import router as purge_jobs_router
 
-app = FastAPI(title="Cargo Service API", version="1.0.0")
+app = FastAPI(title="Cargo Service API", version="1.0.0", default_response_class=FastJSONResponse)
 
 # Настройка CORS - расширяем список разрешенных источников
 app.add_middleware(
@@ -20,6 +29,13 @@ app.add_middleware(
 app.include_router(auth_router, prefix="/auth", tags=["auth"])
 app.include_router(periods_router, prefix="/api/v1/periods", tags=["periods"])
 app.include_router(excel_router, prefix="/api/v1/excel", tags=["excel"])
+app.include_router(uploads_router, prefix="/api/v1/excel/uploads", tags=["excel"])
+app.include_router(cargo_places_router, prefix="/api/v1/cargo-places", tags=["cargo-places"])
+app.include_router(summary_router, prefix="/api/v1/summary", tags=["summary"])
+app.include_router(clients_router, prefix="/api/v1/clients", tags=["clients"])
+app.include_router(recipients_router, prefix="/api/v1/recipients", tags=["recipients"])
+app.include_router(batches_router, prefix="/api/v1/batches", tags=["batches"])
+app.include_router(purge_jobs_router, prefix="/api/v1/purge-jobs", tags=["purge-jobs"])
 
 @app.get("/")
 def read_root():
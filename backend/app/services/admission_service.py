@@ -0,0 +1,244 @@
+import os
+import re
+import time
+import math
+import heapq
+import asyncio
+import logging
+import zipfile
+import itertools
+from typing import Dict, List, Any, BinaryIO, Optional, Callable
+
+logger = logging.getLogger('admission_service')
+
+# Сколько памяти (в байтах) могут занимать одновременно выполняющиеся парсинги
+PARSE_MEMORY_BUDGET = int(os.getenv("EXCEL_PARSE_MEMORY_BUDGET", 1024 * 1024 * 1024))
+# Сколько парсингов выполняется одновременно; часть ядер остается остальному API
+PARSE_MAX_ACTIVE = int(os.getenv("EXCEL_PARSE_MAX_ACTIVE", max(1, (os.cpu_count() or 2) // 2)))
+# Сколько парсингов может ждать в очереди и сколько секунд ждать, прежде чем вернуть 429
+PARSE_QUEUE_MAX = int(os.getenv("EXCEL_PARSE_QUEUE_MAX", 32))
+PARSE_QUEUE_TIMEOUT = float(os.getenv("EXCEL_PARSE_QUEUE_TIMEOUT", 30))
+# Оценка памяти: на ячейку листа и на байт файла, если размер листа неизвестен
+PARSE_BYTES_PER_CELL = int(os.getenv("EXCEL_PARSE_BYTES_PER_CELL", 400))
+PARSE_BYTES_PER_FILE_BYTE = int(os.getenv("EXCEL_PARSE_BYTES_PER_FILE_BYTE", 30))
+# Скорость "старения" заявки в очереди: на сколько байт оценки приоритет
+# заявки сдвигается за секунду ожидания. Маленькие файлы идут первыми,
+# но большой файл не ждет бесконечно
+PARSE_AGING_BYTES_PER_SECOND = int(os.getenv("EXCEL_PARSE_AGING_BYTES_PER_SECOND", 50 * 1024 * 1024))
+
+DIMENSION_PATTERN = re.compile(rb'<(?:\w+:)?dimension\s+ref="([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?"')
+
+
+class AdmissionRejectedError(Exception):
+    """Бюджет парсинга исчерпан: очередь заполнена или ожидание превысило таймаут."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _column_number(letters: bytes) -> int:
+    number = 0
+    for letter in letters:
+        number = number * 26 + letter - ord('A') + 1
+    return number
+
+
+def read_sheet_cells(buffer: BinaryIO) -> Optional[int]:
+    """
+    Оценивает число ячеек в книге .xlsx/.xlsm по элементу <dimension> листов.
+    Читается только начало XML каждого листа, книга целиком не загружается.
+
+    Args:
+        buffer: Файл книги (позиция чтения восстанавливается)
+
+    Returns:
+        Optional[int]: Число ячеек или None, если размер листов определить не удалось
+    """
+    position = buffer.tell()
+    try:
+        buffer.seek(0)
+        cells = 0
+        with zipfile.ZipFile(buffer) as workbook:
+            for name in workbook.namelist():
+                if not (name.startswith('xl/worksheets/') and name.endswith('.xml')):
+                    continue
+                with workbook.open(name) as sheet:
+                    match = DIMENSION_PATTERN.search(sheet.read(4096))
+                if match is None:
+                    return None
+                first_col, first_row, last_col, last_row = match.groups()
+                if last_col is None:
+                    last_col, last_row = first_col, first_row
+                rows = int(last_row) - int(first_row) + 1
+                cols = _column_number(last_col) - _column_number(first_col) + 1
+                cells += max(rows, 1) * max(cols, 1)
+        return cells or None
+    except (zipfile.BadZipFile, KeyError, ValueError):
+        return None
+    finally:
+        buffer.seek(position)
+
+
+def estimate_parse_cost(buffer: BinaryIO, size: int) -> int:
+    """
+    Оценивает объем памяти, который займет парсинг файла.
+
+    Args:
+        buffer: Файл книги
+        size: Размер файла в байтах
+
+    Returns:
+        int: Оценка в байтах
+    """
+    estimate = size * PARSE_BYTES_PER_FILE_BYTE
+    cells = read_sheet_cells(buffer)
+    if cells is not None:
+        estimate = max(estimate, cells * PARSE_BYTES_PER_CELL)
+    return estimate
+
+
+class AdmissionLease:
+    """Выданный слот парсинга; освобождается вызовом release (повторный вызов ничего не делает)."""
+
+    def __init__(self, controller: 'AdmissionController', cost: int):
+        self.controller = controller
+        self.cost = cost
+        self.started_at = time.monotonic()
+        self.released = False
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self.controller._release(self)
+
+    async def __aenter__(self) -> 'AdmissionLease':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.release()
+
+
+class AdmissionController:
+    """
+    Допуск парсингов по общему бюджету памяти и числу одновременных задач.
+
+    Каждая заявка приходит с оценкой стоимости. Если бюджета хватает и
+    очередь пуста, слот выдается сразу; иначе заявка ждет в очереди с
+    приоритетом по оценке (маленькие файлы раньше) и времени ожидания.
+    Слоты выдаются строго в порядке приоритета, поэтому поток маленьких
+    файлов не может бесконечно задерживать большой. Заявка, которая не
+    помещается в очередь или не дождалась слота за PARSE_QUEUE_TIMEOUT,
+    отклоняется с рекомендацией, через сколько секунд повторить запрос.
+
+    Все методы вызываются из цикла событий, поэтому блокировки не нужны.
+    """
+
+    def __init__(
+            self,
+            memory_budget: int = PARSE_MEMORY_BUDGET,
+            max_active: int = PARSE_MAX_ACTIVE,
+            max_queue: int = PARSE_QUEUE_MAX,
+            queue_timeout: float = PARSE_QUEUE_TIMEOUT
+    ):
+        self.memory_budget = memory_budget
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.memory_used = 0
+        self.active = 0
+        self._waiters: List[list] = []
+        self._sequence = itertools.count()
+        # Скользящее среднее длительности парсинга для заголовка Retry-After
+        self._avg_duration = 1.0
+
+    def _fits(self, cost: int) -> bool:
+        return self.active < self.max_active and self.memory_used + cost <= self.memory_budget
+
+    def _grant(self, cost: int) -> AdmissionLease:
+        self.active += 1
+        self.memory_used += cost
+        return AdmissionLease(self, cost)
+
+    def retry_after(self) -> int:
+        """Оценивает, через сколько секунд освободится слот для новой заявки."""
+        rounds = (len(self._waiters) + self.active) / self.max_active
+        return max(1, math.ceil(self._avg_duration * rounds))
+
+    async def acquire(self, cost: int, on_queued: Optional[Callable[[int], None]] = None) -> AdmissionLease:
+        """
+        Выдает слот парсинга, при необходимости ожидая в очереди.
+
+        Args:
+            cost: Оценка памяти в байтах (больше бюджета - приравнивается к бюджету,
+                такой файл парсится, когда остальные задачи завершатся)
+            on_queued: Вызывается с позицией в очереди, если слот не выдан сразу
+
+        Returns:
+            AdmissionLease: Слот, который нужно освободить после парсинга
+
+        Raises:
+            AdmissionRejectedError: Очередь заполнена или ожидание превысило таймаут
+        """
+        cost = min(max(cost, 0), self.memory_budget)
+        if not self._waiters and self._fits(cost):
+            return self._grant(cost)
+
+        if len(self._waiters) >= self.max_queue:
+            raise AdmissionRejectedError("Сервер загружен обработкой файлов, повторите попытку позже", self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        priority = time.monotonic() + cost / PARSE_AGING_BYTES_PER_SECOND
+        entry = [priority, next(self._sequence), cost, future]
+        heapq.heappush(self._waiters, entry)
+        logger.info(f"Парсинг поставлен в очередь: оценка {cost // (1024 * 1024)} МБ, в очереди {len(self._waiters)}")
+        if on_queued is not None:
+            on_queued(len(self._waiters))
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # Слот выдан одновременно с таймаутом или отменой - возвращаем его
+                future.result().release()
+            else:
+                future.cancel()
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                # Заявка могла задерживать заявки за собой
+                self._wake()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise AdmissionRejectedError("Превышено время ожидания очереди обработки файлов", self.retry_after())
+
+    def _release(self, lease: AdmissionLease) -> None:
+        self.active -= 1
+        self.memory_used -= lease.cost
+        duration = time.monotonic() - lease.started_at
+        self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+        self._wake()
+
+    def _wake(self) -> None:
+        """Выдает слоты ожидающим заявкам в порядке приоритета, пока хватает бюджета."""
+        while self._waiters:
+            _, _, cost, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if not self._fits(cost):
+                return
+            heapq.heappop(self._waiters)
+            future.set_result(self._grant(cost))
+
+    def get_status(self) -> Dict[str, Any]:
+        """Текущая загрузка бюджета парсинга."""
+        return {
+            'active': self.active,
+            'max_active': self.max_active,
+            'queued': len(self._waiters),
+            'memory_used': self.memory_used,
+            'memory_budget': self.memory_budget
+        }
+
+
+admission_controller = AdmissionController()
@@ -0,0 +1,371 @@
+import os
+import csv
+import io
+import zlib
+import logging
+import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+import orjson
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.api.v1.models.cargo import CargoPlace
+from app.core.columnar import encode_columnar, decode_columnar
+from app.core.responses import dumps
+from app.services.partition_service import partition_name, ensure_period_partition
+from app.services.closure_service import ClosureService
+from app.services.tracking_lookup import tracking_lookup
+
+logger = logging.getLogger('archive_service')
+
+# Каталог файлов архива. Задается явно и должен быть постоянным (не временным):
+# места архивного периода хранятся только в нем. Без него архив недоступен
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR")
+ARCHIVE_COMPRESS_LEVEL = int(os.getenv("ARCHIVE_COMPRESS_LEVEL", 6))
+# Строк в одном сегменте файла: сегмент целиком кодируется и загружается в память
+ARCHIVE_SEGMENT_ROWS = int(os.getenv("ARCHIVE_SEGMENT_ROWS", 50000))
+
+ARCHIVE_FORMAT = "cargo-archive"
+ARCHIVE_VERSION = 1
+
+# Таблицы периода в файле архива и их столбцы; вычисляемые столбцы мест
+# (поисковый вектор) база заполняет сама при возврате из архива
+ARCHIVE_TABLES = {
+    'cargo_places': [column.name for column in CargoPlace.__table__.columns if column.computed is None],
+    'composite_places': ['id', 'cargo_place_id', 'parent_id', 'period_id', 'quantity', 'created_at'],
+    'composite_place_closure': ['period_id', 'ancestor_id', 'descendant_id', 'depth'],
+}
+
+# Индекс архивных номеров: по нему номера периода находятся без возврата из архива
+ARCHIVE_INDEX_COLUMNS = ['tracking_number', 'period_id', 'place_id', 'batch_id', 'client_code', 'status', 'is_active']
+
+
+class ArchiveError(Exception):
+    """Период нельзя перенести в архив или вернуть из него."""
+    status_code = 400
+
+
+class ArchiveNotFoundError(ArchiveError):
+    """Периода или его файла архива нет."""
+    status_code = 404
+
+
+class PeriodArchivedError(ArchiveError):
+    """Период в архиве: его данные не изменяются до возврата из архива."""
+    status_code = 409
+
+
+def archive_path(period_id: int) -> Path:
+    """
+    Файл архива периода.
+
+    Raises:
+        ArchiveError: Не задан каталог архива
+    """
+    if not ARCHIVE_DIR:
+        raise ArchiveError("Архив недоступен: не задан каталог ARCHIVE_DIR")
+    return Path(ARCHIVE_DIR) / f"period_{int(period_id)}.ndjson.z"
+
+
+def _read_lines(path: Path) -> Iterator[Dict[str, Any]]:
+    """Читает строки JSON из сжатого файла архива, не распаковывая его целиком."""
+    decompressor = zlib.decompressobj()
+    tail = b''
+    with open(path, 'rb') as file:
+        while True:
+            chunk = file.read(1024 * 1024)
+            data = decompressor.decompress(chunk) if chunk else decompressor.flush()
+            lines = (tail + data).split(b'\n')
+            tail = lines.pop()
+            for line in lines:
+                yield orjson.loads(line)
+            if not chunk:
+                break
+    if tail:
+        yield orjson.loads(tail)
+
+
+class ArchiveService:
+    """
+    Архив закрытых периодов.
+
+    Места периода, его связи сборных мест и таблица замыкания выгружаются
+    в файл ARCHIVE_DIR/period_<ID>.ndjson.z (поток zlib из строк JSON:
+    заголовок, сегменты по ARCHIVE_SEGMENT_ROWS строк в столбцовом формате
+    encode_columnar, итог с числом строк каждой таблицы), после чего секция
+    периода удаляется целиком. Номера мест остаются в archived_cargo_places,
+    поэтому поиск по номеру находит и архивные места. Партии и сводка
+    периода в архив не переносятся.
+
+    Возврат из архива (rehydrate_period) создает секцию заново и загружает
+    в нее строки файла через COPY. Партии архивного периода не удаляются
+    (check_batches_writable); ссылки мест на удаленных за это время клиентов,
+    получателей и другие справочники обнуляются, как при ON DELETE SET NULL,
+    а места удаленных партий (если такие все же есть) пропускаются вместе
+    со своими связями, как при ON DELETE CASCADE. Запуск - scripts/archive_period.py.
+    """
+
+    @staticmethod
+    def check_writable(db: Session, period_ids: Iterable[int]) -> None:
+        """
+        Проверяет, что периоды не в архиве. Строки периодов блокируются
+        (FOR SHARE) до конца транзакции: перенос в архив ждет ее окончания.
+
+        Raises:
+            PeriodArchivedError: Период в архиве
+        """
+        period_ids = sorted(set(period_ids))
+        if not period_ids:
+            return
+        periods = db.execute(
+            text(
+                "SELECT period_name, archived_at FROM periods WHERE period_id = ANY(:period_ids) "
+                "ORDER BY period_id FOR SHARE"
+            ),
+            {'period_ids': period_ids}
+        ).all()
+        archived = [period.period_name for period in periods if period.archived_at is not None]
+        if archived:
+            raise PeriodArchivedError(
+                f"Период {', '.join(archived)} в архиве: верните его из архива перед изменением"
+            )
+
+    @staticmethod
+    def check_batches_writable(db: Session, batch_ids: Iterable[int]) -> None:
+        """
+        Проверяет, что периоды партий не в архиве (см. check_writable).
+
+        Raises:
+            PeriodArchivedError: Период партии в архиве
+        """
+        batch_ids = sorted(set(batch_ids))
+        if not batch_ids:
+            return
+        period_ids = db.execute(
+            text("SELECT DISTINCT period_id FROM batches WHERE id = ANY(:batch_ids)"),
+            {'batch_ids': batch_ids}
+        ).scalars().all()
+        ArchiveService.check_writable(db, period_ids)
+
+    @staticmethod
+    def archive_period(db: Session, period_id: int, force: bool = False) -> int:
+        """
+        Переносит места периода в архив.
+
+        Args:
+            db: Сессия базы данных
+            period_id: ID периода
+            force: Архивировать и период текущего года
+
+        Returns:
+            int: Число перенесенных мест
+
+        Raises:
+            ArchiveNotFoundError: Периода нет
+            ArchiveError: Не задан каталог архива; период уже в архиве, не закрыт
+                или его места не в своей секции
+        """
+        path = archive_path(period_id)
+        period = db.execute(
+            text("SELECT period_name, archived_at FROM periods WHERE period_id = :period_id FOR UPDATE"),
+            {'period_id': period_id}
+        ).one_or_none()
+        if period is None:
+            raise ArchiveNotFoundError("Период не найден")
+        if period.archived_at is not None:
+            raise ArchiveError("Период уже в архиве")
+        if not force and (not period.period_name.isdigit() or int(period.period_name) >= datetime.date.today().year):
+            raise ArchiveError("В архив переносятся только закрытые периоды (прошлых лет)")
+        name = partition_name(period_id)
+        if not db.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {'name': name}).scalar():
+            raise ArchiveError("У периода нет своей секции мест")
+
+        # Записи периода ждут окончания переноса, чтобы выгруженный файл совпал
+        # с удаляемыми данными: строка периода уже заблокирована (FOR UPDATE,
+        # см. check_writable), секция блокируется от записи, связи сборных
+        # мест и таблица замыкания - блокировкой связей периода
+        db.execute(text(f"LOCK TABLE {name} IN SHARE MODE"))
+        ClosureService.lock_period(db, period_id)
+        params = {'period_id': period_id}
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        counts = {}
+        try:
+            compressor = zlib.compressobj(ARCHIVE_COMPRESS_LEVEL)
+            with open(tmp_path, 'wb') as file:
+                def write(line: Dict[str, Any]) -> None:
+                    file.write(compressor.compress(dumps(line) + b'\n'))
+
+                write({
+                    'format': ARCHIVE_FORMAT,
+                    'version': ARCHIVE_VERSION,
+                    'period_id': period_id,
+                    'period_name': period.period_name,
+                    'created_at': datetime.datetime.now(datetime.timezone.utc),
+                    'tables': ARCHIVE_TABLES,
+                })
+                for table, columns in ARCHIVE_TABLES.items():
+                    source = name if table == 'cargo_places' else table
+                    result = db.execute(
+                        text(f"SELECT {', '.join(columns)} FROM {source} WHERE period_id = :period_id")
+                        .execution_options(yield_per=ARCHIVE_SEGMENT_ROWS),
+                        params
+                    )
+                    counts[table] = 0
+                    for rows in result.mappings().partitions():
+                        write({'table': table, 'rows': encode_columnar([dict(row) for row in rows])})
+                        counts[table] += len(rows)
+                write({'counts': counts})
+                file.write(compressor.flush())
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, path)
+        except Exception:
+            db.rollback()
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        try:
+            db.execute(
+                text(
+                    f"INSERT INTO archived_cargo_places ({', '.join(ARCHIVE_INDEX_COLUMNS)}) "
+                    f"SELECT tracking_number, period_id, id, batch_id, client_code, status, is_active FROM {name}"
+                )
+            )
+            # Ссылки на места секции удаляются до нее: внешние ключи не дают
+            # удалить секцию, на строки которой ссылаются
+            db.execute(text("DELETE FROM composite_place_closure WHERE period_id = :period_id"), params)
+            db.execute(text("DELETE FROM composite_places WHERE period_id = :period_id"), params)
+            db.execute(text(f"DROP TABLE {name}"))
+            db.execute(text("UPDATE periods SET archived_at = now() WHERE period_id = :period_id"), params)
+            db.commit()
+        except Exception:
+            db.rollback()
+            path.unlink(missing_ok=True)
+            raise
+
+        tracking_lookup.clear()
+        logger.info(f"Период {period_id} перенесен в архив {path}: {counts}, {path.stat().st_size} байт")
+        return counts['cargo_places']
+
+    @staticmethod
+    def rehydrate_period(db: Session, period_id: int) -> int:
+        """
+        Возвращает места периода из архива.
+
+        Returns:
+            int: Число возвращенных мест
+
+        Raises:
+            ArchiveNotFoundError: Периода или файла архива нет
+            ArchiveError: Не задан каталог архива, период не в архиве или файл архива поврежден
+        """
+        path = archive_path(period_id)
+        period = db.execute(
+            text("SELECT archived_at FROM periods WHERE period_id = :period_id FOR UPDATE"),
+            {'period_id': period_id}
+        ).one_or_none()
+        if period is None:
+            raise ArchiveNotFoundError("Период не найден")
+        if period.archived_at is None:
+            raise ArchiveError("Период не в архиве")
+        if not path.exists():
+            raise ArchiveNotFoundError(f"Нет файла архива {path}")
+
+        try:
+            ensure_period_partition(db, period_id)
+            counts: Dict[str, int] = {}
+            expected: Optional[Dict[str, int]] = None
+            # Места удаленных партий и ссылки на них (как ON DELETE CASCADE)
+            dropped: Set[int] = set()
+            linked: Set[int] = set()
+            for position, line in enumerate(_read_lines(path)):
+                if position == 0:
+                    if line.get('format') != ARCHIVE_FORMAT or line.get('version') != ARCHIVE_VERSION:
+                        raise ArchiveError(f"Неизвестный формат файла архива {path}")
+                    tables = line['tables']
+                elif 'counts' in line:
+                    expected = line['counts']
+                else:
+                    table = line['table']
+                    rows = decode_columnar(line['rows'])
+                    counts[table] = counts.get(table, 0) + len(rows)
+                    if table == 'cargo_places':
+                        rows = ArchiveService._detach_missing(db, rows, dropped)
+                    elif table == 'composite_places' and dropped:
+                        rows = [
+                            row for row in rows
+                            if row['cargo_place_id'] not in dropped and row['parent_id'] not in dropped
+                        ]
+                        linked.update(row['cargo_place_id'] for row in rows)
+                        linked.update(row['parent_id'] for row in rows)
+                    elif table == 'composite_place_closure' and dropped:
+                        # Пути строятся заново по оставшимся связям
+                        continue
+                    ArchiveService._copy_rows(db, table, tables[table], rows)
+            if expected is None or any(counts.get(table, 0) != count for table, count in expected.items()):
+                raise ArchiveError(f"Файл архива {path} поврежден: прочитано {counts}, ожидалось {expected}")
+            if dropped:
+                ClosureService.refresh(db, period_id, linked)
+                logger.warning(f"Период {period_id}: пропущено {len(dropped)} мест удаленных партий")
+
+            db.execute(text("DELETE FROM archived_cargo_places WHERE period_id = :period_id"), {'period_id': period_id})
+            db.execute(text("UPDATE periods SET archived_at = NULL WHERE period_id = :period_id"), {'period_id': period_id})
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        tracking_lookup.clear()
+        path.unlink(missing_ok=True)
+        logger.info(f"Период {period_id} возвращен из архива: {counts}")
+        return counts.get('cargo_places', 0) - len(dropped)
+
+    @staticmethod
+    def _detach_missing(db: Session, rows: List[Dict[str, Any]], dropped: Set[int]) -> List[Dict[str, Any]]:
+        """
+        Применяет к местам из архива правила внешних ключей для записей, удаленных
+        после переноса в архив: SET NULL обнуляет ссылку, CASCADE исключает
+        место (его ID добавляется в dropped).
+        """
+        for foreign_key in CargoPlace.__table__.foreign_keys:
+            column = foreign_key.parent.name
+            if foreign_key.ondelete not in ('SET NULL', 'CASCADE'):
+                continue
+            ids = {row[column] for row in rows if row.get(column) is not None}
+            if not ids:
+                continue
+            target = foreign_key.column
+            existing = set(db.execute(
+                text(f"SELECT {target.name} FROM {target.table.name} WHERE {target.name} = ANY(:ids)"),
+                {'ids': list(ids)}
+            ).scalars())
+            if existing == ids:
+                continue
+            for row in rows:
+                if row.get(column) is not None and row[column] not in existing:
+                    if foreign_key.ondelete == 'CASCADE':
+                        dropped.add(row['id'])
+                    else:
+                        row[column] = None
+        return [row for row in rows if row['id'] not in dropped]
+
+    @staticmethod
+    def _copy_rows(db: Session, table: str, columns: List[str], rows: List[Dict[str, Any]]) -> None:
+        """
+        Записывает строки в таблицу одной командой COPY в рамках текущей транзакции.
+        NULL передается как \\N: пустые строки в текстовых столбцах сохраняются.
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(['\\N' if row.get(column) is None else row[column] for column in columns])
+        buffer.seek(0)
+
+        cursor = db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer
+            )
+        finally:
+            cursor.close()
@@ -0,0 +1,88 @@
+from typing import List, Optional, Sequence, Tuple
+from sqlalchemy.orm import Session
+from app.api.v1.crud.base import CRUDBase
+from app.api.v1.crud.cargo.batches import batch_crud
+from app.api.v1.models.cargo import Batch
+from app.api.v1.schemas.cargo import BatchCreate, BatchUpdate
+from app.services.archive_service import ArchiveService
+from app.services.partition_service import move_batch_places
+from app.services.tracking_lookup import tracking_lookup
+
+
+class BatchService(CRUDBase[Batch, BatchCreate, BatchUpdate]):
+    """
+    Запись партий с правилами, которых нет в batch_crud: смена периода
+    переносит места партии в секцию нового периода, партии архивных периодов
+    и партии в архивные периоды не записываются (ArchiveService.check_writable),
+    кэш мест по номеру сбрасывается после фиксации переноса и удаления.
+    Передается в BulkService вместо batch_crud.
+    """
+
+    def create(self, db: Session, obj_in: BatchCreate, commit: bool = True) -> Optional[Batch]:
+        ArchiveService.check_writable(db, [obj_in.period_id])
+        return super().create(db, obj_in, commit)
+
+    def create_many(self, db: Session, objs_in: Sequence[BatchCreate], commit: bool = True) -> List[Batch]:
+        ArchiveService.check_writable(db, [obj_in.period_id for obj_in in objs_in])
+        return super().create_many(db, objs_in, commit)
+
+    def upsert_many(
+            self,
+            db: Session,
+            objs_in: Sequence[BatchCreate],
+            update_columns: Optional[Sequence[str]] = None,
+            commit: bool = True
+    ) -> List[Batch]:
+        ArchiveService.check_writable(db, [obj_in.period_id for obj_in in objs_in])
+        return super().upsert_many(db, objs_in, update_columns, commit)
+
+    def update(self, db: Session, id: int, obj_in: BatchUpdate, commit: bool = True) -> Optional[Batch]:
+        self._check_writable(db, [(id, obj_in)])
+        result = self.update_with_previous(db, id, obj_in, ['period_id'], commit=False)
+        if result is None:
+            return None
+        db_batch, previous = result
+        if db_batch.period_id != previous['period_id']:
+            move_batch_places(db, id, previous['period_id'], db_batch.period_id)
+            tracking_lookup.clear_after_commit(db)
+        if commit:
+            self.commit(db, db_batch)
+        return db_batch
+
+    def update_many(self, db: Session, items: Sequence[Tuple[int, BatchUpdate]], commit: bool = True) -> List[int]:
+        # Смена периода переносит места партии между секциями, такие партии
+        # изменяются по одной
+        self._check_writable(db, items)
+        moving = [(id, obj_in) for id, obj_in in items if 'period_id' in obj_in.model_fields_set]
+        updated = super().update_many(
+            db, [(id, obj_in) for id, obj_in in items if 'period_id' not in obj_in.model_fields_set], commit=False
+        )
+        updated.extend(id for id, obj_in in moving if self.update(db, id, obj_in, commit=False) is not None)
+        if commit:
+            self.commit(db)
+        return updated
+
+    def deactivate_many(self, db: Session, ids: Sequence[int], commit: bool = True) -> List[int]:
+        ArchiveService.check_batches_writable(db, ids)
+        return super().deactivate_many(db, ids, commit)
+
+    def delete(self, db: Session, id: int, commit: bool = True) -> bool:
+        return bool(self.delete_many(db, [id], commit))
+
+    def delete_many(self, db: Session, ids: Sequence[int], commit: bool = True) -> List[int]:
+        # Места партий удаляет база (ON DELETE CASCADE). Для больших партий -
+        # PurgeService: удаление пачками в фоне. Партии архивных периодов не
+        # удаляются: без них места не вернуть из архива
+        ArchiveService.check_batches_writable(db, ids)
+        tracking_lookup.clear_after_commit(db)
+        return super().delete_many(db, ids, commit)
+
+    @staticmethod
+    def _check_writable(db: Session, items: Sequence[Tuple[int, BatchUpdate]]) -> None:
+        ArchiveService.check_batches_writable(db, [id for id, _ in items])
+        ArchiveService.check_writable(
+            db, [obj_in.period_id for _, obj_in in items if 'period_id' in obj_in.model_fields_set]
+        )
+
+
+batch_service = BatchService(Batch, conflict_columns=batch_crud.conflict_columns)
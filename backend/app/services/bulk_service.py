@@ -0,0 +1,240 @@
+import os
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Type
+import orjson
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from app.core.database import error_summary
+from app.api.v1.crud.base import CRUDBase
+from app.services.closure_service import CompositeLinkError
+from app.services.archive_service import PeriodArchivedError
+
+logger = logging.getLogger('bulk_service')
+
+# Число элементов, записываемых одной транзакцией
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 500))
+# Предельное число элементов в одном запросе
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", 50000))
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Результат записи одного элемента: статус, ID записи, описание ошибки
+Outcome = Tuple[str, Optional[Any], Optional[str]]
+# Успешные статусы элементов; остальные (exists, not_found, invalid, duplicate, failed) - ошибки
+SUCCESS_STATUSES = ('created', 'updated', 'saved', 'deactivated')
+# Ошибки записи пачки: пачка откатывается и записывается по одному элементу
+WRITE_ERRORS = (SQLAlchemyError, CompositeLinkError, PeriodArchivedError)
+
+
+class BulkPayloadError(Exception):
+    """Тело массового запроса не удалось разобрать."""
+    status_code = 400
+
+
+class BulkTooLargeError(BulkPayloadError):
+    """Элементов в массовом запросе больше допустимого."""
+    status_code = 413
+
+
+class BulkService:
+    """
+    Массовое создание, изменение и деактивация записей справочников.
+
+    Элементы запроса (JSON массив или NDJSON) проверяются схемой за один проход,
+    неверные элементы и повторы ключей сразу попадают в результат с ошибкой.
+    Остальные записываются пачками по BULK_CHUNK_SIZE, каждая пачка - одна
+    транзакция с одним запросом на операцию. Если пачка не записалась (например,
+    ссылка на несуществующего клиента), она откатывается и ее элементы
+    записываются по одному, чтобы ошибка досталась только виновному элементу.
+    Записанные пачки не откатываются из-за ошибок в других пачках.
+    """
+
+    @staticmethod
+    def parse_payload(body: bytes, content_type: str = "") -> List[Any]:
+        """
+        Разбирает тело запроса: JSON массив или NDJSON (по элементу в строке,
+        пустые строки пропускаются).
+
+        Raises:
+            BulkPayloadError: Тело не разбирается
+            BulkTooLargeError: Элементов больше BULK_MAX_ITEMS
+        """
+        if NDJSON_MEDIA_TYPE in content_type:
+            items = []
+            for number, line in enumerate(body.splitlines(), start=1):
+                if not line.strip():
+                    continue
+                try:
+                    items.append(orjson.loads(line))
+                except orjson.JSONDecodeError:
+                    raise BulkPayloadError(f"Строка {number}: неверный JSON")
+        else:
+            try:
+                items = orjson.loads(body)
+            except orjson.JSONDecodeError:
+                raise BulkPayloadError("Неверный JSON")
+            if not isinstance(items, list):
+                raise BulkPayloadError("Ожидается JSON массив элементов")
+
+        if len(items) > BULK_MAX_ITEMS:
+            raise BulkTooLargeError(f"Элементов в запросе больше {BULK_MAX_ITEMS}")
+        return items
+
+    @staticmethod
+    def create(
+            db: Session,
+            crud: CRUDBase,
+            schema: Type[BaseModel],
+            raw_items: Sequence[Any],
+            upsert: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Создает записи; с upsert=True существующие по уникальному ключу записи обновляются.
+
+        Args:
+            db: Сессия базы данных
+            crud: Операции записи справочника
+            schema: Схема создания записи
+            raw_items: Разобранные элементы запроса
+            upsert: Обновлять существующие записи вместо ошибки exists
+
+        Returns:
+            Dict[str, Any]: Итоги и результат по каждому элементу (BulkResult)
+        """
+        columns = crud.conflict_columns
+
+        def key(obj: BaseModel) -> Optional[Tuple[Any, ...]]:
+            return tuple(getattr(obj, column) for column in columns) if columns else None
+
+        def write(objs: List[BaseModel]) -> List[Outcome]:
+            if upsert:
+                db_objs = crud.upsert_many(db, objs, commit=False)
+                return [('saved', getattr(db_obj, crud.pk.key), None) for db_obj in db_objs]
+            db_objs = crud.create_many(db, objs, commit=False)
+            if not columns:
+                return [('created', getattr(db_obj, crud.pk.key), None) for db_obj in db_objs]
+            created = {key(db_obj): getattr(db_obj, crud.pk.key) for db_obj in db_objs}
+            return [
+                ('created', created[key(obj)], None) if key(obj) in created
+                else ('exists', None, "Запись с таким ключом уже существует")
+                for obj in objs
+            ]
+
+        return BulkService._run(db, schema, raw_items, key, write)
+
+    @staticmethod
+    def update(db: Session, crud: CRUDBase, schema: Type[BaseModel], raw_items: Sequence[Any]) -> Dict[str, Any]:
+        """
+        Изменяет записи: каждый элемент - ID записи и изменяемые поля.
+
+        Args:
+            schema: Схема изменения с полем id
+
+        Returns:
+            Dict[str, Any]: Итоги и результат по каждому элементу (BulkResult)
+        """
+
+        def write(objs: List[BaseModel]) -> List[Outcome]:
+            updated = set(crud.update_many(db, [(obj.id, obj) for obj in objs], commit=False))
+            return [
+                ('updated', obj.id, None) if obj.id in updated
+                else ('invalid', obj.id, "Нет изменяемых полей") if not obj.model_fields_set - {'id'}
+                else ('not_found', obj.id, "Запись не найдена")
+                for obj in objs
+            ]
+
+        return BulkService._run(db, schema, raw_items, lambda obj: obj.id, write)
+
+    @staticmethod
+    def deactivate(db: Session, crud: CRUDBase, ids: Sequence[int]) -> Dict[str, Any]:
+        """
+        Снимает признак is_active у записей.
+
+        Returns:
+            Dict[str, Any]: Итоги и результат по каждому ID (BulkResult)
+        """
+
+        def write(batch_ids: List[int]) -> List[Outcome]:
+            found = set(crud.deactivate_many(db, batch_ids, commit=False))
+            return [
+                ('deactivated', id, None) if id in found else ('not_found', id, "Запись не найдена")
+                for id in batch_ids
+            ]
+
+        return BulkService._run(db, None, ids, lambda id: id, write)
+
+    @staticmethod
+    def _run(
+            db: Session,
+            schema: Optional[Type[BaseModel]],
+            raw_items: Sequence[Any],
+            key: Callable[[Any], Any],
+            write: Callable[[List[Any]], List[Outcome]]
+    ) -> Dict[str, Any]:
+        results: List[Optional[Dict[str, Any]]] = [None] * len(raw_items)
+
+        # Проверка всех элементов до записи
+        pending: List[Tuple[int, Any]] = []
+        seen: Dict[Any, int] = {}
+        for index, raw in enumerate(raw_items):
+            if schema is not None:
+                try:
+                    raw = schema.model_validate(raw)
+                except ValidationError as e:
+                    results[index] = BulkService._result(index, ('invalid', None, BulkService._format_errors(e)))
+                    continue
+            item_key = key(raw)
+            if item_key is not None:
+                if item_key in seen:
+                    results[index] = BulkService._result(
+                        index, ('duplicate', None, f"Повтор элемента {seen[item_key]}")
+                    )
+                    continue
+                seen[item_key] = index
+            pending.append((index, raw))
+
+        for start in range(0, len(pending), BULK_CHUNK_SIZE):
+            chunk = pending[start:start + BULK_CHUNK_SIZE]
+            try:
+                outcomes = write([item for _, item in chunk])
+                db.commit()
+            except WRITE_ERRORS as e:
+                db.rollback()
+                logger.info(f"Пачка из {len(chunk)} элементов не записана ({BulkService._db_error(e)}), запись по одному")
+                outcomes = [BulkService._write_one(db, write, item) for _, item in chunk]
+            for (index, _), outcome in zip(chunk, outcomes):
+                results[index] = BulkService._result(index, outcome)
+
+        succeeded = sum(1 for result in results if result['status'] in SUCCESS_STATUSES)
+        return {
+            'total': len(results),
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded,
+            'items': results
+        }
+
+    @staticmethod
+    def _write_one(db: Session, write: Callable[[List[Any]], List[Outcome]], item: Any) -> Outcome:
+        try:
+            outcome = write([item])[0]
+            db.commit()
+            return outcome
+        except WRITE_ERRORS as e:
+            db.rollback()
+            return 'failed', None, BulkService._db_error(e)
+
+    @staticmethod
+    def _result(index: int, outcome: Outcome) -> Dict[str, Any]:
+        status, id, error = outcome
+        return {'index': index, 'status': status, 'id': id, 'error': error}
+
+    @staticmethod
+    def _format_errors(error: ValidationError) -> str:
+        return "; ".join(
+            f"{'.'.join(str(part) for part in item['loc']) or 'элемент'}: {item['msg']}" for item in error.errors()
+        )
+
+    @staticmethod
+    def _db_error(error: Exception) -> str:
+        return error_summary(error)
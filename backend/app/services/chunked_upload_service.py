@@ -0,0 +1,385 @@
+import os
+import json
+import fcntl
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+import tempfile
+from pathlib import Path
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, List, Any, Optional, AsyncIterator, BinaryIO
+from app.services.excel_service import ExcelUploadError, EXCEL_SIGNATURES, UPLOAD_MAX_SIZE
+
+logger = logging.getLogger('chunked_upload_service')
+
+UPLOAD_STAGING_DIR = os.getenv("UPLOAD_STAGING_DIR", os.path.join(tempfile.gettempdir(), "cargo-upload-staging"))
+# Рекомендуемый и максимальный размер одной части
+UPLOAD_CHUNK_DEFAULT_SIZE = int(os.getenv("UPLOAD_CHUNK_DEFAULT_SIZE", 2 * 1024 * 1024))
+UPLOAD_CHUNK_MAX_SIZE = int(os.getenv("UPLOAD_CHUNK_MAX_SIZE", 16 * 1024 * 1024))
+# Сколько байт тела части накапливается перед записью на диск
+UPLOAD_CHUNK_WRITE_SIZE = int(os.getenv("UPLOAD_CHUNK_WRITE_SIZE", 1024 * 1024))
+# Сколько первых байт файла нужно для проверки сигнатуры Excel
+SIGNATURE_SIZE = max(len(signature) for signature in EXCEL_SIGNATURES)
+# Через сколько секунд без активности сессия считается брошенной
+UPLOAD_STAGING_TTL = int(os.getenv("UPLOAD_STAGING_TTL", 24 * 60 * 60))
+# Не чаще, чем раз в столько секунд, запускается очистка брошенных сессий
+UPLOAD_STAGING_GC_INTERVAL = int(os.getenv("UPLOAD_STAGING_GC_INTERVAL", 10 * 60))
+
+
+class ChunkedUploadError(ExcelUploadError):
+    """Ошибка протокола загрузки по частям."""
+    status_code = 400
+
+
+class UploadSessionNotFoundError(ChunkedUploadError):
+    status_code = 404
+
+
+class ChunkConflictError(ChunkedUploadError):
+    status_code = 409
+
+
+class StagedFileReader:
+    """
+    Последовательное чтение собранного из частей файла.
+    Повторяет интерфейс UploadFile (read, size, filename), поэтому файл
+    передается в ExcelService.spooled_upload так же, как обычная загрузка.
+    """
+
+    def __init__(self, filename: str, size: int, parts: List[Path]):
+        self.filename = filename
+        self.size = size
+        self._parts = list(parts)
+        self._current: Optional[BinaryIO] = None
+
+    async def read(self, size: int = -1) -> bytes:
+        return await run_in_threadpool(self._read, size)
+
+    def _read(self, size: int) -> bytes:
+        while self._parts or self._current is not None:
+            if self._current is None:
+                self._current = open(self._parts.pop(0), 'rb')
+            data = self._current.read(size)
+            if data:
+                return data
+            self._current.close()
+            self._current = None
+        return b""
+
+    def close(self) -> None:
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+
+
+class ChunkedUploadService:
+    """
+    Загрузка больших файлов по частям с возможностью докачки.
+
+    Каждая сессия хранится в отдельном каталоге UPLOAD_STAGING_DIR:
+    meta.json с параметрами сессии и по файлу на каждую принятую часть
+    (<смещение>.part и <смещение>.sha256). Состояние вычисляется по списку
+    файлов, поэтому части одной сессии можно принимать параллельно,
+    в том числе разными процессами: тела частей пишутся независимо, а проверка
+    пересечений и публикация части выполняются под блокировкой meta.json
+    (fcntl.flock). При обрыве связи клиент запрашивает статус и досылает
+    только недостающие части.
+    """
+
+    def __init__(self, staging_dir: str = UPLOAD_STAGING_DIR):
+        self.staging_dir = Path(staging_dir)
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+        self._last_gc = 0.0
+
+    def _session_dir(self, upload_id: str) -> Path:
+        # Идентификатор приходит из URL: допускаем только сгенерированный нами формат
+        if len(upload_id) != 32 or any(ch not in "0123456789abcdef" for ch in upload_id):
+            raise UploadSessionNotFoundError("Сессия загрузки не найдена")
+        return self.staging_dir / upload_id
+
+    def _load_meta(self, upload_id: str, owner: str) -> Dict[str, Any]:
+        try:
+            meta = json.loads((self._session_dir(upload_id) / "meta.json").read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            raise UploadSessionNotFoundError("Сессия загрузки не найдена")
+        if meta['owner'] != owner:
+            raise UploadSessionNotFoundError("Сессия загрузки не найдена")
+        return meta
+
+    def init_session(self, filename: str, total_size: int, owner: str, sha256: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Создает сессию загрузки по частям.
+
+        Args:
+            filename: Имя загружаемого файла
+            total_size: Полный размер файла в байтах
+            owner: Логин пользователя, создавшего сессию
+            sha256: SHA-256 всего файла для проверки при завершении (необязательно)
+
+        Returns:
+            Dict[str, Any]: Статус созданной сессии
+        """
+        self.collect_garbage()
+
+        if total_size <= 0:
+            raise ChunkedUploadError("Размер файла должен быть больше нуля")
+        if total_size > UPLOAD_MAX_SIZE:
+            raise ChunkedUploadError(
+                f"Размер файла превышает допустимый ({UPLOAD_MAX_SIZE // (1024 * 1024)} МБ)"
+            )
+
+        upload_id = uuid.uuid4().hex
+        session_dir = self._session_dir(upload_id)
+        session_dir.mkdir()
+        meta = {
+            'upload_id': upload_id,
+            'filename': filename,
+            'total_size': total_size,
+            'sha256': sha256.lower() if sha256 else None,
+            'owner': owner,
+            'created_at': time.time()
+        }
+        (session_dir / "meta.json").write_text(json.dumps(meta, ensure_ascii=False), encoding='utf-8')
+        logger.info(f"Создана сессия загрузки {upload_id}: {filename}, {total_size} байт")
+        return self._status(meta)
+
+    async def put_chunk(
+            self,
+            upload_id: str,
+            owner: str,
+            offset: int,
+            body: AsyncIterator[bytes],
+            checksum: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Принимает одну часть файла.
+
+        Тело части пишется во временный файл порциями с подсчетом SHA-256
+        и становится видимым только после проверки (атомарным переименованием).
+        Повторная отправка части с тем же смещением заменяет ранее принятую.
+
+        Args:
+            upload_id: ID сессии
+            owner: Логин пользователя
+            offset: Смещение части в файле
+            body: Асинхронный поток байтов тела запроса
+            checksum: Ожидаемый SHA-256 части (заголовок X-Chunk-SHA256)
+
+        Returns:
+            Dict[str, Any]: Статус сессии после приема части
+        """
+        meta = await run_in_threadpool(self._load_meta, upload_id, owner)
+        session_dir = self._session_dir(upload_id)
+        total_size = meta['total_size']
+        if offset < 0 or offset >= total_size:
+            raise ChunkedUploadError("Смещение части выходит за пределы файла")
+
+        # Файловые операции выполняются в пуле потоков: тело читается в цикле
+        # событий, на диск пишется порциями не меньше UPLOAD_CHUNK_WRITE_SIZE
+        digest = hashlib.sha256()
+        size = 0
+        tmp_path = session_dir / f"{offset:012d}.{uuid.uuid4().hex}.tmp"
+        try:
+            tmp_file = await run_in_threadpool(open, tmp_path, 'wb')
+            try:
+                pending = bytearray()
+                # Сигнатура проверяется, когда накоплено SIGNATURE_SIZE байт
+                # (первый блок тела может быть короче) или тело закончилось
+                head_checked = offset != 0
+                async for block in body:
+                    if not block:
+                        continue
+                    size += len(block)
+                    if size > UPLOAD_CHUNK_MAX_SIZE or offset + size > total_size:
+                        raise ChunkedUploadError("Часть превышает допустимый размер или выходит за пределы файла")
+                    digest.update(block)
+                    pending += block
+                    if not head_checked and size >= SIGNATURE_SIZE:
+                        self._check_signature(pending)
+                        head_checked = True
+                    if len(pending) >= UPLOAD_CHUNK_WRITE_SIZE:
+                        await run_in_threadpool(tmp_file.write, bytes(pending))
+                        pending.clear()
+                if not head_checked and size:
+                    self._check_signature(pending)
+                if pending:
+                    await run_in_threadpool(tmp_file.write, bytes(pending))
+            finally:
+                await run_in_threadpool(tmp_file.close)
+
+            if size == 0:
+                raise ChunkedUploadError("Получена пустая часть")
+            if checksum and checksum.lower() != digest.hexdigest():
+                raise ChunkedUploadError("Контрольная сумма части не совпадает, отправьте часть повторно")
+            return await run_in_threadpool(self._commit_chunk, meta, session_dir, tmp_path, offset, size, digest.hexdigest())
+        finally:
+            await run_in_threadpool(tmp_path.unlink, missing_ok=True)
+
+    @staticmethod
+    def _check_signature(head: bytes) -> None:
+        if not bytes(head[:SIGNATURE_SIZE]).startswith(EXCEL_SIGNATURES):
+            raise ChunkedUploadError("Содержимое файла не соответствует формату Excel")
+
+    @staticmethod
+    def _locked(session_dir: Path) -> BinaryIO:
+        """
+        Открывает meta.json сессии с исключительной блокировкой (fcntl.flock):
+        блокировка действует между процессами и снимается при закрытии файла.
+        """
+        lock_file = open(session_dir / "meta.json", 'rb')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        except Exception:
+            lock_file.close()
+            raise
+        return lock_file
+
+    def _commit_chunk(
+            self,
+            meta: Dict[str, Any],
+            session_dir: Path,
+            tmp_path: Path,
+            offset: int,
+            size: int,
+            sha256: str
+    ) -> Dict[str, Any]:
+        """
+        Делает принятую часть видимой, если она не пересекается с другими частями.
+        Проверка и переименование выполняются под блокировкой сессии: две
+        пересекающиеся части, принятые параллельно, не могут обе пройти проверку.
+        """
+        end = offset + size
+        with self._locked(session_dir):
+            for other_offset, other_size in self._received_chunks(session_dir).items():
+                if other_offset != offset and other_offset < end and offset < other_offset + other_size:
+                    raise ChunkConflictError(
+                        f"Часть [{offset}, {end}) пересекается с уже принятой частью "
+                        f"[{other_offset}, {other_offset + other_size})"
+                    )
+
+            (session_dir / f"{offset:012d}.sha256").write_text(sha256)
+            os.replace(tmp_path, session_dir / f"{offset:012d}.part")
+            # Время изменения каталога служит отметкой активности для очистки брошенных сессий
+            os.utime(session_dir)
+            return self._status(meta)
+
+    def get_status(self, upload_id: str, owner: str) -> Dict[str, Any]:
+        """Возвращает статус сессии: принятые байты и недостающие диапазоны."""
+        return self._status(self._load_meta(upload_id, owner))
+
+    def open_completed(self, upload_id: str, owner: str) -> StagedFileReader:
+        """
+        Проверяет, что все части приняты, и открывает собранный файл для чтения.
+
+        Args:
+            upload_id: ID сессии
+            owner: Логин пользователя
+
+        Returns:
+            StagedFileReader: Поток с содержимым файла в правильном порядке
+        """
+        meta = self._load_meta(upload_id, owner)
+        session_dir = self._session_dir(upload_id)
+        with self._locked(session_dir):
+            status = self._status(meta)
+            if not status['complete']:
+                raise ChunkConflictError(f"Файл принят не полностью, недостающие диапазоны: {status['missing']}")
+
+            # Части должны покрывать файл ровно, без пересечений: иначе собранный
+            # файл был бы длиннее и поврежден
+            chunks = self._received_chunks(session_dir)
+            position = 0
+            for offset in sorted(chunks):
+                if offset != position:
+                    raise ChunkConflictError(f"Части файла пересекаются: часть со смещением {offset}, ожидалось {position}")
+                position += chunks[offset]
+            if position != meta['total_size']:
+                raise ChunkConflictError(f"Размер частей ({position}) не совпадает с размером файла")
+
+        parts = [session_dir / f"{offset:012d}.part" for offset in sorted(chunks)]
+        return StagedFileReader(meta['filename'], meta['total_size'], parts)
+
+    def verify_checksum(self, upload_id: str, owner: str, sha256: str) -> None:
+        """Сверяет SHA-256 собранного файла с заявленным при создании сессии."""
+        expected = self._load_meta(upload_id, owner).get('sha256')
+        if expected and expected != sha256:
+            raise ChunkedUploadError("Контрольная сумма файла не совпадает с заявленной при создании сессии")
+
+    def delete_session(self, upload_id: str, owner: str) -> None:
+        """Удаляет сессию и все принятые части."""
+        self._load_meta(upload_id, owner)
+        shutil.rmtree(self._session_dir(upload_id), ignore_errors=True)
+
+    def collect_garbage(self, force: bool = False) -> int:
+        """
+        Удаляет сессии без активности дольше UPLOAD_STAGING_TTL.
+
+        Args:
+            force: Запустить очистку, не дожидаясь UPLOAD_STAGING_GC_INTERVAL
+
+        Returns:
+            int: Количество удаленных сессий
+        """
+        now = time.time()
+        if not force and now - self._last_gc < UPLOAD_STAGING_GC_INTERVAL:
+            return 0
+        self._last_gc = now
+
+        removed = 0
+        for session_dir in self.staging_dir.iterdir():
+            try:
+                if session_dir.is_dir() and now - session_dir.stat().st_mtime > UPLOAD_STAGING_TTL:
+                    shutil.rmtree(session_dir, ignore_errors=True)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        if removed:
+            logger.info(f"Удалено брошенных сессий загрузки: {removed}")
+        return removed
+
+    @staticmethod
+    def _received_chunks(session_dir: Path) -> Dict[int, int]:
+        """Возвращает принятые части: смещение -> размер."""
+        chunks = {}
+        for path in session_dir.glob("*.part"):
+            try:
+                chunks[int(path.stem)] = path.stat().st_size
+            except (ValueError, FileNotFoundError):
+                continue
+        return chunks
+
+    def _status(self, meta: Dict[str, Any]) -> Dict[str, Any]:
+        session_dir = self._session_dir(meta['upload_id'])
+        chunks = self._received_chunks(session_dir)
+        missing = []
+        position = 0
+        for offset in sorted(chunks):
+            if offset > position:
+                missing.append([position, offset])
+            position = max(position, offset + chunks[offset])
+        if position < meta['total_size']:
+            missing.append([position, meta['total_size']])
+
+        chunk_list = []
+        for offset in sorted(chunks):
+            try:
+                checksum = (session_dir / f"{offset:012d}.sha256").read_text()
+            except FileNotFoundError:
+                checksum = None
+            chunk_list.append({'offset': offset, 'size': chunks[offset], 'sha256': checksum})
+
+        return {
+            'upload_id': meta['upload_id'],
+            'filename': meta['filename'],
+            'total_size': meta['total_size'],
+            'received_size': sum(chunks.values()),
+            'chunk_size': UPLOAD_CHUNK_DEFAULT_SIZE,
+            'chunks': chunk_list,
+            'missing': missing,
+            'complete': not missing
+        }
+
+
+chunked_upload_service = ChunkedUploadService()
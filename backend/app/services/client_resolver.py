@@ -0,0 +1,139 @@
+import os
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Iterable, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger('client_resolver')
+
+# Размер и время жизни кэша код клиента -> ID. Время жизни ограничивает
+# устаревание, если клиента изменили или удалили в другом процессе
+CLIENT_CACHE_SIZE = int(os.getenv("CLIENT_CACHE_SIZE", 50000))
+CLIENT_CACHE_TTL = float(os.getenv("CLIENT_CACHE_TTL", 300))
+
+CLIENT_CODE_PATTERN = re.compile(r'^[A-Z0-9]{3,10}$')
+
+
+def normalize_client_code(code: Optional[str]) -> Optional[str]:
+    """Приводит код клиента к формату справочника; None, если код туда не подходит."""
+    if not isinstance(code, str):
+        return None
+    code = code.strip().upper()
+    return code if CLIENT_CODE_PATTERN.match(code) else None
+
+
+class ClientResolver:
+    """
+    Поиск ID клиентов по кодам для целой партии за постоянное число запросов.
+
+    Коды, которых нет в кэше процесса, ищутся одним запросом
+    WHERE code = ANY(...), отсутствующие в справочнике клиенты создаются
+    одним INSERT ... ON CONFLICT DO NOTHING RETURNING. Запросы выполняются
+    в транзакции вызывающего кода, поэтому созданные клиенты попадают
+    в кэш только после фиксации транзакции (через remember).
+    """
+
+    def __init__(self, max_size: int = CLIENT_CACHE_SIZE, ttl: float = CLIENT_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_cached(self, codes: Iterable[str]) -> Dict[str, int]:
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for code in codes:
+                item = self._items.get(code)
+                if item is None:
+                    continue
+                if now - item[1] > self.ttl:
+                    del self._items[code]
+                    continue
+                self._items.move_to_end(code)
+                found[code] = item[0]
+        return found
+
+    def remember(self, mapping: Dict[str, int]) -> None:
+        """Запоминает коды клиентов, уже зафиксированные в базе."""
+        now = time.monotonic()
+        with self._lock:
+            for code, client_id in mapping.items():
+                self._items[code] = (client_id, now)
+                self._items.move_to_end(code)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, *codes: str) -> None:
+        """Удаляет коды из кэша (при изменении кода или удалении клиента)."""
+        with self._lock:
+            for code in codes:
+                self._items.pop(code, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def resolve(
+            self,
+            db: Session,
+            codes: Iterable[Optional[str]],
+            create_missing: bool = True
+    ) -> Tuple[Dict[str, int], List[str]]:
+        """
+        Находит ID клиентов по кодам, при необходимости создавая недостающих.
+
+        Args:
+            db: Сессия базы данных (транзакция не фиксируется)
+            codes: Коды клиентов (повторы и неподходящие под формат коды допускаются)
+            create_missing: Создавать клиентов, которых нет в справочнике
+                (название клиента при создании совпадает с кодом)
+
+        Returns:
+            Tuple[Dict[str, int], List[str]]: Код -> ID для найденных и созданных
+                клиентов и список созданных кодов
+        """
+        wanted = {code for code in map(normalize_client_code, codes) if code}
+        resolved = self._get_cached(wanted)
+        missing = sorted(wanted - resolved.keys())
+        if not missing:
+            return resolved, []
+
+        found = dict(db.execute(
+            text("SELECT code, id FROM clients WHERE code = ANY(:codes)"),
+            {'codes': missing}
+        ).all())
+        resolved.update(found)
+        # Найденные клиенты уже есть в базе, их можно кэшировать сразу
+        self.remember(found)
+
+        created: Dict[str, int] = {}
+        missing = [code for code in missing if code not in found]
+        if missing and create_missing:
+            created = dict(db.execute(
+                text(
+                    "INSERT INTO clients (code, name) SELECT code, code FROM unnest(CAST(:codes AS VARCHAR[])) AS code "
+                    "ON CONFLICT (code) DO NOTHING RETURNING code, id"
+                ),
+                {'codes': missing}
+            ).all())
+            resolved.update(created)
+
+            # Клиентов, созданных параллельно другой транзакцией, дочитываем
+            raced = [code for code in missing if code not in created]
+            if raced:
+                resolved.update(db.execute(
+                    text("SELECT code, id FROM clients WHERE code = ANY(:codes)"),
+                    {'codes': raced}
+                ).all())
+
+        if created:
+            logger.info(f"Создано клиентов: {len(created)}")
+        return resolved, sorted(created)
+
+
+client_resolver = ClientResolver()
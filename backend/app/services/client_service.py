@@ -0,0 +1,47 @@
+from typing import List, Optional, Sequence, Tuple
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+from app.api.v1.crud.base import CRUDBase
+from app.api.v1.crud.cargo.clients import client_crud
+from app.api.v1.models.cargo import Client
+from app.api.v1.schemas.cargo import ClientCreate, ClientUpdate
+from app.services.client_resolver import client_resolver
+
+
+class ClientService(CRUDBase[Client, ClientCreate, ClientUpdate]):
+    """Запись клиентов; изменение и удаление кода сбрасывают его в кэше client_resolver."""
+
+    def update(self, db: Session, id: int, obj_in: ClientUpdate, commit: bool = True) -> Optional[Client]:
+        if 'code' not in obj_in.model_fields_set:
+            return super().update(db, id, obj_in, commit)
+        result = self.update_with_previous(db, id, obj_in, ['code'], commit)
+        if result is None:
+            return None
+        db_client, previous = result
+        client_resolver.invalidate(previous['code'], db_client.code)
+        return db_client
+
+    def update_many(self, db: Session, items: Sequence[Tuple[int, ClientUpdate]], commit: bool = True) -> List[int]:
+        updated = super().update_many(db, items, commit)
+        # Прежние коды не возвращаются, поэтому при смене кодов кэш сбрасывается целиком
+        if any('code' in obj_in.model_fields_set for _, obj_in in items):
+            client_resolver.clear()
+        return updated
+
+    def delete(self, db: Session, id: int, commit: bool = True) -> bool:
+        return bool(self.delete_many(db, [id], commit))
+
+    def delete_many(self, db: Session, ids: Sequence[int], commit: bool = True) -> List[int]:
+        if not ids:
+            return []
+        deleted = db.execute(
+            delete(Client).where(Client.id.in_(list(ids))).returning(Client.id, Client.code)
+            .execution_options(synchronize_session=False)
+        ).all()
+        if commit:
+            self.commit(db)
+        client_resolver.invalidate(*(row.code for row in deleted))
+        return [row.id for row in deleted]
+
+
+client_service = ClientService(Client, conflict_columns=client_crud.conflict_columns)
@@ -0,0 +1,299 @@
+import logging
+from typing import Dict, List, Any, Iterable, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.api.v1.models.cargo import CompositePlace
+from app.api.v1.schemas.cargo import CompositePlaceCreate
+from app.services.rollup_service import RollupService
+
+logger = logging.getLogger('closure_service')
+
+# Предельная глубина вложенности сборных мест: ограничивает рекурсию,
+# если в связях по ошибке оказался цикл
+CLOSURE_MAX_DEPTH = 32
+# Пространство рекомендательных блокировок связей сборных мест (первый ключ pg_advisory_xact_lock)
+CLOSURE_LOCK_NAMESPACE = 4201
+
+# Все пути через заданные места по текущим связям: предки места (up) на любые
+# потомки места (down). Для леса (у места не больше одного основного места)
+# каждый путь однозначен, MIN(depth) лишь защищает от дублей
+PATHS_SQL = f"""
+    WITH RECURSIVE up(node, ancestor, depth) AS (
+        SELECT n, n, 0 FROM unnest(CAST(:nodes AS INTEGER[])) AS n
+        UNION ALL
+        SELECT up.node, e.parent_id, up.depth + 1
+        FROM up JOIN composite_places e ON e.period_id = :period_id AND e.cargo_place_id = up.ancestor
+        WHERE up.depth < {CLOSURE_MAX_DEPTH}
+    ), down(node, descendant, depth) AS (
+        SELECT n, n, 0 FROM unnest(CAST(:nodes AS INTEGER[])) AS n
+        UNION ALL
+        SELECT down.node, e.cargo_place_id, down.depth + 1
+        FROM down JOIN composite_places e ON e.period_id = :period_id AND e.parent_id = down.descendant
+        WHERE down.depth < {CLOSURE_MAX_DEPTH}
+    )
+    INSERT INTO composite_place_closure (period_id, ancestor_id, descendant_id, depth)
+    SELECT :period_id, up.ancestor, down.descendant, MIN(up.depth + down.depth)
+    FROM up JOIN down ON down.node = up.node
+    WHERE up.depth + down.depth > 0
+    GROUP BY up.ancestor, down.descendant
+    ON CONFLICT DO NOTHING
+"""
+
+PLACE_COLUMNS = "c.id, c.tracking_number, c.period_id, c.batch_id, c.status, c.weight, c.volume, c.is_active"
+
+
+class CompositeLinkError(Exception):
+    """Связь сборных мест нарушает иерархию."""
+    status_code = 409
+
+
+class CompositePlaceNotFoundError(CompositeLinkError):
+    """Места связи нет."""
+    status_code = 404
+
+
+class CompositePeriodError(CompositeLinkError):
+    """Место связи относится к другому периоду."""
+    status_code = 400
+
+
+class ClosureService:
+    """
+    Таблица замыкания иерархии сборных мест composite_place_closure.
+
+    Для каждой пары предок - потомок (на любой глубине) хранится строка
+    с расстоянием depth, поэтому содержимое сборного места и цепочка
+    мест, в которые вложено место, читаются одним запросом по индексу,
+    без рекурсии. Таблица обновляется в транзакции, меняющей связи.
+    Строк места самого с собой (depth = 0) в таблице нет.
+    """
+
+    @staticmethod
+    def refresh(db: Session, period_id: int, nodes: Iterable[int]) -> None:
+        """
+        Пересчитывает пути, проходящие через места, после изменения их связей
+        с основными местами. Транзакция не фиксируется.
+
+        Любой путь, который могла затронуть добавленная или удаленная связь
+        (место -> основное место), проходит через место этой связи, поэтому
+        достаточно удалить старые пути через эти места и построить их заново.
+
+        Args:
+            db: Сессия базы данных
+            period_id: Период мест
+            nodes: ID мест, у которых изменились связи с основными местами
+        """
+        nodes = sorted(set(nodes))
+        if not nodes:
+            return
+        params = {'period_id': period_id, 'nodes': nodes}
+        db.execute(
+            text(
+                "DELETE FROM composite_place_closure t "
+                "WHERE t.period_id = :period_id AND ("
+                "t.descendant_id = ANY(:nodes) OR t.ancestor_id = ANY(:nodes) "
+                "OR EXISTS ("
+                "SELECT 1 FROM composite_place_closure a "
+                "JOIN composite_place_closure d ON d.period_id = a.period_id AND d.ancestor_id = a.descendant_id "
+                "WHERE a.period_id = :period_id AND a.descendant_id = ANY(:nodes) "
+                "AND a.ancestor_id = t.ancestor_id AND d.descendant_id = t.descendant_id))"
+            ),
+            params
+        )
+        db.execute(text(PATHS_SQL), params)
+
+    @staticmethod
+    def lock_period(db: Session, period_id: int) -> None:
+        """
+        Блокирует изменение связей сборных мест периода до конца транзакции.
+        Проверка связи читает таблицу замыкания без блокировок строк, поэтому
+        без этой блокировки две параллельные связи могли бы вместе образовать цикл.
+        """
+        db.execute(
+            text("SELECT pg_advisory_xact_lock(:namespace, :period_id)"),
+            {'namespace': CLOSURE_LOCK_NAMESPACE, 'period_id': period_id}
+        )
+
+    @staticmethod
+    def check_places(db: Session, period_id: int, *place_ids: int) -> List[int]:
+        """
+        Проверяет, что места есть и относятся к периоду.
+
+        Returns:
+            List[int]: ID партий мест
+
+        Raises:
+            CompositePlaceNotFoundError: Места нет
+            CompositePeriodError: Место относится к другому периоду
+        """
+        rows = db.execute(
+            text("SELECT id, period_id, batch_id FROM cargo_places WHERE id = ANY(:place_ids)"),
+            {'place_ids': list(place_ids)}
+        ).all()
+        periods: Dict[int, List[int]] = {}
+        batch_ids = set()
+        for place_id, place_period_id, batch_id in rows:
+            periods.setdefault(place_id, []).append(place_period_id)
+            if place_period_id == period_id and batch_id is not None:
+                batch_ids.add(batch_id)
+        for place_id in place_ids:
+            if place_id not in periods:
+                raise CompositePlaceNotFoundError(f"Место {place_id} не найдено")
+            if period_id not in periods[place_id]:
+                raise CompositePeriodError(f"Место {place_id} относится к другому периоду")
+        return sorted(batch_ids)
+
+    @staticmethod
+    def create_link(db: Session, composite: CompositePlaceCreate) -> CompositePlace:
+        """
+        Вкладывает место в сборное место и фиксирует транзакцию. Таблица
+        замыкания и сводка партий обоих мест (число мест и сборных мест
+        зависит от связей) пересчитываются в той же транзакции.
+
+        Raises:
+            CompositeLinkError: Мест нет, они в другом периоде или связь недопустима
+        """
+        try:
+            ClosureService.lock_period(db, composite.period_id)
+            batch_ids = ClosureService.check_places(
+                db, composite.period_id, composite.cargo_place_id, composite.parent_id
+            )
+            exists = db.query(CompositePlace).filter(
+                CompositePlace.cargo_place_id == composite.cargo_place_id,
+                CompositePlace.parent_id == composite.parent_id
+            ).first()
+            if exists is not None:
+                raise CompositeLinkError("Место уже входит в это сборное место")
+            ClosureService.check_link(db, composite.period_id, composite.cargo_place_id, composite.parent_id)
+
+            db_composite = CompositePlace(**composite.model_dump())
+            db.add(db_composite)
+            db.flush()
+            ClosureService.refresh(db, composite.period_id, [composite.cargo_place_id])
+            RollupService.refresh_batches(db, batch_ids, period_id=composite.period_id)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        db.refresh(db_composite)
+        return db_composite
+
+    @staticmethod
+    def delete_link(db: Session, db_composite: CompositePlace) -> None:
+        """
+        Убирает место из сборного места и фиксирует транзакцию; таблица
+        замыкания и сводка партий обоих мест пересчитываются (см. create_link).
+        """
+        period_id, cargo_place_id = db_composite.period_id, db_composite.cargo_place_id
+        batch_ids = db.execute(
+            text(
+                "SELECT DISTINCT batch_id FROM cargo_places "
+                "WHERE period_id = :period_id AND id = ANY(:place_ids) AND batch_id IS NOT NULL"
+            ),
+            {'period_id': period_id, 'place_ids': [cargo_place_id, db_composite.parent_id]}
+        ).scalars().all()
+        db.delete(db_composite)
+        try:
+            ClosureService.lock_period(db, period_id)
+            db.flush()
+            ClosureService.refresh(db, period_id, [cargo_place_id])
+            RollupService.refresh_batches(db, batch_ids, period_id=period_id)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    @staticmethod
+    def check_link(db: Session, period_id: int, cargo_place_id: int, parent_id: int) -> None:
+        """
+        Проверяет, что связь место -> основное место не нарушает иерархию:
+        у места не больше одного основного места и связь не образует цикл.
+        Вызывается после lock_period в той же транзакции.
+
+        Raises:
+            CompositeLinkError: Связь недопустима
+        """
+        has_parent = db.execute(
+            text(
+                "SELECT EXISTS (SELECT 1 FROM composite_places "
+                "WHERE period_id = :period_id AND cargo_place_id = :cargo_place_id AND parent_id <> :parent_id)"
+            ),
+            {'period_id': period_id, 'cargo_place_id': cargo_place_id, 'parent_id': parent_id}
+        ).scalar()
+        if has_parent:
+            raise CompositeLinkError("Место уже входит в другое сборное место")
+
+        is_cycle = cargo_place_id == parent_id or db.execute(
+            text(
+                "SELECT EXISTS (SELECT 1 FROM composite_place_closure "
+                "WHERE period_id = :period_id AND ancestor_id = :cargo_place_id AND descendant_id = :parent_id)"
+            ),
+            {'period_id': period_id, 'cargo_place_id': cargo_place_id, 'parent_id': parent_id}
+        ).scalar()
+        if is_cycle:
+            raise CompositeLinkError("Основное место вложено в добавляемое место")
+
+    @staticmethod
+    def get_subtree(db: Session, tracking_number: str, period_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Место и все вложенные в него места одним запросом.
+
+        Args:
+            db: Сессия базы данных
+            tracking_number: Номер отслеживания места
+            period_id: Период места (необязательно, сужает поиск до секции периода)
+
+        Returns:
+            List[Dict[str, Any]]: Само место (depth = 0) и вложенные места
+                с depth и parent_id (непосредственное основное место);
+                пустой список, если место не найдено
+        """
+        return [dict(row) for row in db.execute(
+            text(
+                f"WITH root AS ({ClosureService._root_sql(period_id)}) "
+                f"SELECT {PLACE_COLUMNS}, 0 AS depth, NULL::INTEGER AS parent_id "
+                "FROM root JOIN cargo_places c ON c.id = root.id AND c.period_id = root.period_id "
+                "UNION ALL "
+                f"SELECT {PLACE_COLUMNS}, t.depth, e.parent_id "
+                "FROM root "
+                "JOIN composite_place_closure t ON t.period_id = root.period_id AND t.ancestor_id = root.id "
+                "JOIN cargo_places c ON c.period_id = t.period_id AND c.id = t.descendant_id "
+                "LEFT JOIN composite_places e ON e.period_id = c.period_id AND e.cargo_place_id = c.id "
+                "ORDER BY depth, tracking_number"
+            ),
+            {'tracking_number': tracking_number, 'period_id': period_id}
+        ).mappings()]
+
+    @staticmethod
+    def get_path(db: Session, tracking_number: str, period_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Цепочка мест от верхнего сборного места до заданного места одним запросом.
+
+        Args:
+            db: Сессия базы данных
+            tracking_number: Номер отслеживания места
+            period_id: Период места (необязательно, сужает поиск до секции периода)
+
+        Returns:
+            List[Dict[str, Any]]: Места с depth (расстояние до заданного места),
+                первым идет место верхнего уровня; пустой список, если место не найдено
+        """
+        return [dict(row) for row in db.execute(
+            text(
+                f"WITH root AS ({ClosureService._root_sql(period_id)}) "
+                f"SELECT {PLACE_COLUMNS}, 0 AS depth "
+                "FROM root JOIN cargo_places c ON c.id = root.id AND c.period_id = root.period_id "
+                "UNION ALL "
+                f"SELECT {PLACE_COLUMNS}, t.depth "
+                "FROM root "
+                "JOIN composite_place_closure t ON t.period_id = root.period_id AND t.descendant_id = root.id "
+                "JOIN cargo_places c ON c.period_id = t.period_id AND c.id = t.ancestor_id "
+                "ORDER BY depth DESC"
+            ),
+            {'tracking_number': tracking_number, 'period_id': period_id}
+        ).mappings()]
+
+    @staticmethod
+    def _root_sql(period_id: Optional[int]) -> str:
+        condition = " AND period_id = :period_id" if period_id is not None else ""
+        return f"SELECT id, period_id FROM cargo_places WHERE tracking_number = :tracking_number{condition} LIMIT 1"
@@ -1,11 +1,24 @@
 import os
 import sys
 import logging
-from typing import Dict, List, Any
-from pathlib import Path
+import asyncio
+import hashlib
+import zlib
+import zipfile
 import tempfile
+from contextlib import asynccontextmanager, AsyncExitStack
+from typing import Dict, List, Any, AsyncIterator, BinaryIO, Optional, Callable
+from pathlib import Path
 from fastapi import UploadFile
-from scripts.CargoExcelParser import CargoExcelParser
+from starlette.concurrency import run_in_threadpool, iterate_in_threadpool
+from scripts.CargoExcelParser import CargoExcelParser, BatchSummaryAccumulator, PARSER_VERSION
+from app.core.responses import dumps
+from app.services.parse_cache import parse_cache
+from app.services.raw_store import raw_store
+from app.services.progress_service import UploadProgress
+from app.services.admission_service import (
+    admission_controller, estimate_parse_cost, AdmissionLease, AdmissionRejectedError
+)
 
 # Настройка логирования
 logging.basicConfig(
@@ -16,54 +29,612 @@ logging.basicConfig(
 logger = logging.getLogger('excel_service')
 sys.path.append(str(Path(__file__).parent.parent.parent.parent.parent / "scripts"))
 
+# Размер порции, которой читается загружаемый файл
+UPLOAD_CHUNK_SIZE = int(os.getenv("EXCEL_UPLOAD_CHUNK_SIZE", 256 * 1024))
+# Сколько байт файла держим в памяти, прежде чем буфер сбрасывается на диск
+UPLOAD_SPOOL_MAX_SIZE = int(os.getenv("EXCEL_UPLOAD_SPOOL_MAX_SIZE", 1024 * 1024))
+# Максимально допустимый размер загружаемого файла
+UPLOAD_MAX_SIZE = int(os.getenv("EXCEL_UPLOAD_MAX_SIZE", 50 * 1024 * 1024))
+
+# Ограничения пакетной загрузки: число файлов (с учетом содержимого архивов)
+# и сколько файлов парсится одновременно
+BULK_MAX_FILES = int(os.getenv("EXCEL_BULK_MAX_FILES", 100))
+BULK_CONCURRENCY = int(os.getenv("EXCEL_BULK_CONCURRENCY", min(4, os.cpu_count() or 1)))
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xls', '.xlsm')
+
+# Сигнатуры файлов Excel: .xlsx/.xlsm (ZIP-контейнер) и .xls (OLE2)
+EXCEL_SIGNATURES = (
+    b"PK\x03\x04",
+    b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1",
+)
+
+
+class ExcelUploadError(Exception):
+    """Ошибка приема загружаемого файла (до начала парсинга)."""
+    status_code = 400
+    headers: Optional[Dict[str, str]] = None
+
+
+class InvalidExcelFileError(ExcelUploadError):
+    """Содержимое файла не похоже на Excel."""
+    status_code = 415
+
+
+class UploadTooLargeError(ExcelUploadError):
+    """Размер файла превышает допустимый."""
+    status_code = 413
+
+
+class ParseCapacityError(ExcelUploadError):
+    """Бюджет одновременных парсингов исчерпан."""
+    status_code = 429
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.headers = {"Retry-After": str(retry_after)}
+
+
+# Ошибки чтения одного файла пакетной загрузки (в том числе поврежденного
+# или сжатого неподдерживаемым методом файла архива): попадают в результат
+# этого файла, не прерывая обработку остальных
+BULK_ITEM_ERRORS = (
+    ExcelUploadError, zipfile.BadZipFile, zlib.error, EOFError, NotImplementedError, RuntimeError, OSError
+)
+
+
+def to_ndjson_line(record: Dict[str, Any]) -> bytes:
+    """Сериализует запись потокового ответа в строку NDJSON."""
+    return dumps(record) + b"\n"
+
+
+class FileReader:
+    """
+    Обертка над синхронным файловым объектом с интерфейсом UploadFile
+    (read, size, filename) для передачи в ExcelService.spooled_upload.
+    """
+
+    def __init__(self, fileobj: BinaryIO, filename: str, size: Optional[int] = None):
+        self.file = fileobj
+        self.filename = filename
+        self.size = size
+
+    async def read(self, size: int = -1) -> bytes:
+        # Чтение файла архива - это распаковка, поэтому оно выполняется в пуле потоков
+        return await run_in_threadpool(self.file.read, size)
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def combine_batch_summaries(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Объединяет сводную информацию нескольких партий.
+    Уникальные клиенты считаются по всем партиям сразу, а не суммой по партиям.
+
+    Args:
+        results: Результаты пакетной обработки по файлам
+
+    Returns:
+        Dict[str, Any]: Общая сводная информация
+    """
+    combined = {
+        'total_places': 0,
+        'total_composite_places': 0,
+        'total_boxes': 0,
+        'total_weight': 0,
+        'total_volume': 0,
+        'total_amount': 0
+    }
+    client_codes = set()
+    for result in results:
+        if not result['success']:
+            continue
+        for key in combined:
+            combined[key] += result['batchSummary'].get(key, 0)
+        client_codes.update(row.get('clientCodeNumeric') for row in result['rows'] if row.get('clientCodeNumeric'))
+
+    combined['total_weight'] = round(combined['total_weight'], 2)
+    combined['total_volume'] = round(combined['total_volume'], 3)
+    combined['total_amount'] = round(combined['total_amount'], 2)
+    combined['unique_clients'] = len(client_codes)
+    return combined
+
+
+class SpooledUpload:
+    """Принятый файл: буфер с содержимым, его размер и SHA-256."""
+
+    def __init__(self, buffer: BinaryIO, filename: str, size: int, sha256: str):
+        self.buffer = buffer
+        self.filename = filename
+        self.size = size
+        self.sha256 = sha256
+
+
 class ExcelService:
     """Сервис для работы с Excel файлами."""
 
     @staticmethod
-    async def parse_cargo_excel(file: UploadFile, period_id: str = "unknown") -> List[Dict[str, Any]]:
+    @asynccontextmanager
+    async def spooled_upload(file: UploadFile) -> AsyncIterator[SpooledUpload]:
+        """
+        Переписывает загруженный файл порциями в буфер SpooledTemporaryFile.
+
+        Небольшие файлы остаются в памяти, крупные автоматически сбрасываются
+        во временный файл на диске, поэтому расход памяти на одну загрузку
+        ограничен UPLOAD_SPOOL_MAX_SIZE. Сигнатура и размер проверяются
+        по мере чтения, до того как файл будет прочитан целиком.
+        Буфер закрывается (и временный файл удаляется) при выходе из контекста,
+        в том числе при исключении. Попутно считается SHA-256 содержимого.
+
+        Args:
+            file: Загруженный файл
+
+        Yields:
+            SpooledUpload: Принятый файл, позиция буфера в начале
+
+        Raises:
+            InvalidExcelFileError: Файл пустой или не является файлом Excel
+            UploadTooLargeError: Размер файла превышает UPLOAD_MAX_SIZE
+        """
+        if file.size is not None and file.size > UPLOAD_MAX_SIZE:
+            raise UploadTooLargeError(
+                f"Размер файла превышает допустимый ({UPLOAD_MAX_SIZE // (1024 * 1024)} МБ)"
+            )
+
+        with tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_SIZE, suffix='.xlsx') as buffer:
+            size = 0
+            digest = hashlib.sha256()
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+
+                if size == 0 and not chunk.startswith(EXCEL_SIGNATURES):
+                    raise InvalidExcelFileError("Содержимое файла не соответствует формату Excel")
+
+                size += len(chunk)
+                if size > UPLOAD_MAX_SIZE:
+                    raise UploadTooLargeError(
+                        f"Размер файла превышает допустимый ({UPLOAD_MAX_SIZE // (1024 * 1024)} МБ)"
+                    )
+                buffer.write(chunk)
+                digest.update(chunk)
+
+            if size == 0:
+                raise InvalidExcelFileError("Загружен пустой файл")
+
+            buffer.seek(0)
+            logger.info(f"Файл {file.filename} принят в буфер: {size} байт")
+            yield SpooledUpload(buffer, file.filename, size, digest.hexdigest())
+
+    @staticmethod
+    def parse_buffer(
+            buffer: BinaryIO,
+            period_id: str = "unknown",
+            progress: Optional[UploadProgress] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Синхронно парсит Excel файл из буфера.
+
+        Args:
+            buffer: Файловый объект с содержимым Excel файла
+            period_id: ID текущего периода
+            progress: Ход обработки загрузки, в который парсер передает события
+
+        Returns:
+            List[Dict[str, Any]]: Список словарей с данными о грузах
+        """
+        parser = CargoExcelParser(buffer, period_id, progress_callback=progress)
+        return parser.parse()
+
+    @staticmethod
+    async def admit(upload: SpooledUpload, progress: Optional[UploadProgress] = None) -> AdmissionLease:
+        """
+        Получает слот парсинга у контроллера допуска с оценкой стоимости по
+        размеру файла и размерам листов.
+
+        Args:
+            upload: Принятый файл
+            progress: Ход обработки загрузки для канала server-sent events
+
+        Returns:
+            AdmissionLease: Слот, который нужно освободить после парсинга
+
+        Raises:
+            ParseCapacityError: Бюджет парсинга исчерпан, нужно повторить запрос позже
+        """
+        cost = await run_in_threadpool(estimate_parse_cost, upload.buffer, upload.size)
+        on_queued = None
+        if progress is not None:
+            on_queued = lambda position: progress.phase('queued', position=position)
+        try:
+            return await admission_controller.acquire(cost, on_queued)
+        except AdmissionRejectedError as e:
+            logger.warning(f"Парсинг {upload.filename} отклонен: {e}")
+            raise ParseCapacityError(str(e), e.retry_after)
+
+    @staticmethod
+    async def parse_cargo_excel(
+            file: UploadFile,
+            period_id: str = "unknown",
+            progress: Optional[UploadProgress] = None,
+            uploader: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
         """
         Парсит загруженный Excel файл с данными о грузах.
 
         Args:
             file: Загруженный файл
             period_id: ID текущего периода
+            progress: Ход обработки загрузки для канала server-sent events
+            uploader: Логин пользователя для хранилища исходных файлов
 
         Returns:
             List[Dict[str, Any]]: Список словарей с данными о грузах
+
+        Raises:
+            ExcelUploadError: Файл не прошел проверку сигнатуры или размера
+                или бюджет парсинга исчерпан
         """
+        if progress is not None:
+            progress.phase('receiving')
         try:
-            # Создаем временный файл для сохранения загруженного файла
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as temp_file:
-                temp_file_path = temp_file.name
+            async with ExcelService.spooled_upload(file) as upload:
+                return await ExcelService.parse_spooled(upload, period_id, progress, uploader)
+        except ExcelUploadError as e:
+            if progress is not None:
+                progress.finish(False, detail=str(e))
+            raise
+
+    @staticmethod
+    async def parse_spooled(
+            upload: SpooledUpload,
+            period_id: str = "unknown",
+            progress: Optional[UploadProgress] = None,
+            uploader: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Парсит принятый файл с использованием кэша результатов.
+        Повторная загрузка того же файла в тот же период возвращает
+        результат из кэша без повторного парсинга. Успешно разобранный
+        файл сохраняется в хранилище исходных файлов.
+
+        Args:
+            upload: Принятый файл
+            period_id: ID текущего периода
+            progress: Ход обработки загрузки для канала server-sent events
+            uploader: Логин пользователя для хранилища исходных файлов
+
+        Returns:
+            List[Dict[str, Any]]: Список словарей с данными о грузах
+
+        Raises:
+            ParseCapacityError: Бюджет парсинга исчерпан
+        """
+        parsed = False
+
+        async def parse() -> List[Dict[str, Any]]:
+            nonlocal parsed
+            parsed = True
+            # Слот запрашивается только при промахе кэша: готовый результат отдается без очереди
+            lease = await ExcelService.admit(upload, progress)
+            try:
+                # Парсинг блокирующий, поэтому выполняем его в пуле потоков
+                return await run_in_threadpool(ExcelService.parse_buffer, upload.buffer, period_id, progress)
+            except Exception as e:
+                logger.error(f"Ошибка при парсинге Excel файла: {str(e)}")
+                import traceback
+                logger.error(traceback.format_exc())
+                return []
+            finally:
+                lease.release()
+
+        if progress is not None:
+            progress.phase('received', size=upload.size)
+
+        key = parse_cache.make_key(upload.sha256, period_id)
+        result = await parse_cache.get_or_parse(key, parse)
+        if result:
+            await ExcelService.store_raw(upload, period_id, uploader, result[0].get('batchNumber'), result)
 
-                # Читаем содержимое загруженного файла и записываем во временный файл
-                content = await file.read()
-                temp_file.write(content)
+        if progress is not None:
+            progress.finish(bool(result), rows=len(result), cached=not parsed)
+        return result
 
-            logger.info(f"Файл временно сохранен: {temp_file_path}")
+    @staticmethod
+    async def open_record_stream(
+            upload: SpooledUpload,
+            stack: AsyncExitStack,
+            period_id: str = "unknown",
+            progress: Optional[UploadProgress] = None,
+            uploader: Optional[str] = None
+    ) -> Optional[AsyncIterator[Dict[str, Any]]]:
+        """
+        Готовит потоковую отдачу результата парсинга.
+
+        Поток состоит из записи-заголовка (номер партии и структура листа),
+        записей со строками по мере их разбора и итоговой записи со сводной
+        информацией по партии. Строки не накапливаются в памяти, поэтому
+        результат такого парсинга не попадает в кэш; если же результат
+        уже есть в кэше, поток строится по нему.
+
+        Структура листа определяется до возврата итератора, чтобы ошибку
+        формата можно было вернуть обычным HTTP-ответом. Слот парсинга
+        освобождается по окончании потока, а если поток не был прочитан
+        до конца или вовсе не запускался (клиент отключился) - при закрытии
+        stack, которое остается за вызывающим кодом.
+
+        Args:
+            upload: Принятый файл
+            stack: Стек очистки, живущий до конца отдачи ответа
+            period_id: ID текущего периода
+            progress: Ход обработки загрузки для канала server-sent events
+            uploader: Логин пользователя для хранилища исходных файлов
+
+        Returns:
+            Optional[AsyncIterator[Dict[str, Any]]]: Итератор записей или None,
+                если структура файла не распознана
+
+        Raises:
+            ParseCapacityError: Бюджет парсинга исчерпан
+        """
+        if progress is not None:
+            progress.phase('received', size=upload.size)
+
+        cached = await parse_cache.get(parse_cache.make_key(upload.sha256, period_id))
+        if cached:
+            await ExcelService.store_raw(upload, period_id, uploader, cached[0].get('batchNumber'))
+            return ExcelService._iter_cached_records(cached, period_id, progress)
+
+        lease = await ExcelService.admit(upload, progress)
+        stack.callback(lease.release)
+        try:
+            parser = CargoExcelParser(upload.buffer, period_id, progress_callback=progress)
+            prepared = await run_in_threadpool(parser.prepare)
+        except BaseException:
+            lease.release()
+            raise
+        if not prepared:
+            lease.release()
+            if progress is not None:
+                progress.finish(False, detail="Структура файла не распознана")
+            return None
+        await ExcelService.store_raw(upload, period_id, uploader, parser.batch_number)
+        return ExcelService._iter_parser_records(parser, lease, progress)
+
+    @staticmethod
+    async def store_raw(
+            upload: SpooledUpload,
+            period_id: str,
+            uploader: Optional[str],
+            batch_number: Optional[str],
+            result: Optional[List[Dict[str, Any]]] = None
+    ) -> None:
+        """
+        Сохраняет исходный файл и сведения о загрузке в хранилище исходных файлов,
+        чтобы файл можно было перепарсить после изменения правил разбора.
+        Ошибка сохранения не прерывает обработку загрузки.
 
-            # Парсим Excel файл
-            parser = CargoExcelParser(temp_file_path, period_id)
-            parsed_data = parser.parse()
+        Args:
+            upload: Принятый файл
+            period_id: ID периода
+            uploader: Логин пользователя
+            batch_number: Номер партии
+            result: Результат парсинга (при потоковой отдаче не сохраняется)
+        """
+        if raw_store is None:
+            return
+        try:
+            await run_in_threadpool(
+                raw_store.save, upload.buffer, upload.sha256, upload.filename, period_id,
+                PARSER_VERSION, uploader, batch_number, result
+            )
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить файл {upload.filename} в хранилище: {e}")
 
-            # Удаляем временный файл
-            os.unlink(temp_file_path)
-            logger.info(f"Временный файл удален: {temp_file_path}")
+    @staticmethod
+    async def _iter_parser_records(
+            parser: CargoExcelParser,
+            lease: AdmissionLease,
+            progress: Optional[UploadProgress] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Отдает записи потока по мере разбора строк подготовленным парсером."""
+        async with lease:
+            async for record in ExcelService._iter_prepared_records(parser, progress):
+                yield record
 
-            return parsed_data
+    @staticmethod
+    async def _iter_prepared_records(
+            parser: CargoExcelParser,
+            progress: Optional[UploadProgress] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        yield {
+            'type': 'header',
+            'batchNumber': parser.batch_number,
+            'batchNumberNumeric': parser.batch_number_numeric,
+            'periodId': parser.period_id,
+            'layout': parser.get_layout(),
+            'cached': False
+        }
 
+        rows_count = 0
+        try:
+            async for row in iterate_in_threadpool(parser.iter_rows(collect=False)):
+                rows_count += 1
+                yield {'type': 'row', 'data': row}
         except Exception as e:
-            logger.error(f"Ошибка при парсинге Excel файла: {str(e)}")
+            logger.error(f"Ошибка при потоковом парсинге Excel файла: {str(e)}")
             import traceback
             logger.error(traceback.format_exc())
+            if progress is not None:
+                progress.finish(False, detail=str(e), rows=rows_count)
+            yield {'type': 'error', 'detail': 'Ошибка при разборе строк файла', 'rows': rows_count}
+            return
+
+        if progress is not None:
+            progress.finish(True, rows=rows_count, cached=False)
+        yield {'type': 'summary', 'rows': rows_count, 'batchSummary': parser.batch_summary}
+
+    @staticmethod
+    async def _iter_cached_records(
+            rows: List[Dict[str, Any]],
+            period_id: str,
+            progress: Optional[UploadProgress] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Отдает записи потока по результату парсинга из кэша."""
+        if progress is not None:
+            progress.finish(True, rows=len(rows), cached=True)
+
+        first = rows[0]
+        yield {
+            'type': 'header',
+            'batchNumber': first.get('batchNumber'),
+            'batchNumberNumeric': first.get('batchNumberNumeric'),
+            'periodId': period_id,
+            'layout': None,
+            'cached': True
+        }
+
+        summary = BatchSummaryAccumulator()
+        for row in rows:
+            summary.add(row)
+            yield {'type': 'row', 'data': row}
 
-            # Удаляем временный файл в случае ошибки
+        yield {'type': 'summary', 'rows': len(rows), 'batchSummary': summary.result()}
+
+    @staticmethod
+    async def parse_bulk(
+            files: List[UploadFile],
+            period_id: str = "unknown",
+            uploader: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Парсит несколько Excel файлов и ZIP-архивов с ними за один запрос.
+
+        Содержимое архива не распаковывается целиком: каждый файл архива
+        переписывается в собственный буфер только перед его парсингом.
+        Одновременно обрабатывается не больше BULK_CONCURRENCY файлов.
+        Ошибка в одном файле не прерывает обработку остальных.
+
+        Args:
+            files: Загруженные файлы (Excel или ZIP)
+            period_id: ID текущего периода
+            uploader: Логин пользователя для хранилища исходных файлов
+
+        Returns:
+            Dict[str, Any]: Результаты по каждому файлу и общая сводная информация
+        """
+        semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
+        # Результаты в порядке файлов запроса: готовая ошибка или корутина парсинга
+        items: List[Any] = []
+
+        async with AsyncExitStack() as stack:
+            for file in files:
+                if not file.filename.lower().endswith('.zip'):
+                    items.append(ExcelService._parse_bulk_item(
+                        lambda file=file: file, file.filename, None, period_id, uploader, semaphore
+                    ))
+                    continue
+
+                try:
+                    archive = await stack.enter_async_context(ExcelService.spooled_upload(file))
+                    zip_file = stack.enter_context(await run_in_threadpool(zipfile.ZipFile, archive.buffer))
+                except BULK_ITEM_ERRORS as e:
+                    items.append(ExcelService._bulk_error(file.filename, None, str(e)))
+                    continue
+
+                for info in zip_file.infolist():
+                    name = os.path.basename(info.filename)
+                    if info.is_dir() or name.startswith(('.', '~$')) or info.filename.startswith('__MACOSX/'):
+                        continue
+                    if not name.lower().endswith(EXCEL_EXTENSIONS):
+                        continue
+                    items.append(ExcelService._parse_bulk_item(
+                        lambda zip_file=zip_file, info=info, name=name: FileReader(
+                            zip_file.open(info), name, info.file_size
+                        ),
+                        name, file.filename, period_id, uploader, semaphore
+                    ))
+
+            tasks = [item for item in items if asyncio.iscoroutine(item)]
+            if len(items) > BULK_MAX_FILES:
+                for task in tasks:
+                    task.close()
+                raise ExcelUploadError(f"Слишком много файлов в запросе (не более {BULK_MAX_FILES})")
+
+            parsed = iter(await asyncio.gather(*tasks))
+            results = [next(parsed) if asyncio.iscoroutine(item) else item for item in items]
+
+        succeeded = [result for result in results if result['success']]
+        return {
+            'files': results,
+            'summary': {
+                'files_total': len(results),
+                'files_succeeded': len(succeeded),
+                'files_failed': len(results) - len(succeeded),
+                'rows_total': sum(result['rowsCount'] for result in succeeded),
+                'batches': sorted({result['batchNumber'] for result in succeeded if result['batchNumber']}),
+                'batchSummary': combine_batch_summaries(results)
+            }
+        }
+
+    @staticmethod
+    async def _parse_bulk_item(
+            open_source: Callable[[], Any],
+            filename: str,
+            archive: Optional[str],
+            period_id: str,
+            uploader: Optional[str],
+            semaphore: asyncio.Semaphore
+    ) -> Dict[str, Any]:
+        """Парсит один файл пакетной загрузки, не пропуская исключения наружу."""
+        async with semaphore:
+            if not filename.lower().endswith(EXCEL_EXTENSIONS):
+                return ExcelService._bulk_error(
+                    filename, archive, "Файл должен быть в формате Excel (.xlsx, .xls, .xlsm) или ZIP"
+                )
+
+            source = None
             try:
-                if 'temp_file_path' in locals():
-                    os.unlink(temp_file_path)
-                    logger.info(f"Временный файл удален после ошибки: {temp_file_path}")
-            except Exception as e:
-                logger.warning(f"Ошибка при удалении временного файла: {str(e)}")
-                pass
+                source = await run_in_threadpool(open_source)
+                async with ExcelService.spooled_upload(source) as upload:
+                    rows = await ExcelService.parse_spooled(upload, period_id, uploader=uploader)
+            except BULK_ITEM_ERRORS as e:
+                logger.warning(f"Файл {filename} пакетной загрузки не обработан: {e!r}")
+                return ExcelService._bulk_error(filename, archive, str(e) or type(e).__name__)
+            finally:
+                if isinstance(source, FileReader):
+                    source.close()
+
+        if not rows:
+            return ExcelService._bulk_error(
+                filename, archive, "Не удалось обработать Excel файл. Проверьте формат и содержимое файла."
+            )
 
-            return []
+        summary = BatchSummaryAccumulator()
+        for row in rows:
+            summary.add(row)
+        return {
+            'filename': filename,
+            'archive': archive,
+            'success': True,
+            'batchNumber': rows[0].get('batchNumber'),
+            'rowsCount': len(rows),
+            'batchSummary': summary.result(),
+            'rows': rows,
+            'error': None
+        }
+
+    @staticmethod
+    def _bulk_error(filename: str, archive: Optional[str], detail: str) -> Dict[str, Any]:
+        return {
+            'filename': filename,
+            'archive': archive,
+            'success': False,
+            'batchNumber': None,
+            'rowsCount': 0,
+            'batchSummary': None,
+            'rows': [],
+            'error': detail
+        }
@@ -0,0 +1,236 @@
+import os
+import logging
+from typing import Dict, Iterable, List, Any, Optional, Sequence, Tuple
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import Select, func, select
+from sqlalchemy.orm import Session
+from app.api.v1.models.cargo import CargoPlace, Batch, Client, Recipient
+
+logger = logging.getLogger('grid_service')
+
+# Предел оценки планировщика, до которого total считается точно (count(*));
+# для больших выборок в режиме auto отдается оценка
+GRID_EXACT_COUNT_LIMIT = int(os.getenv("GRID_EXACT_COUNT_LIMIT", 100000))
+# Предельное число значений в фильтре in
+GRID_MAX_IN_VALUES = int(os.getenv("GRID_MAX_IN_VALUES", 1000))
+
+# Присоединяемые таблицы: подключаются, только если их столбцы запрошены
+# или участвуют в фильтрах и сортировке
+GRID_JOINS = {
+    'batch': (Batch, CargoPlace.batch_id == Batch.id),
+    'client': (Client, CargoPlace.client_id == Client.id),
+    'recipient': (Recipient, CargoPlace.recipient_id == Recipient.id),
+}
+
+# Поля таблицы: имя -> (столбец, присоединяемая таблица)
+GRID_FIELDS = {
+    'id': (CargoPlace.id, None),
+    'period_id': (CargoPlace.period_id, None),
+    'tracking_number': (CargoPlace.tracking_number, None),
+    'batch_id': (CargoPlace.batch_id, None),
+    'batch_number': (Batch.batch_number, 'batch'),
+    'row_seq': (CargoPlace.row_seq, None),
+    'client_id': (CargoPlace.client_id, None),
+    'client_code': (CargoPlace.client_code, None),
+    'client_name': (Client.name, 'client'),
+    'recipient_id': (CargoPlace.recipient_id, None),
+    'recipient_name': (Recipient.name, 'recipient'),
+    'status': (CargoPlace.status, None),
+    'priority': (CargoPlace.priority, None),
+    'weight': (CargoPlace.weight, None),
+    'volume': (CargoPlace.volume, None),
+    'declared_value': (CargoPlace.declared_value, None),
+    'shipping_cost': (CargoPlace.shipping_cost, None),
+    'places_count': (CargoPlace.places_count, None),
+    'boxes_count': (CargoPlace.boxes_count, None),
+    'units_count': (CargoPlace.units_count, None),
+    'departure_date': (CargoPlace.departure_date, None),
+    'estimated_arrival_date': (CargoPlace.estimated_arrival_date, None),
+    'actual_arrival_date': (CargoPlace.actual_arrival_date, None),
+    'description': (CargoPlace.description, None),
+    'notes': (CargoPlace.notes, None),
+    'is_paid': (CargoPlace.is_paid, None),
+    'is_delivered': (CargoPlace.is_delivered, None),
+    'is_active': (CargoPlace.is_active, None),
+    'created_at': (CargoPlace.created_at, None),
+}
+
+# Столбцы по умолчанию, если проекция не задана
+GRID_DEFAULT_COLUMNS = (
+    'id', 'period_id', 'tracking_number', 'batch_number', 'client_code', 'client_name',
+    'recipient_name', 'status', 'weight', 'volume', 'shipping_cost', 'departure_date', 'description', 'notes',
+)
+
+# Операции фильтра. Условия строятся на самих столбцах, без функций над ними,
+# поэтому используются обычные индексы (eq, in, диапазоны), а contains и
+# starts_with (ILIKE) - триграммные индексы
+GRID_FILTER_OPS = ('eq', 'ne', 'lt', 'lte', 'gt', 'gte', 'in', 'between', 'contains', 'starts_with', 'is_null')
+GRID_TEXT_OPS = ('contains', 'starts_with')
+
+# Режимы подсчета total
+GRID_COUNT_MODES = ('auto', 'exact', 'estimated', 'none')
+
+
+class GridQueryError(ValueError):
+    """Спецификация запроса таблицы неверна."""
+    status_code = 400
+
+
+def _like_escape(value: str) -> str:
+    """Экранирует спецсимволы LIKE в значении фильтра."""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class GridService:
+    """
+    Окно строк таблицы мест для виртуальной прокрутки.
+
+    Запрос собирается из спецификации (проекция, фильтры, сортировка, окно)
+    по списку разрешенных полей GRID_FIELDS и выполняется в базе: браузер
+    получает только строки видимого окна и общее число строк. Строки
+    отдаются массивами значений в порядке columns.
+    """
+
+    @staticmethod
+    def query(
+            db: Session,
+            columns: Sequence[str],
+            filters: Sequence[Dict[str, Any]],
+            sort: Sequence[Dict[str, str]],
+            offset: int,
+            limit: int,
+            count: str = 'auto'
+    ) -> Dict[str, Any]:
+        """
+        Выполняет запрос таблицы.
+
+        Args:
+            db: Сессия базы данных
+            columns: Имена полей в ответе (пусто - GRID_DEFAULT_COLUMNS)
+            filters: Условия {field, op, value}, объединяются через AND
+            sort: Порядок [{field, direction}]; последним всегда добавляется id
+            offset: Первая строка окна
+            limit: Размер окна
+            count: auto - точно до GRID_EXACT_COUNT_LIMIT строк, иначе оценка;
+                exact, estimated или none
+
+        Returns:
+            Dict[str, Any]: columns, rows, total, total_estimated, offset, limit
+
+        Raises:
+            GridQueryError: Неизвестное поле, операция или неверное значение
+        """
+        if count not in GRID_COUNT_MODES:
+            raise GridQueryError(f"Неизвестный режим подсчета: {count}")
+        columns = list(columns) or list(GRID_DEFAULT_COLUMNS)
+        for name in [*columns, *(item['field'] for item in filters), *(item['field'] for item in sort)]:
+            if name not in GRID_FIELDS:
+                raise GridQueryError(f"Неизвестное поле: {name}")
+
+        conditions = [GridService._condition(GRID_FIELDS[item['field']][0], item) for item in filters]
+        filter_joins = GridService._joins(item['field'] for item in filters)
+
+        ordering = []
+        for item in sort:
+            column = GRID_FIELDS[item['field']][0]
+            ordering.append(column.desc().nulls_last() if item.get('direction') == 'desc' else column.asc().nulls_last())
+        # Уникальный хвост ключа сортировки: окна не пересекаются и не теряют строки
+        ordering.append(CargoPlace.id.desc())
+
+        window = GridService._from(
+            select(*(GRID_FIELDS[name][0].label(name) for name in columns)),
+            GridService._joins([*columns, *(item['field'] for item in sort)], filter_joins),
+            conditions
+        )
+        rows = db.execute(window.order_by(*ordering).offset(offset).limit(limit)).all()
+
+        # Для подсчета присоединяются только таблицы фильтров: внешнее соединение
+        # по первичному ключу не меняет число строк
+        filtered = GridService._from(select(CargoPlace.id), filter_joins, conditions)
+        total, estimated = GridService._count(db, filtered, count, offset, len(rows), limit)
+        return {
+            'columns': columns,
+            'rows': [list(row) for row in rows],
+            'total': total,
+            'total_estimated': estimated,
+            'offset': offset,
+            'limit': limit
+        }
+
+    @staticmethod
+    def _joins(names: Iterable[str], joins: Sequence[str] = ()) -> List[str]:
+        """Присоединяемые таблицы для полей names (в дополнение к joins)."""
+        result = list(joins)
+        for name in names:
+            join = GRID_FIELDS[name][1]
+            if join is not None and join not in result:
+                result.append(join)
+        return result
+
+    @staticmethod
+    def _from(stmt: Select, joins: Sequence[str], conditions: Sequence[Any]) -> Select:
+        stmt = stmt.select_from(CargoPlace)
+        for name in joins:
+            model, on = GRID_JOINS[name]
+            stmt = stmt.outerjoin(model, on)
+        return stmt.where(*conditions) if conditions else stmt
+
+    @staticmethod
+    def _condition(column: Any, item: Dict[str, Any]) -> Any:
+        op, value = item.get('op', 'eq'), item.get('value')
+        if op not in GRID_FILTER_OPS:
+            raise GridQueryError(f"Неизвестная операция фильтра: {op}")
+        if op == 'is_null':
+            return column.is_(None) if value is None or value else column.is_not(None)
+
+        python_type = column.type.python_type
+        if op in GRID_TEXT_OPS:
+            if python_type is not str:
+                raise GridQueryError(f"Операция {op} применима только к текстовым полям")
+            text_value = _like_escape(str(value or ''))
+            return column.ilike(f"%{text_value}%" if op == 'contains' else f"{text_value}%")
+
+        adapter = TypeAdapter(python_type)
+        try:
+            if op == 'in':
+                if not isinstance(value, list) or not value or len(value) > GRID_MAX_IN_VALUES:
+                    raise GridQueryError(f"Для in нужен список от 1 до {GRID_MAX_IN_VALUES} значений")
+                return column.in_([adapter.validate_python(v) for v in value])
+            if op == 'between':
+                if not isinstance(value, list) or len(value) != 2:
+                    raise GridQueryError("Для between нужен список из двух значений")
+                return column.between(adapter.validate_python(value[0]), adapter.validate_python(value[1]))
+            if value is None:
+                raise GridQueryError(f"Для {op} нужно значение; для пустых значений - is_null")
+            value = adapter.validate_python(value)
+        except ValidationError:
+            raise GridQueryError(f"Неверное значение фильтра {item.get('field')}: {value}")
+
+        return {
+            'eq': column.__eq__, 'ne': column.__ne__, 'lt': column.__lt__,
+            'lte': column.__le__, 'gt': column.__gt__, 'gte': column.__ge__,
+        }[op](value)
+
+    @staticmethod
+    def _count(db: Session, base: Any, mode: str, offset: int, fetched: int, limit: int) -> Tuple[Optional[int], bool]:
+        """Общее число строк выборки и признак того, что это оценка."""
+        if mode == 'none':
+            return None, False
+        # Окно не заполнено до конца - выборка кончается в нем, число известно точно
+        if fetched < limit and (fetched or not offset):
+            return offset + fetched, False
+        if mode in ('auto', 'estimated'):
+            estimate = GridService._estimate(db, base)
+            if mode == 'estimated' or estimate > GRID_EXACT_COUNT_LIMIT:
+                return max(estimate, offset + fetched), True
+        total = db.execute(select(func.count()).select_from(base.subquery())).scalar()
+        return total, False
+
+    @staticmethod
+    def _estimate(db: Session, base: Any) -> int:
+        """Оценка числа строк выборки по плану запроса (EXPLAIN без выполнения)."""
+        compiled = base.compile(dialect=db.get_bind().dialect, compile_kwargs={"render_postcompile": True})
+        plan = db.connection().exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+        ).scalar()
+        return int(plan[0]['Plan']['Plan Rows'])
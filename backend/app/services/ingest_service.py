@@ -0,0 +1,628 @@
+import os
+import io
+import re
+import csv
+import time
+import hashlib
+import logging
+from datetime import date, datetime
+from typing import Dict, List, Any, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.api.v1.models.cargo import Period
+from app.services.client_resolver import client_resolver, normalize_client_code
+from app.services.rollup_service import RollupService
+from app.services.closure_service import ClosureService
+from app.services.archive_service import ArchiveService, PeriodArchivedError
+from app.services.tracking_lookup import tracking_lookup
+
+logger = logging.getLogger('ingest_service')
+
+# Создавать ли при записи партии клиентов, которых нет в справочнике
+INGEST_CREATE_CLIENTS = os.getenv("INGEST_CREATE_CLIENTS", "true").lower() in ("1", "true", "yes")
+
+# Столбцы мест, значения которых берутся из строки баланса. По ним считается
+# хэш содержимого строки, и только они обновляются при повторной загрузке партии:
+# статус, оплата, водитель и прочие данные, которые ведутся вручную, не затрагиваются
+DATA_COLUMNS = (
+    ('client_code', 'VARCHAR(50)'),
+    ('weight', 'DOUBLE PRECISION NOT NULL'),
+    ('volume', 'DOUBLE PRECISION NOT NULL'),
+    ('declared_value', 'DOUBLE PRECISION NOT NULL'),
+    ('shipping_cost', 'DOUBLE PRECISION NOT NULL'),
+    ('departure_date', 'DATE'),
+    ('description', 'TEXT'),
+    ('places_count', 'INTEGER'),
+    ('boxes_count', 'INTEGER'),
+    ('units_count', 'INTEGER'),
+    ('cubic_tariff', 'DOUBLE PRECISION'),
+    ('freight_tariff', 'DOUBLE PRECISION'),
+    ('insurance_percent', 'DOUBLE PRECISION'),
+    ('insurance_cost', 'DOUBLE PRECISION'),
+    ('packaging_cost', 'DOUBLE PRECISION'),
+    ('description_original', 'TEXT'),
+)
+
+# Столбцы промежуточной таблицы в порядке записи через COPY
+STAGING_COLUMNS = (
+    ('tracking_number', 'VARCHAR(20) NOT NULL'),
+    ('row_seq', 'INTEGER NOT NULL'),
+    ('row_key', 'VARCHAR(32) NOT NULL'),
+    ('row_hash', 'VARCHAR(32) NOT NULL'),
+    ('client_id', 'INTEGER'),
+) + DATA_COLUMNS
+
+UPSERT_COLUMNS = ('batch_id',) + tuple(name for name, _ in STAGING_COLUMNS if name != 'tracking_number')
+
+# Сколько изменений показывать в предварительном просмотре
+INGEST_PREVIEW_LIMIT = int(os.getenv("INGEST_PREVIEW_LIMIT", 1000))
+
+# Номер партии в балансе: буква серии, номер и буква-суффикс (M123-A, M55/A)
+BATCH_NUMBER_PATTERN = re.compile(r'^([A-Za-z])([0-9]{1,3})[-/\s]([A-Za-z])$')
+TRACKING_PREFIX_LIMIT = 26 ** 3
+
+
+class IngestError(Exception):
+    """Разобранную партию нельзя записать в базу."""
+    status_code = 422
+
+
+class IngestPeriodNotFoundError(IngestError):
+    status_code = 404
+
+
+def to_db_batch_number(batch_number: str, period_name: str) -> str:
+    """
+    Преобразует номер партии из баланса в формат таблицы batches.
+
+    В таблице batches номер хранится в формате XX-000-0000 (ограничение
+    check_batch_number_format и схема BatchBase), в балансе - как M123-A.
+    Соответствие: XX - буква серии и буква-суффикс, 000 - номер, дополненный
+    нулями до трех цифр, 0000 - год периода: M123-A в периоде 2024 -
+    MA-123-2024, M55-A - MA-055-2024. Номера больше 999 в этот формат
+    не помещаются и отклоняются. Партии, созданные вручную через API,
+    нужно называть так же, чтобы повторная загрузка баланса нашла их.
+
+    Args:
+        batch_number: Номер партии, найденный парсером
+        period_name: Название периода (год)
+
+    Returns:
+        str: Номер партии в формате XX-000-0000
+    """
+    match = BATCH_NUMBER_PATTERN.match((batch_number or "").strip())
+    if not match:
+        raise IngestError(f"Номер партии {batch_number} нельзя привести к формату XX-000-0000")
+    letter, number, suffix = match.groups()
+    return f"{letter.upper()}{suffix.upper()}-{int(number):03d}-{period_name}"
+
+
+def make_tracking_number(batch_id: int, row_seq: int) -> str:
+    """
+    Формирует номер отслеживания места по ID партии и порядковому номеру строки.
+    Номер присваивается один раз при добавлении строки и дальше не меняется.
+
+    Args:
+        batch_id: ID партии
+        row_seq: Порядковый номер строки в партии (с нуля)
+
+    Returns:
+        str: Номер в формате XXX-000000-00
+    """
+    prefix_index = row_seq // 100
+    if batch_id > 999999 or prefix_index >= TRACKING_PREFIX_LIMIT:
+        raise IngestError("Слишком большой ID партии или число строк для номера отслеживания")
+    letters = "".join(chr(ord('A') + prefix_index // 26 ** power % 26) for power in (2, 1, 0))
+    return f"{letters}-{batch_id:06d}-{row_seq % 100:02d}"
+
+
+def _to_float(value: Any) -> Optional[float]:
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_int(value: Any) -> Optional[int]:
+    number = _to_float(value)
+    return int(number) if number is not None else None
+
+
+def _to_date(value: Any, year: int) -> Optional[date]:
+    """Дата отправки из Китая: дата из ячейки или строка вида ММДД в году периода."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str) and re.match(r'^\d{4}$', value.strip()):
+        try:
+            return date(year, int(value[:2]), int(value[2:]))
+        except ValueError:
+            return None
+    return None
+
+
+def make_row_key(client_code: Optional[str], departure_date: Optional[date]) -> str:
+    """
+    Ключ группы строк баланса: клиент и дата отправки. Ключ не зависит
+    ни от положения строки в файле, ни от соседних строк, поэтому вставка
+    или удаление строки не меняет ключи остальных. Строки внутри группы
+    сопоставляются с местами по содержимому (см. IngestService.diff_rows).
+    Та же формула повторена в миграции, пересчитывающей ключи записанных мест.
+    """
+    source = f"{client_code or ''}|{departure_date.isoformat() if departure_date else ''}"
+    return hashlib.md5(source.encode('utf-8'), usedforsecurity=False).hexdigest()
+
+
+class IngestService:
+    """Запись разобранных партий в таблицы batches и cargo_places."""
+
+    @staticmethod
+    def declared_value(row: Dict[str, Any]) -> float:
+        """
+        Объявленная стоимость места: цена единицы товара (столбец 1ед 货值)
+        на число единиц. Если число единиц не указано, берется цена единицы.
+        Стоимость хранится в валюте баланса, без пересчета.
+        """
+        price = _to_float(row.get('productPrice')) or 0
+        units = _to_int(row.get('unitsCount'))
+        return price * units if units else price
+
+    @staticmethod
+    def map_row(row: Dict[str, Any], year: int) -> tuple:
+        """
+        Преобразует строку парсера в значения столбцов места.
+
+        Args:
+            row: Строка результата парсинга
+            year: Год периода для дат вида ММДД
+
+        Returns:
+            tuple: Значения в порядке DATA_COLUMNS
+        """
+        client_code = row.get('clientCode')
+        description = row.get('productName')
+        original = row.get('productNameOriginal')
+        return (
+            client_code.strip().upper() if isinstance(client_code, str) else None,
+            _to_float(row.get('weight')) or 0,
+            _to_float(row.get('volume')) or 0,
+            IngestService.declared_value(row),
+            _to_float(row.get('total')) or 0,
+            _to_date(row.get('depatureFromChinaDate'), year),
+            str(description) if description is not None else None,
+            _to_int(row.get('placesCount')),
+            _to_int(row.get('boxesCount')),
+            _to_int(row.get('unitsCount')),
+            _to_float(row.get('cubicTariff')),
+            _to_float(row.get('freightTariff')),
+            _to_float(row.get('insurancePercent')),
+            _to_float(row.get('insurance')),
+            _to_float(row.get('packaging')),
+            str(original) if original is not None else None,
+        )
+
+    @staticmethod
+    def prepare_rows(rows: List[Dict[str, Any]], year: int, client_ids: Dict[str, int]) -> List[Dict[str, Any]]:
+        """
+        Вычисляет для строк парсера значения столбцов, естественный ключ и хэш содержимого.
+
+        Args:
+            rows: Результат парсинга одной партии
+            year: Год периода для дат вида ММДД
+            client_ids: Код клиента -> ID
+
+        Returns:
+            List[Dict[str, Any]]: key (ключ группы), hash, client_id и values (в порядке DATA_COLUMNS)
+        """
+        prepared = []
+        for row in rows:
+            values = IngestService.map_row(row, year)
+            client_id = client_ids.get(normalize_client_code(values[0]))
+            content = repr((client_id,) + values).encode('utf-8')
+            prepared.append({
+                'key': make_row_key(values[0], values[5]),
+                'hash': hashlib.md5(content, usedforsecurity=False).hexdigest(),
+                'client_id': client_id,
+                'values': values
+            })
+        return prepared
+
+    @staticmethod
+    def diff_rows(prepared: List[Dict[str, Any]], stored: List[Dict[str, Any]]) -> Dict[str, List]:
+        """
+        Сравнивает строки нового файла с местами, записанными ранее.
+
+        Строки и места сопоставляются внутри группы (ключ - клиент и дата
+        отправки): сначала строки с тем же содержимым (хэшем), затем
+        оставшиеся строки и места группы по порядку (строки - в порядке файла,
+        места - по row_seq, действующие раньше удаленных). Вставка строки
+        в середину файла дает одну новую строку, не затрагивая остальные.
+
+        Места без ключа (добавленные не загрузкой баланса) сопоставляются по
+        клиенту и дате отправки после мест с ключом; оставшиеся без пары такие
+        места не удаляются, так как файл их не описывает.
+
+        Args:
+            prepared: Результат prepare_rows
+            stored: Места партии: tracking_number, row_seq, row_key, row_hash,
+                is_active, client_code, departure_date
+
+        Returns:
+            Dict[str, List]: inserts (новые строки), updates и unchanged (пары
+                строка - место), deletes (места, которых нет в файле)
+        """
+        candidates: Dict[str, List[Dict[str, Any]]] = {}
+        for place in sorted(
+                stored,
+                key=lambda place: (place['row_key'] is None, not place['is_active'], place['row_seq'] is None,
+                                   place['row_seq'] or 0)
+        ):
+            key = place['row_key'] or make_row_key(place['client_code'], place['departure_date'])
+            candidates.setdefault(key, []).append(place)
+
+        matched: Dict[int, Dict[str, Any]] = {}
+        claimed = set()
+        for position, item in enumerate(prepared):
+            for place in candidates.get(item['key'], ()):
+                if id(place) not in claimed and place['row_hash'] == item['hash']:
+                    matched[position] = place
+                    claimed.add(id(place))
+                    break
+        for position, item in enumerate(prepared):
+            if position in matched:
+                continue
+            for place in candidates.get(item['key'], ()):
+                if id(place) not in claimed:
+                    matched[position] = place
+                    claimed.add(id(place))
+                    break
+
+        inserts, updates, unchanged = [], [], []
+        for position, item in enumerate(prepared):
+            place = matched.get(position)
+            if place is None:
+                inserts.append(item)
+            elif place['row_hash'] != item['hash'] or place['row_key'] != item['key'] or not place['is_active']:
+                updates.append((item, place))
+            else:
+                unchanged.append((item, place))
+
+        deletes = [
+            place for place in stored
+            if id(place) not in claimed and place['row_key'] is not None and place['is_active']
+        ]
+        return {'inserts': inserts, 'updates': updates, 'deletes': deletes, 'unchanged': unchanged}
+
+    @staticmethod
+    def composite_links(rows: List[Dict[str, Any]], prepared: List[Dict[str, Any]]) -> List[tuple]:
+        """
+        Связи сборных мест из групп, найденных парсером по объединенным ячейкам:
+        каждая строка группы, кроме основной, становится дочерним местом основной.
+
+        Args:
+            rows: Результат парсинга одной партии
+            prepared: Результат prepare_rows с присвоенными tracking_number
+
+        Returns:
+            List[tuple]: Пары (номер дочернего места, номер основного места)
+        """
+        groups: Dict[str, Dict[str, Any]] = {}
+        for row, item in zip(rows, prepared):
+            group_id = row.get('compositeGroupId')
+            if not row.get('isCompositeCargo') or not group_id:
+                continue
+            group = groups.setdefault(group_id, {'main': None, 'children': []})
+            if row.get('isMainCompositeRow'):
+                group['main'] = item['tracking_number']
+            else:
+                group['children'].append(item['tracking_number'])
+
+        return [
+            (child, group['main'])
+            for group in groups.values() if group['main'] is not None
+            for child in group['children'] if child is not None
+        ]
+
+    @staticmethod
+    def _write_composite_links(db: Session, period_id: int, batch_id: int, links: List[tuple]) -> None:
+        """
+        Приводит связи сборных мест партии к переданному набору двумя запросами:
+        лишние связи между местами партии удаляются, недостающие добавляются одним
+        INSERT ... SELECT FROM unnest с ON CONFLICT по uq_composite_place.
+        ID мест находятся соединением по номерам отслеживания на стороне базы.
+        Пути через места с изменившимися связями пересчитываются в таблице замыкания.
+        """
+        params = {
+            'period_id': period_id,
+            'batch_id': batch_id,
+            'children': [child for child, _ in links],
+            'parents': [parent for _, parent in links]
+        }
+        ClosureService.lock_period(db, period_id)
+        changed = db.execute(
+            text(
+                "DELETE FROM composite_places cp USING cargo_places c, cargo_places p "
+                "WHERE cp.period_id = :period_id AND cp.cargo_place_id = c.id AND cp.parent_id = p.id "
+                "AND c.period_id = :period_id AND p.period_id = :period_id "
+                "AND c.batch_id = :batch_id AND p.batch_id = :batch_id "
+                "AND NOT EXISTS ("
+                "SELECT 1 FROM unnest(CAST(:children AS VARCHAR[]), CAST(:parents AS VARCHAR[])) AS l(child, parent) "
+                "WHERE l.child = c.tracking_number AND l.parent = p.tracking_number) "
+                "RETURNING cp.cargo_place_id"
+            ),
+            params
+        ).scalars().all()
+        if links:
+            changed += db.execute(
+                text(
+                    "INSERT INTO composite_places (cargo_place_id, parent_id, period_id) "
+                    "SELECT c.id, p.id, :period_id "
+                    "FROM unnest(CAST(:children AS VARCHAR[]), CAST(:parents AS VARCHAR[])) AS l(child, parent) "
+                    "JOIN cargo_places c ON c.period_id = :period_id AND c.tracking_number = l.child "
+                    "JOIN cargo_places p ON p.period_id = :period_id AND p.tracking_number = l.parent "
+                    "ON CONFLICT ON CONSTRAINT uq_composite_place DO NOTHING "
+                    "RETURNING cargo_place_id"
+                ),
+                params
+            ).scalars().all()
+        ClosureService.refresh(db, period_id, changed)
+
+    @staticmethod
+    def _copy_rows(db: Session, table: str, columns: List[str], rows: List[tuple]) -> None:
+        """Записывает строки в таблицу одной командой COPY в рамках текущей транзакции."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(['' if value is None else value for value in row])
+        buffer.seek(0)
+
+        cursor = db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _preview(db: Session, period_id: int, diff: Dict[str, List]) -> List[Dict[str, Any]]:
+        """Список изменений для предварительного просмотра (не больше INGEST_PREVIEW_LIMIT)."""
+        changes = []
+        updates = diff['updates'][:INGEST_PREVIEW_LIMIT]
+        stored_values = {}
+        if updates:
+            data_names = [name for name, _ in DATA_COLUMNS]
+            result = db.execute(
+                text(
+                    f"SELECT tracking_number, client_id, {', '.join(data_names)} "
+                    "FROM cargo_places WHERE period_id = :period_id AND tracking_number = ANY(:tracking_numbers)"
+                ),
+                {'period_id': period_id, 'tracking_numbers': [place['tracking_number'] for _, place in updates]}
+            )
+            stored_values = {row[0]: tuple(row[1:]) for row in result}
+
+        for item, place in updates:
+            old = stored_values.get(place['tracking_number'], ())
+            new = (item['client_id'],) + item['values']
+            names = ('client_id',) + tuple(name for name, _ in DATA_COLUMNS)
+            fields = [name for name, old_value, new_value in zip(names, old, new) if old_value != new_value]
+            if not place['is_active']:
+                fields.append('is_active')
+            changes.append({
+                'action': 'update',
+                'tracking_number': place['tracking_number'],
+                'row_seq': place['row_seq'],
+                'client_code': item['values'][0],
+                'fields': fields
+            })
+        for item in diff['inserts'][:INGEST_PREVIEW_LIMIT - len(changes)]:
+            changes.append({
+                'action': 'insert',
+                'tracking_number': item.get('tracking_number'),
+                'row_seq': item.get('row_seq'),
+                'client_code': item['values'][0],
+                'fields': []
+            })
+        for place in diff['deletes'][:INGEST_PREVIEW_LIMIT - len(changes)]:
+            changes.append({
+                'action': 'delete',
+                'tracking_number': place['tracking_number'],
+                'row_seq': place['row_seq'],
+                'client_code': place['client_code'],
+                'fields': []
+            })
+        return changes
+
+    @staticmethod
+    def ingest_batch(
+            db: Session,
+            period_id: int,
+            rows: List[Dict[str, Any]],
+            dry_run: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Записывает партию и ее места, применяя только изменения относительно
+        ранее записанной версии той же партии.
+
+        Каждая строка получает ключ группы (клиент, дата отправки) и хэш
+        содержимого. Записанные места партии читаются одним запросом и
+        сопоставляются со строками (diff_rows), после чего новые строки добавляются,
+        измененные обновляются, а пропавшие из файла помечаются is_active = false.
+        Измененные строки пишутся через COPY во временную таблицу и одним
+        INSERT ... ON CONFLICT (tracking_number, period_id) DO UPDATE, поэтому объем записи
+        и время блокировок пропорциональны числу изменений, а не размеру партии.
+        Повторная запись того же файла ничего не меняет.
+
+        Клиенты определяются по кодам за постоянное число запросов, отсутствующие
+        в справочнике создаются (если не отключено через INGEST_CREATE_CLIENTS).
+        Группы сборных мест записываются в composite_places, сводка партии
+        в cargo_rollups пересчитывается в той же транзакции.
+
+        Args:
+            db: Сессия базы данных
+            period_id: ID периода
+            rows: Результат парсинга одной партии
+            dry_run: Только вычислить изменения, ничего не записывая
+
+        Returns:
+            Dict[str, Any]: batch_id, batch_number, period_id, rows, inserted,
+                updated, deleted, unchanged, число связей сборных мест, коды
+                созданных клиентов и коды, для которых клиента найти или создать
+                не удалось; при dry_run также список изменений changes
+        """
+        if not rows:
+            raise IngestError("Нет строк для записи")
+
+        period = db.get(Period, period_id)
+        if period is None:
+            raise IngestPeriodNotFoundError("Период не найден")
+        try:
+            ArchiveService.check_writable(db, [period_id])
+        except PeriodArchivedError:
+            raise IngestError("Период в архиве: верните его из архива перед записью партий")
+
+        batch_numbers = {row.get('batchNumber') for row in rows}
+        if len(batch_numbers) != 1:
+            raise IngestError("Строки относятся к разным партиям")
+        batch_number = to_db_batch_number(batch_numbers.pop(), period.period_name)
+        year = int(period.period_name)
+
+        started = time.perf_counter()
+        try:
+            if dry_run:
+                batch_id = db.execute(
+                    text("SELECT id FROM batches WHERE batch_number = :batch_number AND period_id = :period_id"),
+                    {'batch_number': batch_number, 'period_id': period_id}
+                ).scalar()
+            else:
+                # Блокирует строку партии до конца транзакции: параллельная запись той же партии ждет
+                batch_id = db.execute(
+                    text(
+                        "INSERT INTO batches (batch_number, period_id) VALUES (:batch_number, :period_id) "
+                        "ON CONFLICT ON CONSTRAINT uq_batch_number_period DO UPDATE SET is_active = TRUE "
+                        "RETURNING id"
+                    ),
+                    {'batch_number': batch_number, 'period_id': period_id}
+                ).scalar_one()
+
+            client_ids, created_clients = client_resolver.resolve(
+                db, (row.get('clientCode') for row in rows), INGEST_CREATE_CLIENTS and not dry_run
+            )
+            prepared = IngestService.prepare_rows(rows, year, client_ids)
+
+            stored = []
+            if batch_id is not None:
+                stored = [dict(place) for place in db.execute(
+                    text(
+                        "SELECT tracking_number, row_seq, row_key, row_hash, is_active, client_code, departure_date "
+                        "FROM cargo_places WHERE period_id = :period_id AND batch_id = :batch_id"
+                    ),
+                    {'period_id': period_id, 'batch_id': batch_id}
+                ).mappings()]
+            next_seq = max((place['row_seq'] + 1 for place in stored if place['row_seq'] is not None), default=0)
+
+            diff = IngestService.diff_rows(prepared, stored)
+            for item, place in diff['updates'] + diff['unchanged']:
+                item['tracking_number'] = place['tracking_number']
+                item['row_seq'] = place['row_seq']
+                if item['row_seq'] is None:
+                    # Место, добавленное не загрузкой баланса, получает номер строки при первом сопоставлении
+                    item['row_seq'] = next_seq
+                    next_seq += 1
+            for item in diff['inserts']:
+                item['row_seq'] = next_seq
+                item['tracking_number'] = make_tracking_number(batch_id, next_seq) if batch_id is not None else None
+                next_seq += 1
+            links = IngestService.composite_links(rows, prepared)
+
+            unmatched_clients = sorted({
+                item['values'][0] for item in prepared if item['values'][0] is not None and item['client_id'] is None
+            })
+
+            changes = None
+            if dry_run:
+                changes = IngestService._preview(db, period_id, diff)
+                if INGEST_CREATE_CLIENTS:
+                    # Эти клиенты были бы созданы при записи
+                    created_clients = sorted(
+                        code for code in unmatched_clients if normalize_client_code(code) == code
+                    )
+                    unmatched_clients = sorted(set(unmatched_clients) - set(created_clients))
+                db.rollback()
+            else:
+                changed = diff['inserts'] + [item for item, _ in diff['updates']]
+                if changed:
+                    db.execute(text(
+                        "CREATE TEMP TABLE cargo_places_staging ("
+                        + ", ".join(f"{name} {definition}" for name, definition in STAGING_COLUMNS)
+                        + ") ON COMMIT DROP"
+                    ))
+                    columns = [name for name, _ in STAGING_COLUMNS]
+                    IngestService._copy_rows(db, "cargo_places_staging", columns, [
+                        (item['tracking_number'], item['row_seq'], item['key'], item['hash'], item['client_id'])
+                        + item['values']
+                        for item in changed
+                    ])
+
+                    staged = [f"s.{name}" for name in columns if name != 'tracking_number']
+                    db.execute(
+                        text(
+                            f"INSERT INTO cargo_places (period_id, tracking_number, {', '.join(UPSERT_COLUMNS)}) "
+                            f"SELECT :period_id, s.tracking_number, :batch_id, {', '.join(staged)} "
+                            "FROM cargo_places_staging s "
+                            "ON CONFLICT (tracking_number, period_id) DO UPDATE SET "
+                            + ", ".join(f"{name} = EXCLUDED.{name}" for name in UPSERT_COLUMNS)
+                            + ", is_active = TRUE"
+                        ),
+                        {'period_id': period_id, 'batch_id': batch_id}
+                    )
+
+                if diff['deletes']:
+                    db.execute(
+                        text(
+                            "UPDATE cargo_places SET is_active = FALSE "
+                            "WHERE period_id = :period_id AND tracking_number = ANY(:tracking_numbers)"
+                        ),
+                        {'period_id': period_id, 'tracking_numbers': [place['tracking_number'] for place in diff['deletes']]}
+                    )
+
+                if links or stored:
+                    IngestService._write_composite_links(db, period_id, batch_id, links)
+
+                RollupService.refresh_batches(db, [batch_id], period_id=period_id)
+
+                db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        if created_clients and not dry_run:
+            client_resolver.remember({code: client_ids[code] for code in created_clients})
+        if not dry_run:
+            tracking_lookup.add(item['tracking_number'] for item in diff['inserts'])
+            tracking_lookup.invalidate(
+                *(item['tracking_number'] for item, _ in diff['updates']),
+                *(place['tracking_number'] for place in diff['deletes'])
+            )
+
+        logger.info(
+            f"Партия {batch_number} {'проверена' if dry_run else 'записана'} за {time.perf_counter() - started:.3f} с: "
+            f"{len(rows)} строк, добавлено {len(diff['inserts'])}, обновлено {len(diff['updates'])}, "
+            f"удалено {len(diff['deletes'])}, без изменений {len(diff['unchanged'])}"
+        )
+        return {
+            'batch_id': batch_id,
+            'batch_number': batch_number,
+            'period_id': period_id,
+            'rows': len(rows),
+            'inserted': len(diff['inserts']),
+            'updated': len(diff['updates']),
+            'deleted': len(diff['deletes']),
+            'unchanged': len(diff['unchanged']),
+            'composite_links': len(links),
+            'dry_run': dry_run,
+            'created_clients': created_clients,
+            'unmatched_clients': unmatched_clients,
+            'changes': changes
+        }
@@ -0,0 +1,284 @@
+import os
+import time
+import zlib
+import sqlite3
+import asyncio
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Callable, Awaitable
+import orjson
+from starlette.concurrency import run_in_threadpool
+from app.core.responses import dumps
+from scripts.CargoExcelParser import PARSER_VERSION
+
+logger = logging.getLogger('parse_cache')
+
+# Хранилище кэша: sqlite, disk или none (кэш отключен)
+PARSE_CACHE_BACKEND = os.getenv("PARSE_CACHE_BACKEND", "sqlite")
+PARSE_CACHE_DIR = os.getenv("PARSE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "cargo-parse-cache"))
+# Максимальный суммарный размер (в байтах, после сжатия) записей в кэше
+PARSE_CACHE_MAX_SIZE = int(os.getenv("PARSE_CACHE_MAX_SIZE", 256 * 1024 * 1024))
+
+
+def encode_result(rows: List[Dict[str, Any]]) -> bytes:
+    """Сериализует и сжимает результат парсинга."""
+    return zlib.compress(dumps(rows))
+
+
+def decode_result(data: bytes) -> List[Dict[str, Any]]:
+    """Распаковывает результат парсинга, сохраненный через encode_result."""
+    return orjson.loads(zlib.decompress(data))
+
+
+class ParseCacheBackend:
+    """
+    Базовый класс хранилища кэша результатов парсинга.
+    Хранилище работает с уже сериализованными значениями и само отвечает
+    за вытеснение записей при превышении лимита размера.
+    """
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes) -> None:
+        raise NotImplementedError
+
+
+class SQLiteParseCacheBackend(ParseCacheBackend):
+    """Кэш в локальной базе SQLite с вытеснением давно не использованных записей."""
+
+    def __init__(self, path: str, max_size: int = PARSE_CACHE_MAX_SIZE):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS parse_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_parse_cache_accessed_at ON parse_cache (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM parse_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE parse_cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    def set(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO parse_cache (key, value, size, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time.time())
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Удаляет самые старые по времени обращения записи, пока кэш не уложится в лимит."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM parse_cache").fetchone()[0]
+        if total <= self.max_size:
+            return
+
+        for key, size in self._conn.execute(
+                "SELECT key, size FROM parse_cache ORDER BY accessed_at").fetchall():
+            self._conn.execute("DELETE FROM parse_cache WHERE key = ?", (key,))
+            total -= size
+            logger.info(f"Запись {key} вытеснена из кэша")
+            if total <= self.max_size:
+                break
+
+
+class DiskParseCacheBackend(ParseCacheBackend):
+    """Кэш в виде отдельных файлов в каталоге; время обращения хранится в mtime файла."""
+
+    def __init__(self, directory: str, max_size: int = PARSE_CACHE_MAX_SIZE):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json.z"
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        return data
+
+    def set(self, key: str, value: bytes) -> None:
+        path = self._path(key)
+        # Пишем во временный файл и переименовываем, чтобы читатели не видели частичную запись
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(value)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._evict()
+
+    def _evict(self) -> None:
+        """Удаляет самые старые по времени обращения файлы, пока кэш не уложится в лимит."""
+        entries = []
+        for path in self.directory.glob("*.json.z"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            logger.info(f"Файл {path.name} вытеснен из кэша")
+
+
+class ParseResultCache:
+    """
+    Кэш результатов парсинга по содержимому файла.
+
+    Ключ состоит из SHA-256 содержимого файла, ID периода и версии парсера,
+    поэтому повторная загрузка того же файла в тот же период возвращает
+    готовый результат, а изменение правил разбора автоматически делает
+    старые записи недействительными. Одновременные загрузки одного и того же
+    файла объединяются: парсинг выполняется один раз, остальные запросы
+    ожидают его результат.
+    """
+
+    def __init__(self, backend: Optional[ParseCacheBackend]):
+        self.backend = backend
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def make_key(sha256: str, period_id: str, parser_version: str = PARSER_VERSION) -> str:
+        """
+        Формирует ключ кэша.
+
+        Args:
+            sha256: Хэш содержимого файла
+            period_id: ID периода
+            parser_version: Версия парсера
+
+        Returns:
+            str: Ключ записи
+        """
+        safe_period = "".join(ch if ch.isalnum() else "_" for ch in str(period_id))
+        return f"{sha256}-{safe_period}-v{parser_version}"
+
+    async def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Возвращает сохраненный результат парсинга без запуска парсинга.
+
+        Args:
+            key: Ключ, полученный через make_key
+
+        Returns:
+            Optional[List[Dict[str, Any]]]: Результат или None, если записи нет
+        """
+        if self.backend is None:
+            return None
+        return await run_in_threadpool(self._load, key)
+
+    async def get_or_parse(
+            self,
+            key: str,
+            parse: Callable[[], Awaitable[List[Dict[str, Any]]]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Возвращает результат из кэша или выполняет парсинг и сохраняет результат.
+        Параллельные запросы того же ключа ждут один парсинг; если запрос,
+        выполнявший его, отменен, один из ожидающих запускает парсинг заново.
+
+        Args:
+            key: Ключ, полученный через make_key
+            parse: Корутина-фабрика, выполняющая парсинг
+
+        Returns:
+            List[Dict[str, Any]]: Список словарей с данными о грузах
+        """
+        if self.backend is None:
+            return await parse()
+
+        while True:
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            logger.info(f"Ожидаем результат уже выполняющегося парсинга: {key}")
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # Отменен не этот запрос, а запрос, выполнявший парсинг (например,
+                # клиент отключился): парсинг повторяется для ожидающих
+                if not inflight.cancelled():
+                    raise
+                logger.info(f"Парсинг отменен вместе с запросом, повторяем: {key}")
+
+        # Регистрируем запрос до обращения к хранилищу, чтобы параллельные
+        # загрузки того же файла дождались его, а не запустили свой парсинг
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await run_in_threadpool(self._load, key)
+            if result is not None:
+                logger.info(f"Результат парсинга взят из кэша: {key}")
+            else:
+                result = await parse()
+                if result:
+                    await run_in_threadpool(self._store, key, result)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            # Отмена запроса не ошибка парсинга: ожидающие запускают парсинг заново
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Исключение уже передано ожидающим, чтобы не было предупреждения о непрочитанном исключении
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def _load(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        try:
+            data = self.backend.get(key)
+            return decode_result(data) if data is not None else None
+        except Exception as e:
+            logger.warning(f"Ошибка чтения кэша: {e}")
+            return None
+
+    def _store(self, key: str, result: List[Dict[str, Any]]) -> None:
+        try:
+            self.backend.set(key, encode_result(result))
+        except Exception as e:
+            logger.warning(f"Ошибка записи в кэш: {e}")
+
+
+def create_parse_cache() -> ParseResultCache:
+    """Создает кэш с хранилищем, выбранным через PARSE_CACHE_BACKEND."""
+    if PARSE_CACHE_BACKEND == "sqlite":
+        backend = SQLiteParseCacheBackend(os.path.join(PARSE_CACHE_DIR, "parse_cache.sqlite3"))
+    elif PARSE_CACHE_BACKEND == "disk":
+        backend = DiskParseCacheBackend(PARSE_CACHE_DIR)
+    elif PARSE_CACHE_BACKEND == "none":
+        backend = None
+    else:
+        raise ValueError(f"Неизвестное хранилище кэша парсинга: {PARSE_CACHE_BACKEND}")
+    return ParseResultCache(backend)
+
+
+parse_cache = create_parse_cache()
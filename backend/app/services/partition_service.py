@@ -0,0 +1,179 @@
+import logging
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.api.v1.models.cargo import CargoPlace
+from app.services.closure_service import ClosureService, CompositeLinkError
+
+logger = logging.getLogger('partition_service')
+
+# Таблица cargo_places секционирована по period_id (LIST): у каждого периода
+# своя секция cargo_places_p<ID>, места периодов без секции попадают в cargo_places_default
+PARTITIONED_TABLE = "cargo_places"
+DEFAULT_PARTITION = "cargo_places_default"
+
+
+def partition_name(period_id: int) -> str:
+    """Имя секции cargo_places для периода."""
+    return f"{PARTITIONED_TABLE}_p{int(period_id)}"
+
+
+def ensure_period_partition(db: Session, period_id: int) -> None:
+    """
+    Создает секцию мест для периода, если ее еще нет. Транзакция не фиксируется.
+
+    Если места периода уже попали в секцию по умолчанию, они переносятся
+    в новую секцию: секция создается отдельной таблицей, заполняется
+    и только затем присоединяется (присоединение секции при наличии ее
+    строк в секции по умолчанию Postgres не допускает).
+    Проверочное ограничение на период позволяет присоединить заполненную
+    секцию без полного просмотра ее строк.
+
+    Args:
+        db: Сессия базы данных
+        period_id: ID периода
+    """
+    name = partition_name(period_id)
+    period_id = int(period_id)
+    exists = db.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {'name': name}).scalar()
+    if exists:
+        return
+
+    has_rows = db.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE period_id = :period_id)"),
+        {'period_id': period_id}
+    ).scalar()
+    if not has_rows:
+        db.execute(text(f"CREATE TABLE {name} PARTITION OF {PARTITIONED_TABLE} FOR VALUES IN ({period_id})"))
+        logger.info(f"Создана секция {name}")
+        return
+
+    # Удаление мест из секции по умолчанию каскадно удаляет их связи сборных мест
+    # и пути в таблице замыкания, поэтому связи сохраняются и восстанавливаются
+    # после присоединения секции, а пути строятся заново
+    db.execute(
+        text(
+            "CREATE TEMP TABLE composite_places_moved ON COMMIT DROP AS "
+            "SELECT * FROM composite_places WHERE period_id = :period_id"
+        ),
+        {'period_id': period_id}
+    )
+    db.execute(text(
+        f"CREATE TABLE {name} (LIKE {PARTITIONED_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED)"
+    ))
+    db.execute(text(f"ALTER TABLE {name} ADD CONSTRAINT {name}_period_check CHECK (period_id = {period_id})"))
+    # Вычисляемые столбцы (поисковый вектор) база заполняет сама
+    columns = ", ".join(column.name for column in CargoPlace.__table__.columns if column.computed is None)
+    moved = db.execute(
+        text(f"INSERT INTO {name} ({columns}) SELECT {columns} FROM {DEFAULT_PARTITION} WHERE period_id = :period_id"),
+        {'period_id': period_id}
+    ).rowcount
+    db.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE period_id = :period_id"), {'period_id': period_id})
+    db.execute(text(f"ALTER TABLE {PARTITIONED_TABLE} ATTACH PARTITION {name} FOR VALUES IN ({period_id})"))
+    # После присоединения ограничение дублирует границу секции
+    db.execute(text(f"ALTER TABLE {name} DROP CONSTRAINT {name}_period_check"))
+    children = db.execute(
+        text("INSERT INTO composite_places SELECT * FROM composite_places_moved RETURNING cargo_place_id")
+    ).scalars().all()
+    # Временная таблица удаляется сразу: секции нескольких периодов могут создаваться в одной транзакции
+    db.execute(text("DROP TABLE composite_places_moved"))
+    ClosureService.refresh(db, period_id, children)
+    logger.info(f"Создана секция {name}, перенесено мест из секции по умолчанию: {moved}")
+
+
+def drop_period_partition(db: Session, period_id: int) -> None:
+    """
+    Удаляет пустую секцию мест периода. Транзакция не фиксируется.
+
+    Args:
+        db: Сессия базы данных
+        period_id: ID периода
+    """
+    name = partition_name(period_id)
+    if db.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {'name': name}).scalar():
+        db.execute(text(f"DROP TABLE {name}"))
+        logger.info(f"Удалена секция {name}")
+
+
+def move_batch_places(db: Session, batch_id: int, old_period_id: int, new_period_id: int) -> int:
+    """
+    Переносит места партии в секцию другого периода (при смене периода партии).
+    Транзакция не фиксируется.
+
+    Перенос строки между секциями - это удаление и вставка, поэтому связи
+    сборных мест партии снимаются до переноса и восстанавливаются после него
+    с новым периодом. Связи с местами других партий не переносятся (связь
+    возможна только внутри периода), поэтому при их наличии перенос отклоняется.
+
+    Args:
+        db: Сессия базы данных
+        batch_id: ID партии
+        old_period_id: Прежний период
+        new_period_id: Новый период
+
+    Returns:
+        int: Число перенесенных мест
+
+    Raises:
+        CompositeLinkError: Места партии связаны со сборными местами других партий
+    """
+    for period_id in sorted({old_period_id, new_period_id}):
+        ClosureService.lock_period(db, period_id)
+    crossing = db.execute(
+        text(
+            "SELECT count(*) FROM composite_places cp "
+            "JOIN cargo_places c ON c.period_id = cp.period_id AND c.id = cp.cargo_place_id "
+            "JOIN cargo_places p ON p.period_id = cp.period_id AND p.id = cp.parent_id "
+            "WHERE cp.period_id = :old_period_id AND (c.batch_id = :batch_id OR p.batch_id = :batch_id) "
+            "AND (c.batch_id IS DISTINCT FROM :batch_id OR p.batch_id IS DISTINCT FROM :batch_id)"
+        ),
+        {'batch_id': batch_id, 'old_period_id': old_period_id}
+    ).scalar()
+    if crossing:
+        raise CompositeLinkError(
+            f"Места партии {batch_id} связаны со сборными местами других партий ({crossing}): "
+            "снимите эти связи перед переносом партии в другой период"
+        )
+
+    ensure_period_partition(db, new_period_id)
+    links = db.execute(
+        text(
+            "DELETE FROM composite_places cp USING cargo_places c "
+            "WHERE c.batch_id = :batch_id AND c.period_id = :old_period_id "
+            "AND cp.period_id = c.period_id AND cp.cargo_place_id = c.id "
+            "RETURNING cp.cargo_place_id, cp.parent_id, cp.quantity"
+        ),
+        {'batch_id': batch_id, 'old_period_id': old_period_id}
+    ).all()
+    children = [link[0] for link in links]
+    # Пути через снятые связи удаляются из таблицы замыкания до переноса мест
+    ClosureService.refresh(db, old_period_id, children)
+
+    moved = db.execute(
+        text(
+            "UPDATE cargo_places SET period_id = :new_period_id "
+            "WHERE batch_id = :batch_id AND period_id = :old_period_id"
+        ),
+        {'batch_id': batch_id, 'old_period_id': old_period_id, 'new_period_id': new_period_id}
+    ).rowcount
+
+    if links:
+        db.execute(
+            text(
+                "INSERT INTO composite_places (cargo_place_id, parent_id, quantity, period_id) "
+                "SELECT *, :period_id FROM unnest(CAST(:children AS INTEGER[]), CAST(:parents AS INTEGER[]), "
+                "CAST(:quantities AS INTEGER[]))"
+            ),
+            {
+                'period_id': new_period_id,
+                'children': children,
+                'parents': [link[1] for link in links],
+                'quantities': [link[2] for link in links]
+            }
+        )
+        ClosureService.refresh(db, new_period_id, children)
+    db.execute(
+        text("UPDATE cargo_rollups SET period_id = :period_id WHERE batch_id = :batch_id"),
+        {'batch_id': batch_id, 'period_id': new_period_id}
+    )
+    logger.info(f"Места партии {batch_id} перенесены из периода {old_period_id} в {new_period_id}: {moved}")
+    return moved
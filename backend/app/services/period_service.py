@@ -0,0 +1,52 @@
+from typing import List, Optional, Sequence
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.api.v1.crud.base import CRUDBase
+from app.api.v1.crud.cargo.periods import period_crud
+from app.api.v1.models.cargo import Period
+from app.api.v1.schemas.cargo import PeriodCreate, PeriodUpdate
+from app.services.partition_service import ensure_period_partition, drop_period_partition
+from app.services.tracking_lookup import tracking_lookup
+
+
+class PeriodService(CRUDBase[Period, PeriodCreate, PeriodUpdate]):
+    """
+    Запись периодов вместе с их секциями мест: секция создается в той же
+    транзакции, что и период, и удаляется вместе с ним.
+    """
+
+    def create(self, db: Session, obj_in: PeriodCreate, commit: bool = True) -> Optional[Period]:
+        created = self.create_many(db, [obj_in], commit)
+        return created[0] if created else None
+
+    def create_many(self, db: Session, objs_in: Sequence[PeriodCreate], commit: bool = True) -> List[Period]:
+        db_periods = super().create_many(db, objs_in, commit=False)
+        # Секции мест создаются вместе с периодами, в той же транзакции
+        for db_period in db_periods:
+            ensure_period_partition(db, db_period.period_id)
+        if commit:
+            self.commit(db, *db_periods)
+        return db_periods
+
+    def delete(self, db: Session, id: int, commit: bool = True) -> bool:
+        return bool(self.delete_many(db, [id], commit))
+
+    def delete_many(self, db: Session, ids: Sequence[int], commit: bool = True) -> List[int]:
+        if not ids:
+            return []
+        # Вместе с периодами удаляются их партии, с партиями - их места (ON DELETE
+        # CASCADE). Партии удаляются отдельным запросом до периодов: места без
+        # партии не дают удалить период (RESTRICT), значит секции удаленных
+        # периодов пусты. Для больших периодов - PurgeService: удаление секции
+        # целиком в фоне
+        db.execute(text("DELETE FROM batches WHERE period_id = ANY(:period_ids)"), {'period_ids': list(ids)})
+        deleted = super().delete_many(db, ids, commit=False)
+        for period_id in deleted:
+            drop_period_partition(db, period_id)
+        tracking_lookup.clear_after_commit(db)
+        if commit:
+            self.commit(db)
+        return deleted
+
+
+period_service = PeriodService(Period, conflict_columns=period_crud.conflict_columns)
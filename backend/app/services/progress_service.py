@@ -0,0 +1,235 @@
+import os
+import time
+import json
+import asyncio
+import logging
+import threading
+from typing import Dict, List, Any, Optional, AsyncIterator, Tuple
+
+logger = logging.getLogger('progress_service')
+
+# Минимальный интервал между событиями о числе разобранных строк (в секундах)
+PROGRESS_ROWS_INTERVAL = float(os.getenv("UPLOAD_PROGRESS_ROWS_INTERVAL", 0.5))
+# Сколько событий хранится по одной загрузке
+PROGRESS_MAX_EVENTS = int(os.getenv("UPLOAD_PROGRESS_MAX_EVENTS", 500))
+# Сколько секунд хранится завершенная или так и не начатая загрузка
+PROGRESS_TTL = int(os.getenv("UPLOAD_PROGRESS_TTL", 600))
+# Сколько секунд после завершения подписка получает итог загрузки; позже
+# подписка с тем же идентификатором относится уже к новой загрузке
+PROGRESS_RESULT_TTL = int(os.getenv("UPLOAD_PROGRESS_RESULT_TTL", 30))
+# Предельное число загрузок в реестре: при переполнении вытесняются давно не обновлявшиеся
+PROGRESS_MAX_UPLOADS = int(os.getenv("UPLOAD_PROGRESS_MAX_UPLOADS", 10000))
+# Как часто поток SSE проверяет новые события и отправляет пинг
+PROGRESS_POLL_INTERVAL = float(os.getenv("UPLOAD_PROGRESS_POLL_INTERVAL", 0.25))
+PROGRESS_KEEPALIVE_INTERVAL = float(os.getenv("UPLOAD_PROGRESS_KEEPALIVE_INTERVAL", 15))
+
+
+class ProgressNotFoundError(Exception):
+    """Хода обработки загрузки нет или он принадлежит другому пользователю."""
+    status_code = 404
+
+
+class UploadProgress:
+    """
+    Ход обработки одной загрузки.
+
+    Экземпляр передается в CargoExcelParser как progress_callback и может
+    вызываться из рабочего потока. События о числе разобранных строк
+    прореживаются (не чаще PROGRESS_ROWS_INTERVAL), остальные события
+    (смена фазы, предупреждения, завершение) сохраняются всегда.
+    """
+
+    def __init__(self, upload_id: str, owner: Optional[str] = None):
+        self.upload_id = upload_id
+        self.owner = owner
+        self.updated_at = time.monotonic()
+        self.finished = False
+        self.finished_at: Optional[float] = None
+        self._events: List[Dict[str, Any]] = []
+        self._dropped = 0
+        self._last_rows_at = 0.0
+        self._pending_rows: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def __call__(self, event: str, data: Dict[str, Any]) -> None:
+        if event != 'rows':
+            self._append(event, data)
+            return
+
+        now = time.monotonic()
+        is_last = data.get('parsed') == data.get('total')
+        with self._lock:
+            self.updated_at = now
+            if not is_last and now - self._last_rows_at < PROGRESS_ROWS_INTERVAL:
+                # Запоминаем последнее значение, чтобы отдать его перед следующим событием
+                self._pending_rows = data
+                return
+            self._last_rows_at = now
+            self._pending_rows = None
+            self._push(event, data)
+
+    def phase(self, phase: str, **data) -> None:
+        """Сообщает о смене фазы обработки."""
+        self._append('phase', dict(data, phase=phase))
+
+    def warning(self, message: str) -> None:
+        """Сообщает о некритичной проблеме при обработке."""
+        self._append('warning', {'message': message})
+
+    def finish(self, success: bool, **data) -> None:
+        """Отмечает окончание обработки."""
+        self._append('done' if success else 'failed', data)
+        self.finished_at = time.monotonic()
+        self.finished = True
+
+    def _append(self, event: str, data: Dict[str, Any]) -> None:
+        with self._lock:
+            # Перед событием другого типа отдаем отложенное прореживанием значение счетчика строк
+            if self._pending_rows is not None and event != 'rows':
+                self._push('rows', self._pending_rows)
+                self._pending_rows = None
+            self._push(event, data)
+            self.updated_at = time.monotonic()
+
+    def _push(self, event: str, data: Dict[str, Any]) -> None:
+        if len(self._events) >= PROGRESS_MAX_EVENTS:
+            # Переполнение возможно только при лавине предупреждений: старые удаляем
+            self._events.pop(0)
+            self._dropped += 1
+        self._events.append({'event': event, 'data': data, 'time': time.time()})
+
+    def events_since(self, position: int) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Возвращает события, появившиеся после указанной позиции.
+
+        Args:
+            position: Число уже полученных событий (с учетом удаленных)
+
+        Returns:
+            Tuple[List[Dict[str, Any]], int]: Новые события и новая позиция
+        """
+        with self._lock:
+            start = max(position - self._dropped, 0)
+            events = self._events[start:]
+            return events, self._dropped + len(self._events)
+
+
+class ProgressRegistry:
+    """
+    Реестр хода обработки загрузок в памяти процесса.
+
+    Ход обработки доступен только пользователю, начавшему загрузку. Записи
+    удаляются через PROGRESS_TTL без обновлений, а при переполнении
+    (PROGRESS_MAX_UPLOADS) вытесняются давно не обновлявшиеся.
+    """
+
+    def __init__(self, max_size: int = PROGRESS_MAX_UPLOADS):
+        self.max_size = max_size
+        self._items: Dict[str, UploadProgress] = {}
+        self._lock = threading.Lock()
+
+    def get_or_create(self, upload_id: str, owner: str) -> UploadProgress:
+        """
+        Возвращает ход обработки загрузки, создавая запись при необходимости.
+        Клиент может подписаться на события до того, как начнет загрузку файла.
+        Итог завершенной загрузки отдается в течение PROGRESS_RESULT_TTL, позже
+        запись заменяется новой: идентификатор используется повторно.
+
+        Args:
+            upload_id: Идентификатор загрузки, выбранный клиентом
+            owner: Логин пользователя
+
+        Returns:
+            UploadProgress: Ход обработки
+
+        Raises:
+            ProgressNotFoundError: Загрузка с этим идентификатором принадлежит другому пользователю
+        """
+        with self._lock:
+            self._cleanup()
+            progress = self._items.get(upload_id)
+            if progress is not None and progress.owner != owner:
+                raise ProgressNotFoundError("Загрузка не найдена")
+            if progress is None or (
+                    progress.finished and time.monotonic() - progress.finished_at > PROGRESS_RESULT_TTL
+            ):
+                progress = self._add(upload_id, owner)
+            return progress
+
+    def start(self, upload_id: str, owner: str) -> UploadProgress:
+        """
+        Возвращает ход обработки для начинающейся загрузки.
+        Завершенная запись с тем же идентификатором или запись другого
+        пользователя заменяется новой.
+
+        Args:
+            upload_id: Идентификатор загрузки, выбранный клиентом
+            owner: Логин пользователя
+
+        Returns:
+            UploadProgress: Ход обработки
+        """
+        with self._lock:
+            self._cleanup()
+            progress = self._items.get(upload_id)
+            if progress is None or progress.finished or progress.owner != owner:
+                progress = self._add(upload_id, owner)
+            return progress
+
+    def _add(self, upload_id: str, owner: str) -> UploadProgress:
+        self._items.pop(upload_id, None)
+        if len(self._items) >= self.max_size:
+            oldest = min(self._items, key=lambda key: self._items[key].updated_at)
+            del self._items[oldest]
+        progress = UploadProgress(upload_id, owner)
+        self._items[upload_id] = progress
+        return progress
+
+    def _cleanup(self) -> None:
+        """Удаляет записи, которые не обновлялись дольше PROGRESS_TTL."""
+        now = time.monotonic()
+        expired = [key for key, item in self._items.items() if now - item.updated_at > PROGRESS_TTL]
+        for key in expired:
+            del self._items[key]
+
+
+progress_registry = ProgressRegistry()
+
+
+async def stream_progress_events(progress: UploadProgress, is_disconnected) -> AsyncIterator[str]:
+    """
+    Формирует поток server-sent events по ходу обработки загрузки.
+    Поток завершается после события done/failed, при отключении клиента
+    или если загрузка так и не началась за PROGRESS_TTL.
+
+    Args:
+        progress: Ход обработки загрузки
+        is_disconnected: Корутина-функция, проверяющая отключение клиента
+
+    Yields:
+        str: Сообщения в формате text/event-stream
+    """
+    position = 0
+    last_sent = time.monotonic()
+    while True:
+        events, position = progress.events_since(position)
+        for item in events:
+            payload = json.dumps(dict(item['data'], time=item['time']), ensure_ascii=False, default=str)
+            yield f"event: {item['event']}\ndata: {payload}\n\n"
+            last_sent = time.monotonic()
+
+        if progress.finished and not events:
+            return
+        if await is_disconnected():
+            return
+
+        now = time.monotonic()
+        if now - progress.updated_at > PROGRESS_TTL:
+            logger.info(f"Поток хода обработки {progress.upload_id} закрыт по таймауту")
+            return
+        if now - last_sent > PROGRESS_KEEPALIVE_INTERVAL:
+            # Комментарий не виден клиенту, но не дает прокси закрыть соединение
+            yield ": keepalive\n\n"
+            last_sent = now
+
+        await asyncio.sleep(PROGRESS_POLL_INTERVAL)
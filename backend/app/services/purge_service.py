@@ -0,0 +1,363 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, TypeVar
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from app.core.database import SessionLocal, error_summary
+from app.services.archive_service import ARCHIVE_DIR, archive_path
+from app.services.partition_service import partition_name
+from app.services.tracking_lookup import tracking_lookup
+
+logger = logging.getLogger('purge_service')
+
+# Мест, удаляемых одной транзакцией: блокировки держатся на время одной пачки
+PURGE_CHUNK_SIZE = int(os.getenv("PURGE_CHUNK_SIZE", 5000))
+# Ожидание блокировки при удалении секции и попыток его повторить: удаление
+# секции ждет долгих запросов к ней, а ждущая блокировка задерживает остальные запросы
+PURGE_LOCK_TIMEOUT = os.getenv("PURGE_LOCK_TIMEOUT", "3s")
+PURGE_LOCK_RETRIES = int(os.getenv("PURGE_LOCK_RETRIES", 10))
+# Сколько секунд хранится завершенное задание
+PURGE_JOB_TTL = int(os.getenv("PURGE_JOB_TTL", 3600))
+
+T = TypeVar('T')
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+
+class PurgeError(Exception):
+    """Удаление невозможно."""
+    status_code = 400
+
+
+class PurgeNotFoundError(PurgeError):
+    """Удаляемой записи нет."""
+    status_code = 404
+
+
+class PurgeConflictError(PurgeError):
+    """Запись нельзя удалить из-за ссылающихся на нее данных."""
+    status_code = 409
+
+
+class PurgeJob:
+    """Задание удаления периода или партии и его ход."""
+
+    def __init__(self, kind: str, target_id: int, total: int):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.target_id = target_id
+        self.status = JOB_QUEUED
+        self.total = total
+        self.deleted = 0
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'target_id': self.target_id,
+            'status': self.status,
+            'total': self.total,
+            'deleted': self.deleted,
+            'error': self.error,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+        }
+
+
+def _delete_places_chunked(db: Session, condition: str, params: Dict[str, Any], job: Optional[PurgeJob]) -> int:
+    """
+    Удаляет места по условию пачками по PURGE_CHUNK_SIZE, фиксируя каждую пачку.
+    Связи сборных мест и пути в таблице замыкания удаляются каскадом.
+    """
+    deleted = 0
+    while True:
+        count = db.execute(
+            text(
+                "DELETE FROM cargo_places WHERE (id, period_id) IN ("
+                f"SELECT id, period_id FROM cargo_places WHERE {condition} LIMIT :chunk_size)"
+            ),
+            dict(params, chunk_size=PURGE_CHUNK_SIZE)
+        ).rowcount
+        db.commit()
+        deleted += count
+        if job is not None:
+            job.deleted = deleted
+        if count < PURGE_CHUNK_SIZE:
+            return deleted
+
+
+def _with_lock_retries(db: Session, action: Callable[[], T]) -> T:
+    """
+    Выполняет action одной транзакцией с ограниченным ожиданием блокировок,
+    повторяя ее, если блокировку получить не удалось.
+    """
+    for attempt in range(1, PURGE_LOCK_RETRIES + 1):
+        try:
+            db.execute(text("SELECT set_config('lock_timeout', :timeout, true)"), {'timeout': PURGE_LOCK_TIMEOUT})
+            result = action()
+            db.commit()
+            return result
+        except Exception as e:
+            db.rollback()
+            lock_timeout = isinstance(e, OperationalError) and getattr(e.orig, 'pgcode', None) == '55P03'
+            if not lock_timeout or attempt == PURGE_LOCK_RETRIES:
+                raise
+            logger.info(f"Блокировка не получена, попытка {attempt} из {PURGE_LOCK_RETRIES}")
+            time.sleep(min(attempt, 5))
+
+
+class PurgeService:
+    """
+    Удаление периодов и партий без загрузки их мест в память и без долгих блокировок.
+
+    Места партии удаляются пачками по PURGE_CHUNK_SIZE, каждая пачка - своя
+    транзакция. Места периода, у которого есть своя секция, удаляются вместе
+    с секцией (DROP TABLE, без построчного удаления); оставшиеся места
+    в секции по умолчанию - пачками. Строки партий и периода удаляются последними,
+    сводка и связи сборных мест - каскадом в базе. На время удаления партии
+    помечаются неактивными; если период удалить не удалось, они снова активны.
+
+    Удаление можно выполнить сразу (purge_period, purge_batch) или фоновым
+    заданием (start_period_purge, start_batch_purge) с ходом в get_job.
+    Задания хранятся в памяти процесса.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
+        self._jobs: Dict[str, PurgeJob] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def check_period(db: Session, period_id: int) -> int:
+        """
+        Проверяет, что период можно удалить.
+
+        Returns:
+            int: Число мест периода
+
+        Raises:
+            PurgeNotFoundError: Периода нет
+            PurgeConflictError: У периода есть места без партии
+        """
+        row = db.execute(
+            text(
+                "SELECT EXISTS (SELECT 1 FROM periods WHERE period_id = :period_id), "
+                "(SELECT count(*) FROM cargo_places WHERE period_id = :period_id), "
+                "EXISTS (SELECT 1 FROM cargo_places WHERE period_id = :period_id AND batch_id IS NULL)"
+            ),
+            {'period_id': period_id}
+        ).one()
+        if not row[0]:
+            raise PurgeNotFoundError("Период не найден")
+        if row[2]:
+            raise PurgeConflictError("У периода есть места без партии: назначьте им партию или удалите их")
+        return row[1]
+
+    @staticmethod
+    def check_batch(db: Session, batch_id: int) -> int:
+        """
+        Проверяет, что партия есть и ее период не в архиве: места архивного
+        периода ссылаются на партию и вернуть их из архива без нее нельзя.
+
+        Returns:
+            int: Число мест партии
+
+        Raises:
+            PurgeNotFoundError: Партии нет
+            PurgeConflictError: Период партии в архиве
+        """
+        row = db.execute(
+            text(
+                "SELECT b.period_id, (SELECT count(*) FROM cargo_places c "
+                "WHERE c.period_id = b.period_id AND c.batch_id = b.id), p.archived_at "
+                "FROM batches b JOIN periods p ON p.period_id = b.period_id WHERE b.id = :batch_id"
+            ),
+            {'batch_id': batch_id}
+        ).one_or_none()
+        if row is None:
+            raise PurgeNotFoundError("Партия не найдена")
+        if row[2] is not None:
+            raise PurgeConflictError("Период партии в архиве: верните его из архива перед удалением партии")
+        return row[1]
+
+    @staticmethod
+    def purge_period(db: Session, period_id: int, job: Optional[PurgeJob] = None) -> bool:
+        """
+        Удаляет период с партиями и местами. Транзакции фиксируются по ходу удаления.
+
+        Returns:
+            bool: True, если период был удален
+
+        Raises:
+            PurgeConflictError: У периода есть места без партии
+        """
+        PurgeService.check_period(db, period_id)
+        params = {'period_id': period_id}
+        deactivated = db.execute(
+            text("UPDATE batches SET is_active = FALSE WHERE period_id = :period_id AND is_active RETURNING id"),
+            params
+        ).scalars().all()
+        db.commit()
+        try:
+            return PurgeService._purge_period(db, period_id, job)
+        except Exception:
+            # Период не удален: партии, помеченные неактивными на время удаления,
+            # снова активны
+            db.rollback()
+            if deactivated:
+                try:
+                    db.execute(
+                        text("UPDATE batches SET is_active = TRUE WHERE id = ANY(:batch_ids)"),
+                        {'batch_ids': deactivated}
+                    )
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    logger.exception(f"Не удалось снова активировать партии периода {period_id}: {deactivated}")
+            raise
+
+    @staticmethod
+    def _purge_period(db: Session, period_id: int, job: Optional[PurgeJob]) -> bool:
+        params = {'period_id': period_id}
+        name = partition_name(period_id)
+        has_partition = db.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {'name': name}).scalar()
+        if not has_partition:
+            _delete_places_chunked(db, "period_id = :period_id AND batch_id IS NOT NULL", params, job)
+
+        def finish() -> bool:
+            if has_partition:
+                # Секция блокируется до повторной проверки: место без партии,
+                # добавленное после первой проверки, не удалится вместе с секцией
+                db.execute(text(f"LOCK TABLE {name} IN ACCESS EXCLUSIVE MODE"))
+                if db.execute(
+                        text(f"SELECT EXISTS (SELECT 1 FROM {name} WHERE batch_id IS NULL)")
+                ).scalar():
+                    raise PurgeConflictError("У периода есть места без партии: назначьте им партию или удалите их")
+                # Ссылки на места секции удаляются до нее: внешние ключи не дают
+                # удалить секцию, на строки которой ссылаются
+                db.execute(text("DELETE FROM composite_place_closure WHERE period_id = :period_id"), params)
+                db.execute(text("DELETE FROM composite_places WHERE period_id = :period_id"), params)
+                db.execute(text(f"DROP TABLE {name}"))
+            # Места без партии в секции по умолчанию не дают удалить период (RESTRICT)
+            db.execute(text("DELETE FROM batches WHERE period_id = :period_id"), params)
+            return db.execute(
+                text("DELETE FROM periods WHERE period_id = :period_id RETURNING period_id"), params
+            ).scalar() is not None
+
+        deleted = _with_lock_retries(db, finish)
+        if job is not None:
+            job.deleted = job.total
+        # Номера архивного периода удалены каскадом вместе с ним, файл архива больше не нужен
+        if ARCHIVE_DIR:
+            archive_path(period_id).unlink(missing_ok=True)
+        tracking_lookup.clear()
+        logger.info(f"Период {period_id} удален{' вместе с секцией ' + name if has_partition else ''}")
+        return deleted
+
+    @staticmethod
+    def purge_batch(db: Session, batch_id: int, job: Optional[PurgeJob] = None) -> bool:
+        """
+        Удаляет партию с местами. Транзакции фиксируются по ходу удаления.
+        Партия периода в архиве не удаляется (см. check_batch).
+
+        Returns:
+            bool: True, если партия была удалена
+        """
+        period_id = db.execute(
+            text(
+                "UPDATE batches b SET is_active = FALSE FROM periods p "
+                "WHERE b.id = :batch_id AND p.period_id = b.period_id AND p.archived_at IS NULL "
+                "RETURNING b.period_id"
+            ),
+            {'batch_id': batch_id}
+        ).scalar()
+        db.commit()
+        if period_id is None:
+            return False
+
+        params = {'batch_id': batch_id, 'period_id': period_id}
+        _delete_places_chunked(db, "period_id = :period_id AND batch_id = :batch_id", params, job)
+        # Места партии, перенесенной в другой период во время удаления, удаляются каскадом
+        deleted = db.execute(
+            text("DELETE FROM batches WHERE id = :batch_id RETURNING id"), params
+        ).scalar() is not None
+        db.commit()
+        tracking_lookup.clear()
+        logger.info(f"Партия {batch_id} удалена")
+        return deleted
+
+    def start_period_purge(self, db: Session, period_id: int) -> PurgeJob:
+        """
+        Проверяет период и запускает его удаление в фоновом потоке.
+
+        Raises:
+            PurgeNotFoundError: Периода нет
+            PurgeConflictError: У периода есть места без партии
+        """
+        total = self.check_period(db, period_id)
+        return self._start('period', period_id, total, self.purge_period)
+
+    def start_batch_purge(self, db: Session, batch_id: int) -> PurgeJob:
+        """
+        Проверяет партию и запускает ее удаление в фоновом потоке.
+
+        Raises:
+            PurgeNotFoundError: Партии нет
+        """
+        total = self.check_batch(db, batch_id)
+        return self._start('batch', batch_id, total, self.purge_batch)
+
+    def get_job(self, job_id: str) -> Optional[PurgeJob]:
+        with self._lock:
+            self._cleanup()
+            return self._jobs.get(job_id)
+
+    def _start(self, kind: str, target_id: int, total: int, purge: Callable[..., bool]) -> PurgeJob:
+        with self._lock:
+            self._cleanup()
+            # Повторный запрос на удаление той же записи возвращает идущее задание
+            for job in self._jobs.values():
+                if job.kind == kind and job.target_id == target_id and job.status in (JOB_QUEUED, JOB_RUNNING):
+                    return job
+            job = PurgeJob(kind, target_id, total)
+            self._jobs[job.id] = job
+        threading.Thread(target=self._run, args=(job, purge), name=f"purge-{kind}-{target_id}", daemon=True).start()
+        return job
+
+    def _run(self, job: PurgeJob, purge: Callable[..., bool]) -> None:
+        job.status = JOB_RUNNING
+        db = self.session_factory()
+        try:
+            purge(db, job.target_id, job)
+            job.status = JOB_DONE
+        except Exception as e:
+            db.rollback()
+            job.status = JOB_FAILED
+            job.error = error_summary(e)
+            logger.exception(f"Задание {job.id} ({job.kind} {job.target_id}) не выполнено")
+        finally:
+            db.close()
+            job.finished_at = time.time()
+
+    def _cleanup(self) -> None:
+        """Удаляет задания, завершенные дольше PURGE_JOB_TTL назад."""
+        now = time.time()
+        expired = [
+            key for key, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > PURGE_JOB_TTL
+        ]
+        for key in expired:
+            del self._jobs[key]
+
+
+purge_service = PurgeService()
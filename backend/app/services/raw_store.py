@@ -0,0 +1,282 @@
+import os
+import io
+import time
+import zlib
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Any, BinaryIO, Optional
+from app.services.parse_cache import encode_result, decode_result
+
+logger = logging.getLogger('raw_store')
+
+# Хранилище исходных файлов загрузок: включено ли и где лежит. Каталог задается
+# явно и должен быть постоянным (не временным): файлы хранятся только в нем
+RAW_STORE_ENABLED = os.getenv("RAW_STORE_ENABLED", "true").lower() in ("1", "true", "yes")
+RAW_STORE_DIR = os.getenv("RAW_STORE_DIR")
+# Уровень сжатия zlib; файл хранится несжатым, если сжатие не дает выигрыша (.xlsx уже сжат)
+RAW_STORE_COMPRESS_LEVEL = int(os.getenv("RAW_STORE_COMPRESS_LEVEL", 6))
+RAW_STORE_READ_SIZE = 1024 * 1024
+
+
+class RawUploadStore:
+    """
+    Хранилище исходных файлов загрузок с адресацией по содержимому.
+
+    Файл хранится один раз под своим SHA-256 (objects/<2 символа>/<sha256>),
+    сжатым zlib, если это уменьшает размер. В индексе SQLite записывается
+    каждая загрузка (кто, в какой период, номер партии, версия парсера) и
+    последний результат парсинга файла в периоде, чтобы при изменении правил
+    разбора можно было перепарсить сохраненные файлы и сравнить результаты.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        (self.directory / "objects").mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.directory / "index.sqlite3"), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS objects ("
+            " sha256 TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " stored_size INTEGER NOT NULL,"
+            " compressed INTEGER NOT NULL,"
+            " created_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS uploads ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " sha256 TEXT NOT NULL REFERENCES objects (sha256),"
+            " filename TEXT,"
+            " uploader TEXT,"
+            " period_id TEXT NOT NULL,"
+            " batch_number TEXT,"
+            " parser_version TEXT NOT NULL,"
+            " uploaded_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS idx_uploads_sha256 ON uploads (sha256);"
+            "CREATE INDEX IF NOT EXISTS idx_uploads_period ON uploads (period_id);"
+            "CREATE TABLE IF NOT EXISTS results ("
+            " sha256 TEXT NOT NULL REFERENCES objects (sha256),"
+            " period_id TEXT NOT NULL,"
+            " parser_version TEXT NOT NULL,"
+            " batch_number TEXT,"
+            " rows INTEGER NOT NULL,"
+            " result BLOB,"
+            " parsed_at REAL NOT NULL,"
+            " PRIMARY KEY (sha256, period_id));"
+        )
+        self._conn.commit()
+
+    def _object_path(self, sha256: str) -> Path:
+        return self.directory / "objects" / sha256[:2] / sha256
+
+    def save(
+            self,
+            buffer: BinaryIO,
+            sha256: str,
+            filename: str,
+            period_id: str,
+            parser_version: str,
+            uploader: Optional[str] = None,
+            batch_number: Optional[str] = None,
+            result: Optional[List[Dict[str, Any]]] = None
+    ) -> int:
+        """
+        Сохраняет файл (если его еще нет) и записывает загрузку в индекс.
+
+        Args:
+            buffer: Файл (позиция чтения восстанавливается)
+            sha256: Хэш содержимого файла
+            filename: Имя файла при загрузке
+            period_id: ID периода
+            parser_version: Версия парсера, которой разобран файл
+            uploader: Логин пользователя
+            batch_number: Номер партии
+            result: Результат парсинга (None при потоковой отдаче)
+
+        Returns:
+            int: ID записи о загрузке
+        """
+        self._save_object(buffer, sha256)
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO uploads (sha256, filename, uploader, period_id, batch_number, parser_version, uploaded_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (sha256, filename, uploader, str(period_id), batch_number, parser_version, time.time())
+            )
+            if result is not None:
+                self._save_result(sha256, period_id, parser_version, batch_number, result)
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def _save_object(self, buffer: BinaryIO, sha256: str) -> None:
+        path = self._object_path(sha256)
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM objects WHERE sha256 = ?", (sha256,)).fetchone() and path.exists():
+                return
+
+        position = buffer.tell()
+        buffer.seek(0)
+        path.parent.mkdir(exist_ok=True)
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        size = 0
+        compressor = zlib.compressobj(RAW_STORE_COMPRESS_LEVEL)
+        try:
+            with open(tmp_path, 'wb') as target:
+                while True:
+                    block = buffer.read(RAW_STORE_READ_SIZE)
+                    if not block:
+                        break
+                    size += len(block)
+                    target.write(compressor.compress(block))
+                target.write(compressor.flush())
+            compressed = tmp_path.stat().st_size < size
+            if not compressed:
+                # Сжатие не помогло: перезаписываем файл как есть
+                buffer.seek(0)
+                with open(tmp_path, 'wb') as target:
+                    while True:
+                        block = buffer.read(RAW_STORE_READ_SIZE)
+                        if not block:
+                            break
+                        target.write(block)
+            stored_size = tmp_path.stat().st_size
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+            buffer.seek(position)
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO objects (sha256, size, stored_size, compressed, created_at) VALUES (?, ?, ?, ?, ?)",
+                (sha256, size, stored_size, int(compressed), time.time())
+            )
+            self._conn.commit()
+        logger.info(f"Файл {sha256} сохранен в хранилище: {size} байт, на диске {stored_size} байт")
+
+    def _save_result(
+            self,
+            sha256: str,
+            period_id: str,
+            parser_version: str,
+            batch_number: Optional[str],
+            result: List[Dict[str, Any]]
+    ) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO results (sha256, period_id, parser_version, batch_number, rows, result, parsed_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (sha256, str(period_id), parser_version, batch_number, len(result), encode_result(result), time.time())
+        )
+
+    def save_result(
+            self,
+            sha256: str,
+            period_id: str,
+            parser_version: str,
+            batch_number: Optional[str],
+            result: List[Dict[str, Any]]
+    ) -> None:
+        """Заменяет сохраненный результат парсинга файла в периоде (после перепарсинга)."""
+        with self._lock:
+            self._save_result(sha256, period_id, parser_version, batch_number, result)
+            self._conn.commit()
+
+    def read(self, sha256: str) -> bytes:
+        """
+        Возвращает содержимое сохраненного файла.
+
+        Raises:
+            FileNotFoundError: Файла нет в хранилище
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT compressed FROM objects WHERE sha256 = ?", (sha256,)).fetchone()
+        if row is None:
+            raise FileNotFoundError(sha256)
+        data = self._object_path(sha256).read_bytes()
+        return zlib.decompress(data) if row['compressed'] else data
+
+    def open(self, sha256: str) -> BinaryIO:
+        """Открывает сохраненный файл для чтения парсером."""
+        return io.BytesIO(self.read(sha256))
+
+    def get_result(self, sha256: str, period_id: str) -> Optional[Dict[str, Any]]:
+        """Возвращает последний сохраненный результат парсинга файла в периоде."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM results WHERE sha256 = ? AND period_id = ?", (sha256, str(period_id))
+            ).fetchone()
+        if row is None:
+            return None
+        item = dict(row)
+        item['result'] = decode_result(item['result']) if item['result'] is not None else None
+        return item
+
+    def list_files(
+            self,
+            period_id: Optional[str] = None,
+            sha256: Optional[List[str]] = None,
+            batch_number: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Возвращает сохраненные файлы по одному на пару (файл, период)
+        с данными последней загрузки.
+
+        Args:
+            period_id: Только загрузки в указанный период
+            sha256: Только указанные файлы (допускаются префиксы хэша)
+            batch_number: Только указанная партия
+
+        Returns:
+            List[Dict[str, Any]]: Записи с sha256, period_id, filename, uploader,
+                batch_number, parser_version, uploaded_at
+        """
+        conditions = []
+        params: List[Any] = []
+        if period_id is not None:
+            conditions.append("u.period_id = ?")
+            params.append(str(period_id))
+        if batch_number is not None:
+            conditions.append("u.batch_number = ?")
+            params.append(batch_number)
+        if sha256:
+            conditions.append("(" + " OR ".join("u.sha256 LIKE ?" for _ in sha256) + ")")
+            params.extend(f"{prefix.lower()}%" for prefix in sha256)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT u.sha256, u.period_id, u.filename, u.uploader, u.batch_number, u.parser_version,"
+                " MAX(u.uploaded_at) AS uploaded_at, o.size, o.stored_size"
+                " FROM uploads u JOIN objects o ON o.sha256 = u.sha256"
+                f" {where}"
+                " GROUP BY u.sha256, u.period_id ORDER BY uploaded_at",
+                params
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Число файлов и загрузок, исходный размер и размер на диске."""
+        with self._lock:
+            objects = self._conn.execute(
+                "SELECT COUNT(*) AS files, COALESCE(SUM(size), 0) AS size,"
+                " COALESCE(SUM(stored_size), 0) AS stored_size FROM objects"
+            ).fetchone()
+            uploads = self._conn.execute("SELECT COUNT(*) FROM uploads").fetchone()[0]
+        return dict(objects, uploads=uploads)
+
+
+def create_raw_store() -> Optional[RawUploadStore]:
+    """
+    Создает хранилище исходных файлов или возвращает None, если оно отключено
+    через RAW_STORE_ENABLED или не задан каталог RAW_STORE_DIR.
+    """
+    if not RAW_STORE_ENABLED:
+        return None
+    if not RAW_STORE_DIR:
+        logger.warning("Хранилище исходных файлов отключено: не задан каталог RAW_STORE_DIR")
+        return None
+    return RawUploadStore(RAW_STORE_DIR)
+
+
+raw_store = create_raw_store()
@@ -0,0 +1,255 @@
+import logging
+from collections import defaultdict
+from typing import Dict, List, Any, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger('rollup_service')
+
+# Показатели сводной таблицы cargo_rollups
+ROLLUP_METRICS = ('places', 'composite_places', 'boxes', 'weight', 'volume', 'amount')
+
+# Разрезы, по которым можно запрашивать сводку периода
+ROLLUP_DIMENSIONS = {
+    'batch': ('r.batch_id', 'b.batch_number'),
+    'client': ('r.client_id', 'cl.code'),
+    'status': ('r.status', 'r.status'),
+}
+
+# Вклад одного места в показатели - те же правила, что в BatchSummaryAccumulator
+# парсера: основная строка сборного места считается одним местом, остальные строки
+# группы мест не добавляют, коробки, вес, объем и сумма учитываются по всем строкам
+PLACE_CONTRIBUTION = """
+    CASE
+        WHEN EXISTS (SELECT 1 FROM composite_places x WHERE x.parent_id = c.id) THEN 1
+        WHEN EXISTS (SELECT 1 FROM composite_places x WHERE x.cargo_place_id = c.id) THEN 0
+        ELSE COALESCE(c.places_count, 0)
+    END AS places,
+    CASE WHEN EXISTS (SELECT 1 FROM composite_places x WHERE x.parent_id = c.id) THEN 1 ELSE 0 END AS composite_places,
+    COALESCE(c.boxes_count, 0) AS boxes,
+    c.weight AS weight,
+    c.volume AS volume,
+    c.shipping_cost AS amount
+"""
+
+# Агрегирует активные места в строки сводной таблицы; места без клиента
+# собираются под client_id = 0, места без партии в сводку не попадают
+AGGREGATE_SQL = f"""
+    SELECT c.period_id, c.batch_id, COALESCE(c.client_id, 0) AS client_id, c.status,
+           {', '.join(f'SUM(m.{name})' for name in ROLLUP_METRICS)}
+    FROM cargo_places c
+    CROSS JOIN LATERAL (SELECT {PLACE_CONTRIBUTION}) m
+    WHERE c.is_active AND c.batch_id IS NOT NULL AND {{condition}}
+    GROUP BY c.period_id, c.batch_id, COALESCE(c.client_id, 0), c.status
+"""
+
+INSERT_COLUMNS = f"period_id, batch_id, client_id, status, {', '.join(ROLLUP_METRICS)}"
+
+
+class RollupService:
+    """
+    Сводные показатели мест по периодам, партиям, клиентам и статусам.
+
+    Таблица cargo_rollups хранит одну строку на сочетание партия - клиент - статус,
+    поэтому запросы сводки читают число групп, а не число мест. Сводка партии
+    пересчитывается целиком при записи партии (в той же транзакции), смена статуса
+    мест переносит их вклад между строками сводки без пересчета партии.
+    Полный пересчет - scripts/rebuild_rollups.py.
+    """
+
+    @staticmethod
+    def refresh_batches(db: Session, batch_ids: List[int], period_id: Optional[int] = None) -> None:
+        """
+        Пересчитывает сводку партий по их местам. Транзакция не фиксируется.
+
+        Args:
+            db: Сессия базы данных
+            batch_ids: ID партий
+            period_id: Период партий, если известен: места читаются только из его секции
+        """
+        if not batch_ids:
+            return
+        params = {'batch_ids': list(batch_ids)}
+        condition = "c.batch_id = ANY(:batch_ids)"
+        if period_id is not None:
+            condition = "c.period_id = :period_id AND " + condition
+            params['period_id'] = period_id
+        db.execute(text("DELETE FROM cargo_rollups WHERE batch_id = ANY(:batch_ids)"), params)
+        db.execute(
+            text(f"INSERT INTO cargo_rollups ({INSERT_COLUMNS}) " + AGGREGATE_SQL.format(condition=condition)),
+            params
+        )
+
+    @staticmethod
+    def rebuild(db: Session, period_id: Optional[int] = None) -> int:
+        """
+        Пересчитывает сводку всех партий (или партий одного периода) и фиксирует транзакцию.
+
+        Args:
+            db: Сессия базы данных
+            period_id: ID периода; None - все периоды
+
+        Returns:
+            int: Число строк сводки после пересчета
+        """
+        try:
+            # Сводка архивных периодов сохраняется: их мест в cargo_places нет
+            active = "period_id IN (SELECT period_id FROM periods WHERE archived_at IS NULL)"
+            if period_id is None:
+                db.execute(text(f"DELETE FROM cargo_rollups WHERE {active}"))
+                condition, params = "TRUE", {}
+            else:
+                db.execute(
+                    text(f"DELETE FROM cargo_rollups WHERE period_id = :period_id AND {active}"),
+                    {'period_id': period_id}
+                )
+                condition, params = "c.period_id = :period_id", {'period_id': period_id}
+            count = db.execute(
+                text(f"INSERT INTO cargo_rollups ({INSERT_COLUMNS}) " + AGGREGATE_SQL.format(condition=condition)),
+                params
+            ).rowcount
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        logger.info(f"Сводка пересчитана: {count} строк")
+        return count
+
+    @staticmethod
+    def change_status(db: Session, place_ids: List[int], status: str, period_id: Optional[int] = None) -> int:
+        """
+        Меняет статус мест и переносит их вклад в сводке из строк прежнего статуса
+        в строки нового. Транзакция не фиксируется.
+
+        Args:
+            db: Сессия базы данных
+            place_ids: ID мест
+            status: Новый статус
+            period_id: Период мест, если известен: поиск только в его секции
+
+        Returns:
+            int: Число мест, у которых статус изменился
+        """
+        period_condition = " AND period_id = :period_id" if period_id is not None else ""
+        moved = db.execute(
+            text(
+                "WITH old AS ("
+                "SELECT id, period_id, status FROM cargo_places "
+                f"WHERE id = ANY(:ids) AND status <> :status{period_condition} FOR UPDATE"
+                ") "
+                "UPDATE cargo_places c SET status = :status FROM old "
+                "WHERE c.id = old.id AND c.period_id = old.period_id "
+                "RETURNING c.is_active, c.batch_id, COALESCE(c.client_id, 0) AS client_id, old.status AS old_status, "
+                f"{PLACE_CONTRIBUTION}"
+            ),
+            {'ids': list(place_ids), 'status': status, 'period_id': period_id}
+        ).mappings().all()
+
+        deltas: Dict[Tuple[int, int, str], List[float]] = defaultdict(lambda: [0] * len(ROLLUP_METRICS))
+        for place in moved:
+            if not place['is_active'] or place['batch_id'] is None:
+                continue
+            for old_new, sign in ((place['old_status'], -1), (status, 1)):
+                delta = deltas[(place['batch_id'], place['client_id'], old_new)]
+                for position, name in enumerate(ROLLUP_METRICS):
+                    delta[position] += sign * (place[name] or 0)
+
+        if deltas:
+            RollupService._apply_deltas(db, deltas)
+        return len(moved)
+
+    @staticmethod
+    def _apply_deltas(db: Session, deltas: Dict[Tuple[int, int, str], List[float]]) -> None:
+        """Прибавляет приращения к строкам сводки одним INSERT ... ON CONFLICT DO UPDATE."""
+        keys = list(deltas)
+        params: Dict[str, Any] = {
+            'batch_ids': [key[0] for key in keys],
+            'client_ids': [key[1] for key in keys],
+            'statuses': [key[2] for key in keys],
+        }
+        for position, name in enumerate(ROLLUP_METRICS):
+            params[name] = [deltas[key][position] for key in keys]
+
+        db.execute(
+            text(
+                f"INSERT INTO cargo_rollups ({INSERT_COLUMNS}) "
+                f"SELECT b.period_id, d.batch_id, d.client_id, d.status, {', '.join(f'd.{name}' for name in ROLLUP_METRICS)} "
+                "FROM unnest(CAST(:batch_ids AS INTEGER[]), CAST(:client_ids AS INTEGER[]), "
+                "CAST(:statuses AS VARCHAR[]), CAST(:places AS INTEGER[]), CAST(:composite_places AS INTEGER[]), "
+                "CAST(:boxes AS INTEGER[]), CAST(:weight AS DOUBLE PRECISION[]), "
+                "CAST(:volume AS DOUBLE PRECISION[]), CAST(:amount AS DOUBLE PRECISION[])) "
+                f"AS d(batch_id, client_id, status, {', '.join(ROLLUP_METRICS)}) "
+                "JOIN batches b ON b.id = d.batch_id "
+                "ON CONFLICT (batch_id, client_id, status) DO UPDATE SET "
+                + ", ".join(f"{name} = cargo_rollups.{name} + EXCLUDED.{name}" for name in ROLLUP_METRICS)
+                + ", updated_at = CURRENT_TIMESTAMP"
+            ),
+            params
+        )
+        # Строки, в которых не осталось мест, не нужны (дробные суммы сравниваются
+        # с допуском: после вычитаний в них остается погрешность округления)
+        db.execute(
+            text(
+                "DELETE FROM cargo_rollups WHERE places = 0 AND composite_places = 0 AND boxes = 0 "
+                "AND abs(weight) < 1e-6 AND abs(volume) < 1e-6 AND abs(amount) < 1e-6 "
+                "AND (batch_id, client_id, status) IN ("
+                "SELECT * FROM unnest(CAST(:batch_ids AS INTEGER[]), CAST(:client_ids AS INTEGER[]), "
+                "CAST(:statuses AS VARCHAR[])))"
+            ),
+            {name: params[name] for name in ('batch_ids', 'client_ids', 'statuses')}
+        )
+
+    @staticmethod
+    def get_summary(
+            db: Session,
+            period_id: int,
+            group_by: Optional[str] = None,
+            batch_id: Optional[int] = None,
+            client_id: Optional[int] = None,
+            status: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Сводка периода из cargo_rollups: итог или строки по разрезу.
+
+        Args:
+            db: Сессия базы данных
+            period_id: ID периода
+            group_by: batch, client, status или None для итога по периоду
+            batch_id: Только эта партия
+            client_id: Только этот клиент (0 - места без клиента)
+            status: Только этот статус
+
+        Returns:
+            List[Dict[str, Any]]: Строки с key, label и показателями
+        """
+        conditions = ["r.period_id = :period_id"]
+        params: Dict[str, Any] = {'period_id': period_id}
+        for column, value in (('batch_id', batch_id), ('client_id', client_id), ('status', status)):
+            if value is not None:
+                conditions.append(f"r.{column} = :{column}")
+                params[column] = value
+
+        key, label = ROLLUP_DIMENSIONS[group_by] if group_by else ('NULL', 'NULL')
+        rows = db.execute(
+            text(
+                f"SELECT {key} AS key, {label} AS label, "
+                + ", ".join(f"SUM(r.{name}) AS {name}" for name in ROLLUP_METRICS)
+                + " FROM cargo_rollups r "
+                "LEFT JOIN batches b ON b.id = r.batch_id "
+                "LEFT JOIN clients cl ON cl.id = r.client_id "
+                f"WHERE {' AND '.join(conditions)} "
+                + (f"GROUP BY {key}, {label} ORDER BY {label}" if group_by else "")
+            ),
+            params
+        ).mappings().all()
+
+        result = []
+        for row in rows:
+            item = dict(row)
+            item['weight'] = round(item['weight'] or 0, 2)
+            item['volume'] = round(item['volume'] or 0, 3)
+            item['amount'] = round(item['amount'] or 0, 2)
+            for name in ('places', 'composite_places', 'boxes'):
+                item[name] = item[name] or 0
+            result.append(item)
+        return result
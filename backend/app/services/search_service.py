@@ -0,0 +1,162 @@
+import os
+import logging
+from typing import Dict, List, Any, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.core.pagination import encode_cursor, decode_cursor, InvalidCursorError, CURSOR_NEXT
+
+logger = logging.getLogger('search_service')
+
+# Сколько совпадений берет каждая ветка поиска до ранжирования: ограничивает
+# работу для запросов, под которые попадает большая часть таблицы. Ветка
+# берет лучшие по своей оценке совпадения, а не произвольные
+SEARCH_CANDIDATES_LIMIT = int(os.getenv("SEARCH_CANDIDATES_LIMIT", 2000))
+
+# Ветки поиска мест, каждая идет по своему индексу:
+# полнотекстовый (search_vector), триграммный (подстрока, префикс, опечатки
+# в номере) и через найденных клиентов и получателей
+SEARCH_SQL = """
+    WITH query AS (
+        SELECT websearch_to_tsquery('russian', :q) || websearch_to_tsquery('simple', :q) AS tsq
+    ), clients_found AS (
+        SELECT id, GREATEST(similarity(name, :q), similarity(code, :q),
+                            CASE WHEN code ILIKE :prefix THEN 1 ELSE 0 END) AS rank
+        FROM clients
+        WHERE name % :q OR code % :q OR name ILIKE :pattern OR code ILIKE :prefix
+        ORDER BY rank DESC
+        LIMIT :candidates
+    ), recipients_found AS (
+        SELECT id, GREATEST(similarity(name, :q), CASE WHEN name ILIKE :prefix THEN 1 ELSE 0 END) AS rank
+        FROM recipients
+        WHERE name % :q OR name ILIKE :pattern
+        ORDER BY rank DESC
+        LIMIT :candidates
+    ), candidates AS (
+        (SELECT c.id, c.period_id FROM cargo_places c, query
+         WHERE c.search_vector @@ query.tsq AND {filters}
+         ORDER BY ts_rank(c.search_vector, query.tsq) DESC LIMIT :candidates)
+        UNION
+        (SELECT c.id, c.period_id FROM cargo_places c
+         WHERE (c.tracking_number ILIKE :pattern OR c.client_code ILIKE :pattern OR c.tracking_number % :q
+                OR c.description ILIKE :pattern OR c.description_original ILIKE :pattern)
+           AND {filters}
+         ORDER BY GREATEST(similarity(c.tracking_number, :q),
+                           CASE WHEN c.tracking_number ILIKE :prefix OR c.client_code ILIKE :prefix THEN 1 ELSE 0 END,
+                           word_similarity(:q, coalesce(c.description, ''))) DESC
+         LIMIT :candidates)
+        UNION
+        (SELECT c.id, c.period_id FROM cargo_places c JOIN clients_found f ON f.id = c.client_id
+         WHERE {filters} ORDER BY f.rank DESC LIMIT :candidates)
+        UNION
+        (SELECT c.id, c.period_id FROM cargo_places c JOIN recipients_found f ON f.id = c.recipient_id
+         WHERE {filters} ORDER BY f.rank DESC LIMIT :candidates)
+    ), ranked AS (
+        SELECT c.id, c.period_id, c.tracking_number, c.batch_id, b.batch_number,
+               c.client_id, c.client_code, cl.name AS client_name, r.name AS recipient_name,
+               c.status, c.description, c.description_original, c.notes,
+               c.weight, c.volume, c.is_active,
+               CAST(GREATEST(
+                   ts_rank(c.search_vector, query.tsq),
+                   similarity(c.tracking_number, :q),
+                   CASE WHEN c.tracking_number ILIKE :prefix OR c.client_code ILIKE :prefix THEN 1 ELSE 0 END,
+                   word_similarity(:q, coalesce(c.description, '')),
+                   coalesce(cf.rank, 0),
+                   coalesce(rf.rank, 0)
+               ) AS REAL) AS rank
+        FROM candidates
+        JOIN cargo_places c ON c.id = candidates.id AND c.period_id = candidates.period_id
+        CROSS JOIN query
+        LEFT JOIN batches b ON b.id = c.batch_id
+        LEFT JOIN clients cl ON cl.id = c.client_id
+        LEFT JOIN recipients r ON r.id = c.recipient_id
+        LEFT JOIN clients_found cf ON cf.id = c.client_id
+        LEFT JOIN recipients_found rf ON rf.id = c.recipient_id
+    )
+    SELECT * FROM ranked
+    {after}
+    ORDER BY rank DESC, period_id DESC, id DESC
+    LIMIT :limit
+"""
+
+
+def _like_escape(value: str) -> str:
+    """Экранирует спецсимволы LIKE в строке запроса."""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class SearchService:
+    """
+    Поиск мест по номеру отслеживания, коду и названию клиента, получателю,
+    наименованию (переведенному и исходному) и примечаниям.
+
+    Запрос выполняется в базе по индексам: GIN по вычисляемому столбцу
+    cargo_places.search_vector (полнотекстовый поиск с русской морфологией)
+    и триграммным индексам pg_trgm (подстроки, префиксы номеров и кодов,
+    опечатки). Найденные места ранжируются, страницы выдаются по курсору.
+    """
+
+    @staticmethod
+    def search_cargo(
+            db: Session,
+            q: str,
+            limit: int = 50,
+            cursor: Optional[str] = None,
+            period_id: Optional[int] = None,
+            status: Optional[str] = None,
+            include_inactive: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Ищет места и возвращает страницу по убыванию релевантности.
+
+        Args:
+            db: Сессия базы данных
+            q: Строка поиска (синтаксис websearch: "фраза", -исключение, or)
+            limit: Размер страницы
+            cursor: Курсор next_cursor предыдущей страницы
+            period_id: Только места периода (поиск идет в одной секции)
+            status: Только места с этим статусом
+            include_inactive: Искать и среди неактивных мест
+
+        Returns:
+            Dict[str, Any]: items, next_cursor, prev_cursor и limit
+
+        Raises:
+            InvalidCursorError: Курсор поврежден
+        """
+        q = q.strip()
+        escaped = _like_escape(q)
+        params: Dict[str, Any] = {
+            'q': q,
+            'pattern': f"%{escaped}%",
+            'prefix': f"{escaped}%",
+            'candidates': SEARCH_CANDIDATES_LIMIT,
+            'limit': limit + 1,
+        }
+
+        filters = ["TRUE" if include_inactive else "c.is_active"]
+        if period_id is not None:
+            filters.append("c.period_id = :period_id")
+            params['period_id'] = period_id
+        if status is not None:
+            filters.append("c.status = :status")
+            params['status'] = status
+
+        after = ""
+        if cursor:
+            key, direction = decode_cursor(cursor)
+            if direction != CURSOR_NEXT or len(key) != 3:
+                raise InvalidCursorError("Курсор выдан для другого списка")
+            after = "WHERE (rank, period_id, id) < (CAST(:after_rank AS REAL), :after_period_id, :after_id)"
+            params.update(after_rank=key[0], after_period_id=key[1], after_id=key[2])
+
+        rows = db.execute(
+            text(SEARCH_SQL.format(filters=" AND ".join(filters), after=after)),
+            params
+        ).mappings().all()
+
+        items: List[Dict[str, Any]] = [dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = items[-1]
+            next_cursor = encode_cursor([last['rank'], last['period_id'], last['id']], CURSOR_NEXT)
+        return {'items': items, 'next_cursor': next_cursor, 'prev_cursor': None, 'limit': limit}
@@ -0,0 +1,319 @@
+import os
+import re
+import math
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from app.core.database import SessionLocal
+
+logger = logging.getLogger('tracking_lookup')
+
+# Размер и время жизни кэша мест по номеру отслеживания. Время жизни
+# ограничивает устаревание, если место изменили в другом процессе
+TRACKING_CACHE_SIZE = int(os.getenv("TRACKING_CACHE_SIZE", 100000))
+TRACKING_CACHE_TTL = float(os.getenv("TRACKING_CACHE_TTL", 60))
+# Время жизни записи "номера нет в базе" (с): повторные запросы несуществующего
+# номера, прошедшего фильтр, не идут в базу
+TRACKING_NEGATIVE_TTL = float(os.getenv("TRACKING_NEGATIVE_TTL", 5))
+# Фильтр Блума номеров: доля ложных срабатываний, интервал перестроения (с)
+# и запас емкости на номера, добавленные между перестроениями
+TRACKING_BLOOM_ERROR_RATE = float(os.getenv("TRACKING_BLOOM_ERROR_RATE", 0.001))
+TRACKING_BLOOM_REBUILD_INTERVAL = float(os.getenv("TRACKING_BLOOM_REBUILD_INTERVAL", 3600))
+# Пауза перед повторной попыткой построить фильтр после ошибки (с)
+TRACKING_BLOOM_RETRY_INTERVAL = float(os.getenv("TRACKING_BLOOM_RETRY_INTERVAL", 60))
+TRACKING_BLOOM_HEADROOM = float(os.getenv("TRACKING_BLOOM_HEADROOM", 1.5))
+TRACKING_BLOOM_MIN_CAPACITY = 100000
+
+TRACKING_NUMBER_PATTERN = re.compile(r'^[A-Z]{3}-[0-9]{6}-[0-9]{2}$')
+
+# Место по номеру; номер уникален в периоде, при повторе берется последний период
+LOOKUP_SQL = """
+    SELECT c.id, c.period_id, c.tracking_number, c.batch_id, b.batch_number,
+           c.client_id, c.client_code, cl.name AS client_name, c.recipient_id, r.name AS recipient_name,
+           c.status, c.priority, c.weight, c.volume, c.places_count, c.boxes_count,
+           c.departure_date, c.estimated_arrival_date, c.actual_arrival_date,
+           c.description, c.is_paid, c.is_delivered, c.is_active, FALSE AS archived
+    FROM cargo_places c
+    LEFT JOIN batches b ON b.id = c.batch_id
+    LEFT JOIN clients cl ON cl.id = c.client_id
+    LEFT JOIN recipients r ON r.id = c.recipient_id
+    WHERE c.tracking_number = :tracking_number
+    ORDER BY c.period_id DESC
+    LIMIT 1
+"""
+
+# Место архивного периода по индексу archived_cargo_places (см. ArchiveService)
+ARCHIVE_LOOKUP_SQL = """
+    SELECT a.place_id AS id, a.period_id, a.tracking_number, a.batch_id, b.batch_number,
+           a.client_code, a.status, a.is_active, TRUE AS archived
+    FROM archived_cargo_places a
+    LEFT JOIN batches b ON b.id = a.batch_id
+    WHERE a.tracking_number = :tracking_number
+    ORDER BY a.period_id DESC
+    LIMIT 1
+"""
+
+
+def normalize_tracking_number(value: Optional[str]) -> Optional[str]:
+    """Приводит номер отслеживания к формату XXX-000000-00; None, если номер туда не подходит."""
+    if not isinstance(value, str):
+        return None
+    value = value.strip().upper()
+    return value if TRACKING_NUMBER_PATTERN.match(value) else None
+
+
+class BloomFilter:
+    """
+    Фильтр Блума для строк: ответ "нет" точный, ответ "возможно" ошибается
+    с долей error_rate, пока в фильтре не больше capacity строк.
+    Позиции битов - двойное хэширование одного blake2b, поэтому фильтр
+    одинаков во всех процессах.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = TRACKING_BLOOM_ERROR_RATE):
+        self.capacity = max(int(capacity), 1)
+        self.size = max(int(-self.capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(round(self.size / self.capacity * math.log(2)), 1)
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: str) -> Iterable[int]:
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, value: str) -> None:
+        for position in self._positions(value):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value: str) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class TrackingLookup:
+    """
+    Поиск места по номеру отслеживания с кэшем процесса.
+
+    Номер проверяется по формату, затем по кэшу недавно найденных мест
+    (LRU на TRACKING_CACHE_SIZE мест) и по фильтру Блума всех номеров:
+    неверные и несуществующие номера отклоняются без запроса к базе.
+    Фильтр строится одним проходом по номерам в фоновом потоке, перестраивается
+    раз в TRACKING_BLOOM_REBUILD_INTERVAL секунд (или при переполнении),
+    после ошибки - не чаще раза в TRACKING_BLOOM_RETRY_INTERVAL секунд,
+    и пополняется при записи партий (add). Фильтр у каждого процесса свой:
+    номер, записанный другим процессом, находится после ближайшего
+    перестроения. Ответу "нет" устаревшего фильтра не доверяют, пока фильтр
+    не построен или не перестроен, номера ищутся в базе.
+
+    Номера, которых не нашлось в базе, запоминаются на TRACKING_NEGATIVE_TTL
+    секунд: повтор запроса такого номера (ложное срабатывание фильтра или
+    фильтр не построен) не идет в базу.
+
+    Номера мест архивных периодов ищутся по archived_cargo_places, если
+    места нет в cargo_places.
+
+    Места удаляются из кэша при изменении (invalidate, invalidate_places,
+    clear_after_commit).
+    """
+
+    def __init__(
+            self,
+            session_factory: Callable[[], Session] = SessionLocal,
+            max_size: int = TRACKING_CACHE_SIZE,
+            ttl: float = TRACKING_CACHE_TTL
+    ):
+        self.session_factory = session_factory
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._numbers_by_id: Dict[int, str] = {}
+        # Номера, которых нет в базе, и время проверки
+        self._missing: "OrderedDict[str, float]" = OrderedDict()
+        # Счетчик изменений: место, прочитанное до изменения, не попадает в кэш
+        self._generation = 0
+        self._bloom: Optional[BloomFilter] = None
+        self._bloom_built_at = 0.0
+        # Время последнего запуска перестроения: после ошибки следующее ждет паузу
+        self._rebuild_started_at: Optional[float] = None
+        # Номера, добавленные во время перестроения фильтра (None - перестроения нет)
+        self._pending: Optional[List[str]] = None
+        self._lock = threading.Lock()
+
+    def get_cached(self, tracking_number: str) -> Optional[Dict[str, Any]]:
+        """Место из кэша; None, если его там нет или запись устарела."""
+        with self._lock:
+            item = self._items.get(tracking_number)
+            if item is None:
+                return None
+            if time.monotonic() - item[1] > self.ttl:
+                self._forget(tracking_number)
+                return None
+            self._items.move_to_end(tracking_number)
+            return item[0]
+
+    def might_exist(self, tracking_number: str) -> bool:
+        """
+        Проверка без запроса к базе: False - номера точно нет (по фильтру Блума
+        или недавней проверке в базе).
+        Запускает перестроение фильтра, если он не построен или устарел.
+        """
+        bloom = self._bloom
+        now = time.monotonic()
+        fresh = (
+                bloom is not None
+                and now - self._bloom_built_at <= TRACKING_BLOOM_REBUILD_INTERVAL
+                and bloom.count <= bloom.capacity
+        )
+        if not fresh and (
+                self._rebuild_started_at is None
+                or now - self._rebuild_started_at > TRACKING_BLOOM_RETRY_INTERVAL
+        ):
+            self.schedule_rebuild()
+        if fresh and tracking_number not in bloom:
+            return False
+        with self._lock:
+            checked_at = self._missing.get(tracking_number)
+            if checked_at is None:
+                return True
+            if now - checked_at > TRACKING_NEGATIVE_TTL:
+                del self._missing[tracking_number]
+                return True
+            return False
+
+    def load(self, db: Session, tracking_number: str) -> Optional[Dict[str, Any]]:
+        """Читает место из базы и запоминает его в кэше."""
+        generation = self._generation
+        params = {'tracking_number': tracking_number}
+        row = db.execute(text(LOOKUP_SQL), params).mappings().first()
+        if row is None:
+            row = db.execute(text(ARCHIVE_LOOKUP_SQL), params).mappings().first()
+        if row is None:
+            with self._lock:
+                if generation == self._generation:
+                    self._missing[tracking_number] = time.monotonic()
+                    self._missing.move_to_end(tracking_number)
+                    while len(self._missing) > self.max_size:
+                        self._missing.popitem(last=False)
+            return None
+        record = dict(row)
+        with self._lock:
+            if generation == self._generation:
+                self._items[tracking_number] = (record, time.monotonic())
+                self._items.move_to_end(tracking_number)
+                self._numbers_by_id[record['id']] = tracking_number
+                while len(self._items) > self.max_size:
+                    self._forget(next(iter(self._items)))
+        return record
+
+    def add(self, tracking_numbers: Iterable[str]) -> None:
+        """Добавляет в фильтр номера записанных (зафиксированных) мест."""
+        tracking_numbers = list(tracking_numbers)
+        with self._lock:
+            self._generation += 1
+            for tracking_number in tracking_numbers:
+                self._missing.pop(tracking_number, None)
+            if self._bloom is not None:
+                for tracking_number in tracking_numbers:
+                    self._bloom.add(tracking_number)
+            if self._pending is not None:
+                self._pending.extend(tracking_numbers)
+
+    def invalidate(self, *tracking_numbers: str) -> None:
+        """Удаляет места из кэша по номерам."""
+        with self._lock:
+            self._generation += 1
+            for tracking_number in tracking_numbers:
+                self._forget(tracking_number)
+
+    def invalidate_places(self, place_ids: Iterable[int]) -> None:
+        """Удаляет места из кэша по ID (например, при смене статуса)."""
+        with self._lock:
+            self._generation += 1
+            for place_id in place_ids:
+                tracking_number = self._numbers_by_id.get(place_id)
+                if tracking_number is not None:
+                    self._forget(tracking_number)
+
+    def clear(self) -> None:
+        """Очищает кэш мест (при удалении и переносе партий); фильтр не меняется."""
+        with self._lock:
+            self._generation += 1
+            self._items.clear()
+            self._numbers_by_id.clear()
+            self._missing.clear()
+
+    def clear_after_commit(self, db: Session) -> None:
+        """
+        Очищает кэш мест после фиксации текущей транзакции сессии. Очистка до
+        фиксации не помогает: место, прочитанное в промежутке, вернулось бы
+        в кэш со старыми данными.
+        """
+        event.listen(db, 'after_commit', lambda session: self.clear(), once=True)
+
+    def _forget(self, tracking_number: str) -> None:
+        item = self._items.pop(tracking_number, None)
+        if item is not None:
+            self._numbers_by_id.pop(item[0]['id'], None)
+
+    def schedule_rebuild(self) -> None:
+        """Запускает перестроение фильтра в фоновом потоке, если оно еще не идет."""
+        with self._lock:
+            if self._pending is not None:
+                return
+            self._pending = []
+            self._rebuild_started_at = time.monotonic()
+        threading.Thread(target=self._rebuild, name="tracking-bloom", daemon=True).start()
+
+    def rebuild(self) -> None:
+        """Перестраивает фильтр в текущем потоке."""
+        with self._lock:
+            if self._pending is not None:
+                return
+            self._pending = []
+            self._rebuild_started_at = time.monotonic()
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        started = time.perf_counter()
+        try:
+            db = self.session_factory()
+            try:
+                count = db.execute(
+                    text("SELECT (SELECT count(*) FROM cargo_places) + (SELECT count(*) FROM archived_cargo_places)")
+                ).scalar()
+                bloom = BloomFilter(max(int(count * TRACKING_BLOOM_HEADROOM), TRACKING_BLOOM_MIN_CAPACITY))
+                for table in ('cargo_places', 'archived_cargo_places'):
+                    result = db.execute(
+                        text(f"SELECT tracking_number FROM {table}").execution_options(yield_per=10000)
+                    )
+                    for tracking_numbers in result.scalars().partitions():
+                        for tracking_number in tracking_numbers:
+                            bloom.add(tracking_number)
+            finally:
+                db.close()
+
+            with self._lock:
+                for tracking_number in self._pending:
+                    bloom.add(tracking_number)
+                self._bloom, self._bloom_built_at = bloom, time.monotonic()
+            logger.info(
+                f"Фильтр номеров построен за {time.perf_counter() - started:.3f} с: "
+                f"{bloom.count} номеров, {bloom.size // 8192} КБ"
+            )
+        except Exception:
+            # Проверка повторит попытку через TRACKING_BLOOM_RETRY_INTERVAL; до тех
+            # пор работает прежний фильтр
+            logger.exception("Не удалось построить фильтр номеров")
+        finally:
+            with self._lock:
+                self._pending = None
+
+
+tracking_lookup = TrackingLookup()
@@ -2,13 +2,15 @@ import re
 import sys
 import os
 import logging
+import threading
+from collections import OrderedDict
 import pandas as pd
 import openpyxl
 from openpyxl.utils import get_column_letter
 from openpyxl.cell.cell import MergedCell
 from fuzzywuzzy import fuzz
 from tabulate import tabulate
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Union, BinaryIO, Iterator, Callable
 from deep_translator import GoogleTranslator
 
 # Настройка логирования
@@ -19,6 +21,129 @@ logging.basicConfig(
 )
 logger = logging.getLogger('excel_parser')
 
+# Версия правил разбора. Увеличивается при любом изменении, влияющем на результат
+# парсинга (шаблоны заголовков, эвристики, формат записей), чтобы сбросить
+# закэшированные результаты.
+PARSER_VERSION = "1.1"
+
+
+class TranslationCache:
+    """
+    Ограниченный кэш переводов, общий для всех парсеров процесса.
+    Наименования товаров в балансах сильно повторяются, поэтому кэш
+    избавляет от большинства обращений к сервису перевода.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, text: str) -> Optional[str]:
+        with self._lock:
+            translated = self._items.get(text)
+            if translated is not None:
+                self._items.move_to_end(text)
+            return translated
+
+    def set(self, text: str, translated: str) -> None:
+        with self._lock:
+            self._items[text] = translated
+            self._items.move_to_end(text)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+
+translation_cache = TranslationCache(int(os.getenv("PARSER_TRANSLATION_CACHE_SIZE", 10000)))
+
+
+class BatchSummaryAccumulator:
+    """
+    Рассчитывает сводную информацию по партии по мере разбора строк.
+    Учитывает все значения в сборных местах при подсчете коробок, веса, объема и суммы.
+    """
+
+    def __init__(self):
+        self.total_places = 0
+        self.total_composite_places = 0
+        self.total_boxes = 0
+        self.total_weight = 0
+        self.total_volume = 0
+        self.total_amount = 0
+
+        # Множество для отслеживания уникальных числовых частей кодов клиентов
+        self.unique_client_numeric_codes = set()
+
+        # Множество для отслеживания уже учтенных групп сборных мест
+        self.counted_composite_groups = set()
+
+    def add(self, item: Dict[str, Any]) -> None:
+        """
+        Учитывает запись в сводной информации.
+
+        Args:
+            item: Данные одной строки
+        """
+        client_numeric_code = item.get('clientCodeNumeric')
+
+        # Добавляем числовую часть кода клиента в множество уникальных клиентов
+        if client_numeric_code:
+            self.unique_client_numeric_codes.add(client_numeric_code)
+
+        # Проверяем, является ли это сборным местом
+        is_composite = item.get('isCompositeCargo', False)
+        composite_group_id = item.get('compositeGroupId')
+
+        # Для сборных мест считаем место только один раз
+        if is_composite and composite_group_id:
+            if composite_group_id not in self.counted_composite_groups:
+                self.total_places += 1
+                self.total_composite_places += 1
+                self.counted_composite_groups.add(composite_group_id)
+        else:
+            # Для обычных мест просто добавляем количество мест
+            places_count = item.get('placesCount', 0) or 0
+            self.total_places += places_count
+
+        # Для всех остальных показателей учитываем значения из каждой строки
+        # независимо от того, сборное это место или нет
+
+        # Считаем коробки
+        boxes_count = item.get('boxesCount', 0) or 0
+        self.total_boxes += boxes_count
+
+        # Считаем вес
+        weight = item.get('weight', 0)
+        if weight is not None and isinstance(weight, (int, float)):
+            self.total_weight += weight
+
+        # Считаем объем
+        volume = item.get('volume', 0)
+        if volume is not None and isinstance(volume, (int, float)):
+            self.total_volume += volume
+
+        # Считаем общую сумму
+        amount = item.get('total', 0)
+        if amount is not None and isinstance(amount, (int, float)):
+            self.total_amount += amount
+
+    def result(self) -> Dict[str, Any]:
+        """
+        Возвращает сводную информацию по учтенным записям.
+
+        Returns:
+            Dict[str, Any]: Словарь со сводной информацией
+        """
+        return {
+            'total_places': self.total_places,
+            'total_composite_places': self.total_composite_places,
+            'total_boxes': self.total_boxes,
+            'total_weight': round(self.total_weight, 2),
+            'total_volume': round(self.total_volume, 3),
+            'total_amount': round(self.total_amount, 2),
+            'unique_clients': len(self.unique_client_numeric_codes)
+        }
+
 
 class CargoExcelParser:
     """
@@ -26,8 +151,29 @@ class CargoExcelParser:
     Использует pandas, fuzzywuzzy и другие библиотеки для более эффективного анализа.
     """
 
-    def __init__(self, file_path: str, period_id: str = "unknown"):
-        self.file_path = file_path
+    def __init__(
+            self,
+            source: Union[str, BinaryIO],
+            period_id: str = "unknown",
+            progress_callback: Optional[Callable[[str, Dict[str, Any]], None]] = None
+    ):
+        """
+        Args:
+            source: Путь к Excel файлу или открытый бинарный файловый объект
+                (в том числе SpooledTemporaryFile или mmap) с поддержкой seek
+            period_id: ID текущего периода
+            progress_callback: Функция, получающая события хода парсинга
+                (тип события и данные). Вызывается на каждую строку, поэтому
+                прореживание событий остается на стороне получателя.
+        """
+        self.source = source
+        if isinstance(source, str):
+            self.file_path = source
+        else:
+            # Имя файлового объекта - путь только если это строка: у SpooledTemporaryFile
+            # после сброса на диск name - это дескриптор (int) или None
+            name = getattr(source, 'name', None)
+            self.file_path = name if isinstance(name, str) else '<поток>'
         self.period_id = period_id
         self.workbook = None
         self.sheet = None
@@ -39,6 +185,9 @@ class CargoExcelParser:
         self.column_mapping = {}
         self.parsed_data = []
         self.batch_summary = {}  # Добавляем поле для хранения сводной информации
+        self.progress_callback = progress_callback
+        self.translation_hits = 0
+        self.translation_misses = 0
 
         # Словарь для нечеткого сопоставления заголовков столбцов
         self.column_patterns = {
@@ -66,54 +215,142 @@ class CargoExcelParser:
         Returns:
             List[Dict[str, Any]]: Список словарей с данными о грузах
         """
+        try:
+            if not self.prepare():
+                return []
+
+            # Парсим данные строк, попутно рассчитывая сводную информацию по партии
+            for _ in self.iter_rows():
+                pass
+
+            logger.info(f"Парсинг завершен. Найдено {len(self.parsed_data)} записей.")
+
+            # Выводим результаты в консоль
+            self._print_results()
+
+            return self.parsed_data
+
+        except Exception as e:
+            logger.error(f"Ошибка при парсинге файла: {str(e)}")
+            import traceback
+            logger.error(traceback.format_exc())
+            return []
+
+    def prepare(self) -> bool:
+        """
+        Загружает файл и определяет структуру листа: номер партии,
+        диапазон строк с данными и соответствие столбцов.
+        После успешной подготовки строки можно получать через iter_rows.
+
+        Returns:
+            bool: True, если структура листа распознана
+        """
         try:
             logger.info(f"Начинаем парсинг файла: {self.file_path}")
+            self._emit('phase', phase='loading')
 
             # Пробуем сначала загрузить через pandas для предварительного анализа
             try:
-                self.df = pd.read_excel(self.file_path, header=None)
+                self.df = pd.read_excel(self._rewind_source(), header=None)
                 logger.info(f"Файл успешно загружен через pandas. Размер: {self.df.shape}")
             except Exception as e:
                 logger.warning(f"Не удалось загрузить файл через pandas: {e}. Используем openpyxl.")
+                self._emit('warning', message=f"Не удалось загрузить файл через pandas: {e}")
                 self.df = None
 
             # Загружаем Excel файл через openpyxl для доступа к объединенным ячейкам
-            self.workbook = openpyxl.load_workbook(self.file_path, data_only=True)
+            self.workbook = openpyxl.load_workbook(self._rewind_source(), data_only=True)
             self.sheet = self.workbook.active
 
             # Находим номер партии (баланса)
             self._find_batch_number()
             if not self.batch_number:
                 logger.error("Номер партии (баланса) не найден. Парсинг прерван.")
-                return []
+                return False
 
             # Находим диапазон данных
             self._find_data_range()
             if not self.data_start_row:
                 logger.error("Не удалось определить начало данных. Парсинг прерван.")
-                return []
+                return False
 
             # Определяем соответствие столбцов
             self._map_columns()
 
-            # Парсим данные строк
-            self._parse_data_rows()
+            # DataFrame нужен только для поиска структуры, дальше работаем с openpyxl
+            self.df = None
+            self._emit('phase', phase='structure', batchNumber=self.batch_number,
+                       rowsTotal=self.data_end_row - self.data_start_row + 1)
+            return True
 
-            # Рассчитываем сводную информацию по партии
-            self.batch_summary = self._calculate_batch_summary()
+        except Exception as e:
+            logger.error(f"Ошибка при подготовке файла к парсингу: {str(e)}")
+            import traceback
+            logger.error(traceback.format_exc())
+            return False
 
-            logger.info(f"Парсинг завершен. Найдено {len(self.parsed_data)} записей.")
+    def get_layout(self) -> Dict[str, Any]:
+        """
+        Возвращает распознанную структуру листа.
 
-            # Выводим результаты в консоль
-            self._print_results()
+        Returns:
+            Dict[str, Any]: Диапазон строк с данными и соответствие столбцов
+        """
+        return {
+            'dataStartRow': self.data_start_row,
+            'dataEndRow': self.data_end_row,
+            'columns': dict(self.column_mapping)
+        }
 
-            return self.parsed_data
+    def _emit(self, event: str, **data) -> None:
+        """
+        Передает событие хода парсинга в progress_callback.
+        Ошибки получателя не должны прерывать парсинг.
 
+        Args:
+            event: Тип события (phase, rows, warning)
+            **data: Данные события
+        """
+        if self.progress_callback is None:
+            return
+        try:
+            self.progress_callback(event, data)
         except Exception as e:
-            logger.error(f"Ошибка при парсинге файла: {str(e)}")
-            import traceback
-            logger.error(traceback.format_exc())
-            return []
+            logger.warning(f"Ошибка при передаче события парсинга: {e}")
+
+    def _translate(self, value: str) -> str:
+        """
+        Переводит текст с китайского на русский с использованием общего кэша.
+
+        Args:
+            value: Исходный текст
+
+        Returns:
+            str: Переведенный текст
+        """
+        translated = translation_cache.get(value)
+        if translated is not None:
+            self.translation_hits += 1
+            return translated
+
+        self.translation_misses += 1
+        translated = GoogleTranslator(source='zh-TW', target='ru').translate(value)
+        if translated is not None:
+            translation_cache.set(value, translated)
+        return translated
+
+    def _rewind_source(self) -> Union[str, BinaryIO]:
+        """
+        Возвращает источник данных, готовый к повторному чтению.
+        Файловый объект читается дважды (pandas и openpyxl), поэтому перед
+        каждым чтением его позиция сбрасывается в начало.
+
+        Returns:
+            Union[str, BinaryIO]: Путь к файлу или файловый объект
+        """
+        if not isinstance(self.source, str):
+            self.source.seek(0)
+        return self.source
 
     def _find_batch_number(self) -> None:
         """
@@ -520,14 +757,27 @@ class CargoExcelParser:
         # Если не нашли, возвращаем последний столбец
         return max_col
 
-    def _parse_data_rows(self) -> None:
+    def iter_rows(self, collect: bool = True) -> Iterator[Dict[str, Any]]:
         """
-        Парсит данные из строк Excel файла.
+        Парсит данные из строк Excel файла и отдает их по мере разбора.
         Обрабатывает объединенные ячейки и сборные места.
+        По завершении итерации в batch_summary записывается сводная информация.
+
+        Args:
+            collect: Сохранять ли строки в parsed_data. При потоковой отдаче
+                результата сохранять их не нужно.
+
+        Yields:
+            Dict[str, Any]: Данные одной строки
         """
+        summary = BatchSummaryAccumulator()
         if not self.data_start_row or not self.data_end_row:
+            self.batch_summary = summary.result()
             return
 
+        rows_total = self.data_end_row - self.data_start_row + 1
+        self._emit('phase', phase='rows')
+
         # Определяем объединенные ячейки для обработки сборных мест
         merged_ranges = self.sheet.merged_cells.ranges
         merged_cells_map = {}
@@ -744,14 +994,18 @@ class CargoExcelParser:
                         row_data[field] = None
                         continue
 
+                    # Исходное наименование сохраняется для поиска по тексту баланса
+                    row_data['productNameOriginal'] = value
+
                     # Всегда переводим с китайского на русский
                     if isinstance(value, str) and len(value.strip()) > 0:
                         try:
-                            translated_value = GoogleTranslator(source='zh-TW', target='ru').translate(value)
+                            translated_value = self._translate(value)
                             row_data[field] = translated_value
                             logger.info(f"Переведено с китайского на русский: '{value}' -> '{translated_value}'")
                         except Exception as e:
                             logger.warning(f"Ошибка перевода с китайского: {e}")
+                            self._emit('warning', message=f"Строка {row}: ошибка перевода наименования")
                             row_data[field] = value
                     else:
                         row_data[field] = value
@@ -780,10 +1034,11 @@ class CargoExcelParser:
                             # Если не удалось извлечь число, пробуем перевести и извлечь
                             try:
                                 # Всегда переводим с китайского
-                                translated_text = GoogleTranslator(source='zh-TW', target='ru').translate(value)
+                                translated_text = self._translate(value)
                                 row_data[field] = translated_text
                             except Exception as e:
                                 logger.warning(f"Ошибка перевода: {e}")
+                                self._emit('warning', message=f"Строка {row}: ошибка перевода итоговой суммы")
                                 row_data[field] = value
                     elif value is not None:
                         try:
@@ -795,99 +1050,18 @@ class CargoExcelParser:
 
             # Проверяем, что у нас есть хотя бы код клиента
             if row_data.get('clientCode'):
-                self.parsed_data.append(row_data)
+                if collect:
+                    self.parsed_data.append(row_data)
+                summary.add(row_data)
+                yield row_data
             else:
                 logger.warning(f"Пропущена строка {row}: отсутствует код клиента")
+                self._emit('warning', message=f"Пропущена строка {row}: отсутствует код клиента")
 
-    def _calculate_batch_summary(self) -> Dict[str, Any]:
-        """
-        Рассчитывает сводную информацию по партии.
-        Учитывает все значения в сборных местах при подсчете коробок, веса, объема и суммы.
-
-        Returns:
-            Dict[str, Any]: Словарь со сводной информацией
-        """
-        if not self.parsed_data:
-            return {
-                'total_places': 0,
-                'total_composite_places': 0,
-                'total_boxes': 0,
-                'total_weight': 0,
-                'total_volume': 0,
-                'total_amount': 0,
-                'unique_clients': 0
-            }
-
-        # Инициализируем счетчики
-        total_places = 0
-        total_composite_places = 0
-        total_boxes = 0
-        total_weight = 0
-        total_volume = 0
-        total_amount = 0
-
-        # Множество для отслеживания уникальных числовых частей кодов клиентов
-        unique_client_numeric_codes = set()
-
-        # Множество для отслеживания уже учтенных групп сборных мест
-        counted_composite_groups = set()
-
-        # Обрабатываем каждую запись
-        for item in self.parsed_data:
-            client_code = item.get('clientCode')
-            client_numeric_code = item.get('clientCodeNumeric')
-
-            # Добавляем числовую часть кода клиента в множество уникальных клиентов
-            if client_numeric_code:
-                unique_client_numeric_codes.add(client_numeric_code)
-
-            # Проверяем, является ли это сборным местом
-            is_composite = item.get('isCompositeCargo', False)
-            composite_group_id = item.get('compositeGroupId')
-
-            # Для сборных мест считаем место только один раз
-            if is_composite and composite_group_id:
-                if composite_group_id not in counted_composite_groups:
-                    total_places += 1
-                    total_composite_places += 1
-                    counted_composite_groups.add(composite_group_id)
-            else:
-                # Для обычных мест просто добавляем количество мест
-                places_count = item.get('placesCount', 0) or 0
-                total_places += places_count
+            self._emit('rows', parsed=row - self.data_start_row + 1, total=rows_total,
+                       translationHits=self.translation_hits, translationMisses=self.translation_misses)
 
-            # Для всех остальных показателей учитываем значения из каждой строки
-            # независимо от того, сборное это место или нет
-
-            # Считаем коробки
-            boxes_count = item.get('boxesCount', 0) or 0
-            total_boxes += boxes_count
-
-            # Считаем вес
-            weight = item.get('weight', 0)
-            if weight is not None and isinstance(weight, (int, float)):
-                total_weight += weight
-
-            # Считаем объем
-            volume = item.get('volume', 0)
-            if volume is not None and isinstance(volume, (int, float)):
-                total_volume += volume
-
-            # Считаем общую сумму
-            amount = item.get('total', 0)
-            if amount is not None and isinstance(amount, (int, float)):
-                total_amount += amount
-
-        # Формируем и возвращаем результат
-        return {
-            'total_places': total_places,
-            'total_composite_places': total_composite_places,
-            'total_boxes': total_boxes,
-            'total_weight': round(total_weight, 2),
-            'total_volume': round(total_volume, 3),
-            'total_amount': round(total_amount, 2),
-            'unique_clients': len(unique_client_numeric_codes)
-        }
+        self.batch_summary = summary.result()
 
     def _print_results(self) -> None:
         """
@@ -0,0 +1,50 @@
+"""
+Перенос закрытого периода в архив и возврат из архива.
+
+Запуск из каталога backend:
+    python -m scripts.archive_period archive ID [--force]
+    python -m scripts.archive_period rehydrate ID
+
+Места периода выгружаются в сжатый файл в ARCHIVE_DIR (переменная окружения
+обязательна, каталог должен быть постоянным), секция периода
+удаляется; номера мест по-прежнему находятся поиском по номеру.
+Возврат загружает места из файла обратно в новую секцию.
+"""
+import sys
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.database import SessionLocal
+from app.services.archive_service import ArchiveService, ArchiveError, archive_path
+
+
+def main() -> int:
+    arg_parser = argparse.ArgumentParser(description="Архив закрытых периодов")
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+    archive_parser = commands.add_parser('archive', help="Перенести период в архив")
+    archive_parser.add_argument('period_id', type=int, help="ID периода")
+    archive_parser.add_argument('--force', action='store_true', help="Архивировать и период текущего года")
+    rehydrate_parser = commands.add_parser('rehydrate', help="Вернуть период из архива")
+    rehydrate_parser.add_argument('period_id', type=int, help="ID периода")
+    args = arg_parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.command == 'archive':
+            count = ArchiveService.archive_period(db, args.period_id, force=args.force)
+            print(f"Период {args.period_id} перенесен в архив {archive_path(args.period_id)}, мест: {count}")
+        else:
+            count = ArchiveService.rehydrate_period(db, args.period_id)
+            print(f"Период {args.period_id} возвращен из архива, мест: {count}")
+    except ArchiveError as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+"""
+Полный пересчет сводной таблицы cargo_rollups по местам.
+
+Запуск из каталога backend:
+    python -m scripts.rebuild_rollups [--period ID]
+
+Обычно сводка поддерживается при записи партий и смене статусов мест.
+Пересчет нужен после изменений мест в обход приложения (ручные правки
+в базе, восстановление из копии) и после изменения правил подсчета.
+"""
+import sys
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.database import SessionLocal
+from app.services.rollup_service import RollupService
+
+
+def main() -> int:
+    arg_parser = argparse.ArgumentParser(description="Пересчет сводных показателей мест")
+    arg_parser.add_argument('--period', type=int, help="Только партии указанного периода (ID)")
+    args = arg_parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        count = RollupService.rebuild(db, period_id=args.period)
+    finally:
+        db.close()
+
+    scope = f"периода {args.period}" if args.period is not None else "всех периодов"
+    print(f"Сводка {scope} пересчитана, строк: {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
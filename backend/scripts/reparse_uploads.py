@@ -0,0 +1,173 @@
+"""
+Перепарсинг сохраненных в хранилище исходных файлов текущей версией парсера.
+
+Запуск из каталога backend:
+    python -m scripts.reparse_uploads [--period ID] [--sha256 ХЭШ ...] [--batch НОМЕР]
+                                      [--workers N] [--save] [--details]
+
+Без фильтров перепарсиваются все сохраненные файлы. Для каждого файла
+результат сравнивается с последним сохраненным результатом, в отчете
+выводится, что изменилось: число строк, номер партии и какие поля
+изменились в скольких строках. С флагом --save новые результаты
+записываются в хранилище как актуальные.
+"""
+import io
+import os
+import sys
+import logging
+import argparse
+import contextlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+from tabulate import tabulate
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scripts.CargoExcelParser import CargoExcelParser, PARSER_VERSION
+from app.services.raw_store import RawUploadStore, RAW_STORE_DIR
+
+logger = logging.getLogger('reparse_uploads')
+
+_worker_store: Optional[RawUploadStore] = None
+
+
+def _init_worker(store_dir: str) -> None:
+    global _worker_store
+    # Подробный лог парсера от десятков процессов только мешает отчету
+    logging.getLogger('excel_parser').setLevel(logging.WARNING)
+    _worker_store = RawUploadStore(store_dir)
+
+
+def reparse_file(sha256: str, period_id: str) -> Dict[str, Any]:
+    """
+    Парсит сохраненный файл текущей версией парсера (выполняется в рабочем процессе).
+
+    Args:
+        sha256: Хэш файла в хранилище
+        period_id: ID периода, в который файл был загружен
+
+    Returns:
+        Dict[str, Any]: sha256, period_id, batch_number, rows или error
+    """
+    try:
+        parser = CargoExcelParser(_worker_store.open(sha256), period_id)
+        with contextlib.redirect_stdout(io.StringIO()):
+            if not parser.prepare():
+                return {'sha256': sha256, 'period_id': period_id, 'error': "Структура файла не распознана"}
+            rows = list(parser.iter_rows(collect=False))
+        return {'sha256': sha256, 'period_id': period_id, 'batch_number': parser.batch_number, 'rows': rows}
+    except Exception as e:
+        return {'sha256': sha256, 'period_id': period_id, 'error': str(e)}
+
+
+def compare_results(old_rows: Optional[List[Dict[str, Any]]], new_rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Сравнивает старый и новый результаты парсинга по позициям строк.
+
+    Returns:
+        Dict[str, Any]: changed_rows, added_rows, removed_rows и fields (поле -> число строк с изменением)
+    """
+    if old_rows is None:
+        return {'changed_rows': None, 'added_rows': len(new_rows), 'removed_rows': 0, 'fields': {}}
+
+    fields = Counter()
+    changed_rows = 0
+    for old_row, new_row in zip(old_rows, new_rows):
+        # Старый результат прошел через JSON, поэтому сравниваем в том же виде
+        changed = [
+            key for key in set(old_row) | set(new_row)
+            if old_row.get(key) != _json_value(new_row.get(key))
+        ]
+        if changed:
+            changed_rows += 1
+            fields.update(changed)
+
+    return {
+        'changed_rows': changed_rows,
+        'added_rows': max(len(new_rows) - len(old_rows), 0),
+        'removed_rows': max(len(old_rows) - len(new_rows), 0),
+        'fields': dict(fields)
+    }
+
+
+def _json_value(value: Any) -> Any:
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def main() -> int:
+    arg_parser = argparse.ArgumentParser(description="Перепарсинг сохраненных исходных файлов загрузок")
+    arg_parser.add_argument(
+        '--store', default=RAW_STORE_DIR, help="Каталог хранилища исходных файлов (по умолчанию RAW_STORE_DIR)"
+    )
+    arg_parser.add_argument('--period', help="Только файлы, загруженные в период")
+    arg_parser.add_argument('--sha256', nargs='+', help="Только указанные файлы (хэш или его начало)")
+    arg_parser.add_argument('--batch', help="Только указанная партия")
+    arg_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Число рабочих процессов")
+    arg_parser.add_argument('--save', action='store_true', help="Сохранить новые результаты как актуальные")
+    arg_parser.add_argument('--details', action='store_true', help="Показать изменившиеся поля по каждому файлу")
+    args = arg_parser.parse_args()
+    if not args.store:
+        arg_parser.error("не задан каталог хранилища: укажите --store или RAW_STORE_DIR")
+
+    store = RawUploadStore(args.store)
+    files = store.list_files(period_id=args.period, sha256=args.sha256, batch_number=args.batch)
+    if not files:
+        print("Нет файлов для перепарсинга")
+        return 0
+
+    print(f"Перепарсинг {len(files)} файлов версией парсера {PARSER_VERSION}, процессов: {args.workers}")
+
+    report = []
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(args.store,)) as pool:
+        futures = {pool.submit(reparse_file, item['sha256'], item['period_id']): item for item in files}
+        for future in as_completed(futures):
+            item = futures[future]
+            outcome = future.result()
+            if 'error' in outcome:
+                failed += 1
+                report.append([item['filename'], item['period_id'], item['batch_number'], '-', '-', '-',
+                               f"ошибка: {outcome['error']}"])
+                continue
+
+            previous = store.get_result(item['sha256'], item['period_id'])
+            old_rows = previous['result'] if previous else None
+            diff = compare_results(old_rows, outcome['rows'])
+            batch_number = outcome['batch_number']
+            if batch_number != item['batch_number']:
+                status = f"партия {item['batch_number']} -> {batch_number}"
+            elif old_rows is None:
+                status = "нет прежнего результата"
+            elif diff['changed_rows'] or diff['added_rows'] or diff['removed_rows']:
+                status = "изменен"
+            else:
+                status = "без изменений"
+            if args.details and diff['fields']:
+                status += ": " + ", ".join(f"{field}={count}" for field, count in sorted(diff['fields'].items()))
+
+            report.append([
+                item['filename'], item['period_id'], batch_number,
+                f"{len(old_rows) if old_rows is not None else '-'} -> {len(outcome['rows'])}",
+                diff['changed_rows'] if diff['changed_rows'] is not None else '-',
+                f"+{diff['added_rows']}/-{diff['removed_rows']}",
+                status
+            ])
+
+            if args.save and outcome['rows']:
+                store.save_result(item['sha256'], item['period_id'], PARSER_VERSION, batch_number, outcome['rows'])
+
+    print(tabulate(
+        sorted(report, key=lambda line: (str(line[1]), str(line[0]))),
+        headers=['Файл', 'Период', 'Партия', 'Строк', 'Изменено строк', 'Добавлено/удалено', 'Статус'],
+        tablefmt='grid'
+    ))
+    print(f"Обработано файлов: {len(files)}, с ошибками: {failed}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())